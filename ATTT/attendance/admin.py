@@ -1,6 +1,21 @@
-from django.contrib import admin
+from datetime import date
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import Student, Teacher, Attendance, Leave
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.http import HttpResponseBadRequest
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from .analytics import cached_school_report, low_attendance_threshold, refresh_school_report
+from .archive import default_cutoff
+from .daily import GROUPS
+from .leaves import bulk_set_leave_status
+from .summaries import parse_date_param
+from .models import Student, Teacher, Section, Enrollment, Attendance, AttendanceArchive, AttendanceStats, DailyAttendanceAggregate, Job, Leave, Tombstone
 
 
 @admin.register(Student)
@@ -18,12 +33,95 @@ class TeacherAdmin(admin.ModelAdmin):
     search_fields = ['name', 'user__email']
 
 
+class EnrollmentInline(admin.TabularInline):
+    model = Enrollment
+    extra = 0
+    raw_id_fields = ['student']
+    readonly_fields = ['created_at']
+
+
+@admin.register(Section)
+class SectionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'subject', 'teacher', 'enrolled']
+    list_filter = ['subject']
+    list_select_related = ['teacher']
+    search_fields = ['name', 'subject', 'teacher__name']
+    raw_id_fields = ['teacher']
+    inlines = [EnrollmentInline]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(enrolled_count=Count('enrollments'))
+    
+    @admin.display(description='Students', ordering='enrolled_count')
+    def enrolled(self, obj):
+        return obj.enrolled_count
+
+
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
     list_display = ['student', 'teacher', 'date', 'status']
     list_filter = ['status', 'date', 'teacher']
     search_fields = ['student__name', 'student__roll_no']
     date_hierarchy = 'date'
+    change_list_template = 'admin/attendance/attendance/change_list.html'
+    
+    def get_urls(self):
+        return [
+            path('analytics/', self.admin_site.admin_view(self.analytics_view), name='attendance_analytics'),
+            path('heatmap/', self.admin_site.admin_view(self.heatmap_view), name='attendance_heatmap'),
+        ] + super().get_urls()
+    
+    def analytics_view(self, request):
+        """School-wide analytics report, cached for ATTENDANCE_ANALYTICS_CACHE_TIMEOUT"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        if request.GET.get('refresh'):
+            refresh_school_report()
+            query = request.GET.copy()
+            del query['refresh']
+            return redirect(f'{request.path}?{query.urlencode()}')
+        
+        try:
+            start_date = parse_date_param(request.GET.get('start')) or default_cutoff()
+            end_date = parse_date_param(request.GET.get('end')) or date.today()
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
+        try:
+            threshold = float(request.GET.get('threshold') or low_attendance_threshold())
+        except ValueError:
+            threshold = low_attendance_threshold()
+        
+        report = cached_school_report(start_date, end_date, threshold)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Attendance analytics',
+            'opts': self.model._meta,
+            'report': report,
+            'low_attendance': report['low_attendance'][:200],
+        }
+        return TemplateResponse(request, 'admin/attendance/analytics.html', context)
+    
+    def heatmap_view(self, request):
+        """Calendar of daily attendance rates; the page loads its data from daily_attendance_api"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            end_date = parse_date_param(request.GET.get('end')) or date.today()
+            start_date = parse_date_param(request.GET.get('start')) or default_cutoff(end_date)
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Attendance heatmap',
+            'opts': self.model._meta,
+            'start_date': start_date,
+            'end_date': end_date,
+            'group': request.GET.get('group') or 'teacher',
+            'groups': GROUPS,
+            'subject': request.GET.get('subject', ''),
+            'subjects': Teacher.objects.order_by('subject').values_list('subject', flat=True).distinct(),
+        }
+        return TemplateResponse(request, 'admin/attendance/heatmap.html', context)
 
 
 @admin.register(Leave)
@@ -32,3 +130,100 @@ class LeaveAdmin(admin.ModelAdmin):
     list_filter = ['status', 'date', 'created_at']
     search_fields = ['student__name', 'student__roll_no', 'reason']
     readonly_fields = ['created_at', 'updated_at']
+    actions = ['approve_leaves', 'approve_leaves_and_mark_absent', 'reject_leaves']
+    
+    def _bulk_status(self, request, queryset, status, mark_absent=False):
+        teacher = request.role.teacher
+        if mark_absent and teacher is None:
+            self.message_user(request, 'Only users with a teacher profile can mark attendance.', messages.ERROR)
+            return
+        result = bulk_set_leave_status(
+            list(queryset.values_list('pk', flat=True)), status, teacher, mark_absent=mark_absent,
+        )
+        message = (
+            f"{status.title()} {result['processed']} leave requests for {result['students']} students "
+            f"in {result['elapsed_ms']:.0f} ms."
+        )
+        if mark_absent:
+            message += (
+                f" Marked {result['marked_absent']} days absent, skipped {result['skipped_archived']} archived"
+                f" and {result['skipped_not_enrolled']} of students outside your sections."
+            )
+        self.message_user(request, message)
+    
+    @admin.action(description='Approve selected leave requests')
+    def approve_leaves(self, request, queryset):
+        self._bulk_status(request, queryset, 'approved')
+    
+    @admin.action(description='Approve selected and mark the days absent')
+    def approve_leaves_and_mark_absent(self, request, queryset):
+        self._bulk_status(request, queryset, 'approved', mark_absent=True)
+    
+    @admin.action(description='Reject selected leave requests')
+    def reject_leaves(self, request, queryset):
+        self._bulk_status(request, queryset, 'rejected')
+
+
+@admin.register(AttendanceStats)
+class AttendanceStatsAdmin(admin.ModelAdmin):
+    list_display = ['student', 'teacher', 'month', 'total', 'present', 'absent', 'updated_at']
+    list_filter = ['month', 'teacher']
+    search_fields = ['student__name', 'student__roll_no']
+    readonly_fields = ['student', 'teacher', 'month', 'total', 'present', 'absent', 'updated_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DailyAttendanceAggregate)
+class DailyAttendanceAggregateAdmin(admin.ModelAdmin):
+    list_display = ['date', 'teacher', 'present', 'absent']
+    list_filter = ['teacher']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'teacher', 'present', 'absent']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'object_id', 'student_id', 'date', 'deleted_at']
+    list_filter = ['kind']
+    readonly_fields = ['kind', 'object_id', 'student_id', 'date', 'deleted_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AttendanceArchive)
+class AttendanceArchiveAdmin(admin.ModelAdmin):
+    list_display = ['student', 'teacher', 'month', 'total', 'present', 'absent', 'archived_at']
+    list_filter = ['month', 'teacher']
+    search_fields = ['student__name', 'student__roll_no']
+    readonly_fields = ['student', 'teacher', 'month', 'recorded_days', 'present_days', 'archived_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'priority', 'progress', 'attempts', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['kind', 'created_by__username']
+    readonly_fields = [
+        'kind', 'payload', 'attempts', 'progress', 'progress_message', 'result', 'error', 'created_by',
+        'worker', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+    ]
+    actions = ['retry_jobs']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected failed jobs')
+    def retry_jobs(self, request, queryset):
+        count = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{count} jobs queued again.')
@@ -0,0 +1,277 @@
+"""
+School-wide attendance analytics.
+
+Attendance is read in chunks with `values_list` into four compact columns
+(student, teacher, day ordinal, present flag); archived months are
+expanded from their bitmaps into the same columns. Every report is then
+built from two group-bys over those columns, per student and per
+(teacher, day), done with NumPy `bincount` when NumPy is installed
+(requirements-analytics.txt) and with plain counters otherwise. Both
+backends return identical reports.
+"""
+import calendar
+import time
+from array import array
+from collections import Counter, defaultdict
+from datetime import date
+from itertools import islice
+
+from django.conf import settings
+
+from .archive import archive_queryset
+from .bitmaps import iter_days
+from .caching import bump_generation, cached_value
+from .models import Attendance, Student, Teacher
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+ANALYTICS_CHUNK_SIZE = 20000
+
+NUMPY, PYTHON = 'numpy', 'python'
+
+
+def default_backend():
+    return NUMPY if np is not None else PYTHON
+
+
+def low_attendance_threshold():
+    return getattr(settings, 'ATTENDANCE_LOW_ATTENDANCE_THRESHOLD', 75)
+
+
+def _percentage(part, whole):
+    return round(part / whole * 100, 1) if whole else 0
+
+
+class AttendanceColumns:
+    """Attendance records in a date range as parallel typed arrays"""
+
+    def __init__(self):
+        self.student = array('q')
+        self.teacher = array('q')
+        self.day = array('q')
+        self.present = array('b')
+
+    def __len__(self):
+        return len(self.day)
+
+    @classmethod
+    def load(cls, start_date=None, end_date=None, chunk_size=ANALYTICS_CHUNK_SIZE):
+        """Read hot and archived attendance between start_date and end_date"""
+        columns = cls()
+        records = Attendance.objects.order_by()
+        if start_date:
+            records = records.filter(date__gte=start_date)
+        if end_date:
+            records = records.filter(date__lte=end_date)
+        rows = records.values_list('student_id', 'teacher_id', 'date', 'status').iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            students, teachers, dates, statuses = zip(*chunk)
+            columns.student.extend(students)
+            columns.teacher.extend(teachers)
+            columns.day.extend(map(date.toordinal, dates))
+            columns.present.extend(map('present'.__eq__, statuses))
+
+        archived = archive_queryset(start_date, end_date).values_list(
+            'student_id', 'teacher_id', 'month', 'recorded_days', 'present_days',
+        )
+        for student_id, teacher_id, month, recorded_days, present_days in archived.iterator(chunk_size=chunk_size):
+            for record_date, status in iter_days(month, recorded_days, present_days):
+                if (start_date and record_date < start_date) or (end_date and record_date > end_date):
+                    continue
+                columns.student.append(student_id)
+                columns.teacher.append(teacher_id)
+                columns.day.append(record_date.toordinal())
+                columns.present.append(status == 'present')
+        return columns
+
+    def group_counts(self, backend=None):
+        """
+        Totals and present counts per student and per (teacher, day).
+
+        Returns ({student_id: (total, present)}, {(teacher_id, day): (total, present)}).
+        """
+        if not len(self):
+            return {}, {}
+        if (backend or default_backend()) == NUMPY:
+            return self._numpy_counts()
+        return self._python_counts()
+
+    def _numpy_counts(self):
+        student = np.frombuffer(self.student, dtype=np.int64)
+        teacher = np.frombuffer(self.teacher, dtype=np.int64)
+        day = np.frombuffer(self.day, dtype=np.int64)
+        present = np.frombuffer(self.present, dtype=np.int8)
+
+        student_totals = np.bincount(student)
+        student_present = np.bincount(student, weights=present, minlength=len(student_totals))
+        students = np.flatnonzero(student_totals)
+        by_student = dict(zip(
+            students.tolist(),
+            zip(student_totals[students].tolist(), student_present[students].astype(np.int64).tolist()),
+        ))
+
+        # (teacher, day) packed into one dense key
+        teachers, teacher_index = np.unique(teacher, return_inverse=True)
+        first_day = int(day.min())
+        days = int(day.max()) - first_day + 1
+        keys = teacher_index * days + (day - first_day)
+        key_totals = np.bincount(keys, minlength=len(teachers) * days)
+        key_present = np.bincount(keys, weights=present, minlength=len(key_totals))
+        used = np.flatnonzero(key_totals)
+        teacher_ids = teachers.tolist()
+        by_teacher_day = {
+            (teacher_ids[key // days], first_day + key % days): (total, int(present_count))
+            for key, total, present_count in zip(
+                used.tolist(), key_totals[used].tolist(), key_present[used].tolist(),
+            )
+        }
+        return by_student, by_teacher_day
+
+    def _python_counts(self):
+        student_totals, student_present = Counter(self.student), Counter()
+        key_totals, key_present = Counter(zip(self.teacher, self.day)), Counter()
+        for student_id, teacher_id, day, present in zip(self.student, self.teacher, self.day, self.present):
+            if present:
+                student_present[student_id] += 1
+                key_present[(teacher_id, day)] += 1
+        by_student = {pk: (total, student_present[pk]) for pk, total in student_totals.items()}
+        by_teacher_day = {key: (total, key_present[key]) for key, total in key_totals.items()}
+        return by_student, by_teacher_day
+
+
+def low_attendance(by_student, threshold):
+    """Students below `threshold` percent, lowest first, with roll number and name"""
+    flagged = {
+        student_id: (total, present)
+        for student_id, (total, present) in by_student.items()
+        if present / total * 100 < threshold
+    }
+    students = {
+        student.pk: student
+        for student in Student.objects.filter(pk__in=flagged).only('roll_no', 'name', 'subject')
+    }
+    rows = [
+        {
+            'student_id': student_id,
+            'roll_no': students[student_id].roll_no,
+            'name': students[student_id].name,
+            'subject': students[student_id].subject or '',
+            'total_days': total,
+            'present': present,
+            'percentage': _percentage(present, total),
+        }
+        for student_id, (total, present) in flagged.items()
+        if student_id in students
+    ]
+    rows.sort(key=lambda row: (row['percentage'], row['roll_no']))
+    return rows
+
+
+def weekday_absences(by_teacher_day):
+    """Records, absences and absence rate per weekday, Monday first"""
+    totals, absences = Counter(), Counter()
+    for (_, day), (total, present) in by_teacher_day.items():
+        weekday = (day - 1) % 7  # date.fromordinal(1) is a Monday
+        totals[weekday] += total
+        absences[weekday] += total - present
+    return [
+        {
+            'weekday': calendar.day_name[weekday],
+            'total': totals[weekday],
+            'absent': absences[weekday],
+            'absence_rate': _percentage(absences[weekday], totals[weekday]),
+        }
+        for weekday in sorted(totals)
+    ]
+
+
+def subject_trends(by_teacher_day):
+    """Monthly attendance percentage per subject taught, months ascending"""
+    subjects = dict(Teacher.objects.filter(pk__in={teacher_id for teacher_id, _ in by_teacher_day})
+                    .values_list('pk', 'subject'))
+    counts = defaultdict(lambda: [0, 0])
+    months = {}
+    for (teacher_id, day), (total, present) in by_teacher_day.items():
+        if day not in months:
+            months[day] = date.fromordinal(day).replace(day=1)
+        row = counts[(subjects.get(teacher_id) or '', months[day])]
+        row[0] += total
+        row[1] += present
+
+    trends = defaultdict(list)
+    for (subject, month), (total, present) in sorted(counts.items()):
+        trends[subject].append({
+            'month': month,
+            'total': total,
+            'present': present,
+            'percentage': _percentage(present, total),
+        })
+    return [{'subject': subject, 'months': months} for subject, months in trends.items()]
+
+
+def school_report(start_date=None, end_date=None, threshold=None, backend=None,
+                  chunk_size=ANALYTICS_CHUNK_SIZE):
+    """
+    Low-attendance students, weekday absence patterns and per-subject trends.
+
+    Covers hot and archived attendance between start_date and end_date.
+    The result is plain data so it can be cached, printed or rendered.
+    """
+    threshold = low_attendance_threshold() if threshold is None else threshold
+    backend = backend or default_backend()
+
+    started = time.perf_counter()
+    columns = AttendanceColumns.load(start_date, end_date, chunk_size)
+    loaded = time.perf_counter()
+    by_student, by_teacher_day = columns.group_counts(backend)
+    total = sum(total for total, _ in by_student.values())
+    present = sum(present for _, present in by_student.values())
+    report = {
+        'start_date': start_date,
+        'end_date': end_date,
+        'threshold': threshold,
+        'backend': backend,
+        'rows': len(columns),
+        'students': len(by_student),
+        'overall': {'total': total, 'present': present, 'percentage': _percentage(present, total)},
+        'low_attendance': low_attendance(by_student, threshold),
+        'weekdays': weekday_absences(by_teacher_day),
+        'subjects': subject_trends(by_teacher_day),
+    }
+    finished = time.perf_counter()
+    report['timings'] = {
+        'load_ms': round((loaded - started) * 1000, 1),
+        'report_ms': round((finished - loaded) * 1000, 1),
+        'total_ms': round((finished - started) * 1000, 1),
+    }
+    return report
+
+
+def analytics_timeout():
+    return getattr(settings, 'ATTENDANCE_ANALYTICS_CACHE_TIMEOUT', 600)
+
+
+def cached_school_report(start_date=None, end_date=None, threshold=None):
+    """
+    school_report cached for ATTENDANCE_ANALYTICS_CACHE_TIMEOUT seconds.
+
+    School-wide reports are not invalidated by every attendance write
+    (that would recompute them on each roll call); they expire, or are
+    refreshed on demand with `refresh_school_report`.
+    """
+    threshold = low_attendance_threshold() if threshold is None else threshold
+    return cached_value(
+        'school_report',
+        [start_date, end_date, threshold],
+        [('analytics', None)],
+        lambda: school_report(start_date, end_date, threshold),
+        timeout=analytics_timeout(),
+    )
+
+
+def refresh_school_report():
+    """Drop every cached school report"""
+    bump_generation('analytics')
@@ -0,0 +1,194 @@
+"""
+Lightweight JSON API for classroom tablets.
+
+GET returns the teacher's enrolled roster with existing statuses for a date and supports
+ETag/If-None-Match; PATCH (or POST) sends only the students whose status
+changed and goes through the same batched write path as mark_attendance.
+The daily endpoint serves the admin heatmap from the precomputed daily aggregates,
+and the changes endpoint pages through everything changed since a sync cursor.
+"""
+import hashlib
+import json
+
+from django.http import HttpResponse, JsonResponse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_http_methods
+
+from .archive import ArchivedDateError
+from .changes import MAX_PAGE_SIZE, PAGE_SIZE, CursorExpired, change_page
+from .daily import GROUPS, heatmap
+from .models import Attendance
+from .sections import teacher_students
+from .summaries import parse_date_param, roster_statuses
+from .writes import record_attendance, VALID_STATUSES
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _teacher_or_none(request):
+    return request.role.teacher
+
+
+def _etag(body):
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+@require_http_methods(['GET', 'HEAD', 'PATCH', 'POST'])
+def attendance_api(request):
+    """Roster with statuses for a date (GET) or batched status updates (PATCH/POST)"""
+    teacher = _teacher_or_none(request)
+    if teacher is None:
+        return _error('Teacher login required.', status=403)
+    if request.method in ('GET', 'HEAD'):
+        return _roster(request, teacher)
+    return _update(request, teacher)
+
+
+def _etag_matches(request, etag):
+    """Whether If-None-Match lists the ETag (weak comparison, so W/ is ignored) or is *"""
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if etags == ['*']:
+        return True
+    return any(candidate.removeprefix('W/') == etag for candidate in etags)
+
+
+def _json_with_etag(request, data):
+    """Compact JSON response that answers 304 when If-None-Match matches"""
+    body = json.dumps(data, separators=(',', ':')).encode()
+    etag = _etag(body)
+
+    if _etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _date_or_none(value):
+    try:
+        return parse_date_param(value)
+    except ValueError:
+        return None
+
+
+def _roster(request, teacher):
+    attendance_date = _date_or_none(request.GET.get('date'))
+    if attendance_date is None:
+        return _error('Query parameter "date" must be YYYY-MM-DD.')
+    return _json_with_etag(request, {
+        'date': attendance_date.isoformat(),
+        'students': roster_statuses(attendance_date, teacher_students(teacher)),
+    })
+
+
+@require_http_methods(['GET', 'HEAD'])
+def attendance_statuses_api(request):
+    """Recorded statuses of the teacher's enrolled students for one date as {student_id: status}"""
+    teacher = _teacher_or_none(request)
+    if teacher is None:
+        return _error('Teacher login required.', status=403)
+    attendance_date = _date_or_none(request.GET.get('date'))
+    if attendance_date is None:
+        return _error('Query parameter "date" must be YYYY-MM-DD.')
+    statuses = (
+        Attendance.objects.filter(date=attendance_date, student__in=teacher_students(teacher).values('pk'))
+        .order_by()
+        .values_list('student_id', 'status')
+    )
+    return _json_with_etag(request, {
+        'date': attendance_date.isoformat(),
+        'statuses': {str(student_id): status for student_id, status in statuses},
+    })
+
+
+@require_http_methods(['GET', 'HEAD'])
+def daily_attendance_api(request):
+    """Daily attendance rates per teacher, subject or the whole school, for the heatmap (staff only)"""
+    if not request.user.is_staff:
+        return _error('Staff login required.', status=403)
+    dates = {}
+    for name in ('start', 'end'):
+        try:
+            dates[name] = parse_date_param(request.GET.get(name))
+        except ValueError:
+            return _error(f'Query parameter "{name}" must be YYYY-MM-DD.')
+    group = request.GET.get('group', 'teacher')
+    if group not in GROUPS:
+        return _error(f'Query parameter "group" must be one of: {", ".join(GROUPS)}.')
+    teacher_id = request.GET.get('teacher') or None
+    if teacher_id is not None and not teacher_id.isdigit():
+        return _error('Query parameter "teacher" must be a teacher id.')
+    return _json_with_etag(request, heatmap(
+        dates['start'], dates['end'], group, teacher_id, request.GET.get('subject') or None,
+    ))
+
+
+@require_http_methods(['GET', 'HEAD'])
+def changes_api(request):
+    """Attendance and leave changes since a cursor as JSON or NDJSON (staff: whole school, students: their own)"""
+    if request.user.is_staff:
+        student = None
+    else:
+        student = request.role.student
+        if student is None:
+            return _error('Staff or student login required.', status=403)
+    try:
+        limit = int(request.GET.get('limit') or PAGE_SIZE)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return _error(f'Query parameter "limit" must be between 1 and {MAX_PAGE_SIZE}.')
+    try:
+        page = change_page(request.GET.get('cursor'), limit, student)
+    except ValueError as exc:
+        return _error(str(exc))
+    except CursorExpired:
+        return _error('Cursor has expired; start again without a cursor.', status=410)
+
+    if request.GET.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        # One change per line, then a trailer line with the cursor
+        trailer = {'next_cursor': page['next_cursor'], 'has_more': page['has_more']}
+        lines = [json.dumps(change, separators=(',', ':')) for change in page['changes']]
+        lines.append(json.dumps(trailer, separators=(',', ':')))
+        response = HttpResponse('\n'.join(lines) + '\n', content_type='application/x-ndjson')
+    else:
+        response = HttpResponse(json.dumps(page, separators=(',', ':')), content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _update(request, teacher):
+    try:
+        payload = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return _error('Request body must be JSON.')
+    if not isinstance(payload, dict):
+        return _error('Request body must be a JSON object.')
+
+    attendance_date = _date_or_none(str(payload.get('date', '')))
+    if attendance_date is None:
+        return _error('"date" must be YYYY-MM-DD.')
+
+    statuses = payload.get('statuses')
+    if not isinstance(statuses, dict):
+        return _error('"statuses" must map student ids to "present" or "absent".')
+    try:
+        statuses = {int(student_id): status for student_id, status in statuses.items()}
+    except ValueError:
+        return _error('Student ids must be integers.')
+    invalid = sorted(
+        student_id for student_id, status in statuses.items()
+        if not isinstance(status, str) or status not in VALID_STATUSES
+    )
+    if invalid:
+        return _error(f'Invalid status for students: {invalid}')
+
+    try:
+        result = record_attendance(teacher, attendance_date, statuses, students=teacher_students(teacher))
+    except ArchivedDateError as exc:
+        return _error(str(exc), status=409)
+    return JsonResponse({'date': attendance_date.isoformat(), **result})
@@ -0,0 +1,210 @@
+"""
+Cold storage for old attendance.
+
+`archive_attendance` moves Attendance rows from whole months before a
+cutoff into AttendanceArchive, one row per (student, teacher, month) with
+packed day bitmaps. The counters in AttendanceStats are left untouched
+because the archive keeps the same history, and the summary, stats and
+export helpers read archived months back from the bitmaps. Archived
+months are frozen: `record_attendance` refuses dates inside them.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .bitmaps import day_bit, iter_days, month_mask, next_month
+from .caching import attendance_scopes, bump_on_commit
+from .models import Attendance, AttendanceArchive, AttendanceState
+from .stats import month_start
+
+
+class ArchivedDateError(ValueError):
+    """Attendance was written for a date whose month has been archived"""
+
+
+def default_cutoff(today=None):
+    """Start of the current academic year; everything before it is archivable"""
+    today = today or date.today()
+    start_month = getattr(settings, 'ATTENDANCE_ACADEMIC_YEAR_START_MONTH', 6)
+    year = today.year if today.month >= start_month else today.year - 1
+    return date(year, start_month, 1)
+
+
+def watermark_queryset():
+    """The latest archived month (archive_month_student_idx)"""
+    return AttendanceArchive.objects.order_by('-month').values_list('month', flat=True)
+
+
+def archive_watermark():
+    """First day after the last archived month, or None when nothing is archived"""
+    last_month = watermark_queryset().first()
+    return next_month(last_month) if last_month else None
+
+
+def check_not_archived(attendance_date):
+    """Raise ArchivedDateError when `attendance_date` falls in an archived month"""
+    watermark = archive_watermark()
+    if watermark and attendance_date < watermark:
+        raise ArchivedDateError(
+            f'Attendance before {watermark:%B %Y} is archived and can no longer be changed.'
+        )
+
+
+def archive_queryset(start_date=None, end_date=None, teacher=None, student=None, students=None):
+    """Archive rows overlapping a date range, mirroring the Attendance filters"""
+    rows = AttendanceArchive.objects.order_by()
+    if start_date:
+        rows = rows.filter(month__gte=month_start(start_date))
+    if end_date:
+        rows = rows.filter(month__lte=end_date)
+    if teacher is not None:
+        rows = rows.filter(teacher=teacher)
+    if student is not None:
+        rows = rows.filter(student=student)
+    if students is not None:
+        rows = rows.filter(student__in=students.values('pk'))
+    return rows
+
+
+def archive_count_rows(start_date=None, end_date=None, teacher=None, students=None):
+    """values_list query feeding `attendance.bitmaps.count_days`"""
+    return archive_queryset(start_date, end_date, teacher, students=students).values_list(
+        'student_id', 'month', 'recorded_days', 'present_days',
+    )
+
+
+def archived_months_queryset(student):
+    """values_list query feeding `archived_months`, newest month first"""
+    return archive_queryset(student=student).order_by('-month', 'teacher__name').values_list(
+        'month', 'teacher__name', 'recorded_days', 'present_days',
+    )
+
+
+def _month_summary(month, teacher_name, recorded_days, present_days):
+    total = recorded_days.bit_count()
+    present = (present_days & recorded_days).bit_count()
+    return {
+        'month': month, 'teacher_name': teacher_name,
+        'total': total, 'present': present, 'absent': total - present,
+    }
+
+
+def archived_months(student):
+    """
+    One summary per archived (month, teacher) of a student, newest first.
+
+    Each is a dict with the month, teacher name and total, present and
+    absent days, for pages that list hot records day by day.
+    """
+    return [_month_summary(*row) for row in archived_months_queryset(student)]
+
+
+async def aarchived_months(student):
+    """Async archived_months"""
+    return [_month_summary(*row) async for row in archived_months_queryset(student)]
+
+
+def _delete_rows(pks, batch_size):
+    # Raw DELETE so the model signals do not decrement AttendanceStats;
+    # the archive carries the same history
+    table = connection.ops.quote_name(Attendance._meta.db_table)
+    with connection.cursor() as cursor:
+        for offset in range(0, len(pks), batch_size):
+            batch = pks[offset:offset + batch_size]
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(batch))})', batch,
+            )
+
+
+def archive_month(month, batch_size=500):
+    """Move one month of Attendance into the archive; returns (moved rows, archive rows)"""
+    records = (
+        Attendance.objects.filter(date__gte=month, date__lt=next_month(month))
+        .order_by()
+        .values_list('pk', 'student_id', 'teacher_id', 'date', 'status')
+    )
+    pks = []
+    states = []
+    bitmaps = defaultdict(lambda: [0, 0])
+    for pk, student_id, teacher_id, record_date, status in records:
+        pks.append(pk)
+        states.append(AttendanceState(student_id, teacher_id, record_date, status))
+        bit = day_bit(record_date)
+        bitmap = bitmaps[(student_id, teacher_id)]
+        bitmap[0] |= bit
+        if status == 'present':
+            bitmap[1] |= bit
+    if not pks:
+        return 0, 0
+
+    # Merge with rows archived earlier for the same month; the hot rows win
+    # on days present in both
+    existing = AttendanceArchive.objects.filter(month=month, student_id__in={key[0] for key in bitmaps})
+    replaced = []
+    for row in existing:
+        key = (row.student_id, row.teacher_id)
+        if key in bitmaps:
+            recorded, present = bitmaps[key]
+            bitmaps[key] = [row.recorded_days | recorded, (row.present_days & ~recorded) | present]
+            replaced.append(row.pk)
+
+    AttendanceArchive.objects.filter(pk__in=replaced).delete()
+    AttendanceArchive.objects.bulk_create([
+        AttendanceArchive(
+            student_id=student_id,
+            teacher_id=teacher_id,
+            month=month,
+            recorded_days=recorded,
+            present_days=present,
+        )
+        for (student_id, teacher_id), (recorded, present) in bitmaps.items()
+    ], batch_size=batch_size)
+    _delete_rows(pks, batch_size)
+    # The raw DELETE skips the signal receivers, so retire the cached
+    # dashboards and roster fragments that showed these rows here
+    bump_on_commit(attendance_scopes(states))
+    return len(pks), len(bitmaps)
+
+
+def archive_attendance(before, batch_size=500, dry_run=False):
+    """
+    Archive every whole month of attendance before `before`.
+
+    The cutoff is rounded down to the first of its month so a month is
+    never split between the hot table and the archive. Each month is
+    moved in its own transaction. Returns the months, moved rows and
+    archive rows written (or that would be, with dry_run).
+    """
+    before = month_start(before)
+    old = Attendance.objects.filter(date__lt=before).order_by()
+    months = list(old.dates('date', 'month'))
+    result = {'cutoff': before, 'months': len(months), 'moved': 0, 'archive_rows': 0}
+    if dry_run:
+        result['moved'] = old.count()
+        result['archive_rows'] = (
+            old.values_list('student_id', 'teacher_id', 'date__year', 'date__month').distinct().count()
+        )
+        return result
+
+    for month in months:
+        with transaction.atomic():
+            moved, archive_rows = archive_month(month, batch_size)
+        result['moved'] += moved
+        result['archive_rows'] += archive_rows
+    return result
+
+
+def iter_archived_rows(rows, start_date=None, end_date=None):
+    """
+    Expand archive rows back into per-day records inside [start_date, end_date].
+
+    `rows` are (roll_no, name, teacher_name, month, recorded_days,
+    present_days) tuples; yields (date, roll_no, name, status,
+    teacher_name) in the row order, days ascending within each row.
+    """
+    for roll_no, name, teacher_name, month, recorded_days, present_days in rows:
+        recorded_days &= month_mask(month, start_date, end_date)
+        for record_date, status in iter_days(month, recorded_days, present_days):
+            yield record_date, roll_no, name, status, teacher_name
@@ -0,0 +1,144 @@
+"""
+Async versions of the read-heavy dashboard views.
+
+Routed instead of the views in `attendance.views` when
+ATTENDANCE_ASYNC_VIEWS is enabled (the ASGI/uvicorn profile). Independent
+queries and cache lookups are awaited together with asyncio.gather, and
+every queryset is evaluated before rendering because templates may not
+touch the database from the event loop. Rendering itself runs in the
+request's sync thread, since base.html still reads the user's profile.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from .archive import aarchived_months
+from .caching import acached_value, afragment_cache
+from .leaves import LeaveSummary
+from .models import Student, Teacher, Attendance
+from .roles import aresolve_role
+from .sections import teacher_students
+from .stats import astudent_totals
+from .summaries import alist, ateacher_summary, resolve_date_range
+
+arender = sync_to_async(render)
+
+
+async def _profile(request, model):
+    role = await aresolve_role(request)
+    return role.student if model is Student else role.teacher
+
+
+@login_required
+async def student_dashboard(request):
+    """Student dashboard view"""
+    student = await _profile(request, Student)
+    if student is None:
+        messages.error(request, 'Student profile not found.')
+        return redirect('home')
+    
+    # Recent attendance, recent leaves and the counters are independent
+    attendance_records, leave_summary, totals = await asyncio.gather(
+        acached_value(
+            'recent_attendance', (student.pk,), [('student', student.pk)],
+            lambda: alist(Attendance.objects.filter(student=student).select_related('teacher').order_by('-date')[:10]),
+        ),
+        acached_value(
+            'leave_summary', (student.pk,), [('leaves', student.pk)], lambda: LeaveSummary.afor_student(student),
+        ),
+        acached_value('student_totals', (student.pk,), [('student', student.pk)], lambda: astudent_totals(student)),
+    )
+    
+    context = {
+        'student': student,
+        'attendance_records': attendance_records,
+        'leave_requests': leave_summary.recent(5),
+        'leave_summary': leave_summary,
+        'attendance_percentage': totals['percentage'],
+        'total_records': totals['total'],
+    }
+    return await arender(request, 'attendance/student_dashboard.html', context)
+
+
+@login_required
+async def teacher_dashboard(request):
+    """Teacher dashboard view"""
+    teacher = await _profile(request, Teacher)
+    if teacher is None:
+        messages.error(request, 'Teacher profile not found.')
+        return redirect('home')
+    
+    # Get filter type from request (day, week, month, year)
+    filter_type = request.GET.get('filter', 'week')
+    start_date, end_date, filter_display = resolve_date_range(filter_type)
+    
+    scopes = [('teacher', teacher.pk), ('roster', None), ('roster', teacher.pk)]
+    summary, rows_fragment = await asyncio.gather(
+        acached_value(
+            'teacher_summary', (teacher.pk, start_date, end_date), scopes,
+            lambda: ateacher_summary(teacher, start_date, end_date, teacher_students(teacher)),
+        ),
+        afragment_cache('teacher_dashboard_rows', (teacher.pk, start_date, end_date), scopes),
+    )
+    
+    context = {
+        'teacher': teacher,
+        'start_date': start_date,
+        'end_date': end_date,
+        'filter_type': filter_type,
+        'filter_display': filter_display,
+        'attendance_summary': summary['attendance_summary'],
+        'total_avg': summary['total_avg'],
+        'total_records': summary['total_records'],
+        'rows_fragment': rows_fragment,
+    }
+    return await arender(request, 'attendance/teacher_dashboard.html', context)
+
+
+@login_required
+async def view_attendance(request):
+    """View attendance records for students"""
+    student = await _profile(request, Student)
+    if student is None:
+        messages.error(request, 'Student profile not found.')
+        return redirect('home')
+    
+    # Archived months are only kept as per-month bitmaps, so they are listed as month summaries
+    attendance_records, archived, totals = await asyncio.gather(
+        alist(Attendance.objects.filter(student=student).select_related('teacher').order_by('-date')),
+        aarchived_months(student),
+        acached_value('student_totals', (student.pk,), [('student', student.pk)], lambda: astudent_totals(student)),
+    )
+    
+    context = {
+        'student': student,
+        'attendance_records': attendance_records,
+        'archived_months': archived,
+        'total_records': totals['total'],
+        'present_records': totals['present'],
+        'absent_records': totals['absent'],
+        'attendance_percentage': totals['percentage'],
+    }
+    return await arender(request, 'attendance/view_attendance.html', context)
+
+
+@login_required
+async def leave_info(request):
+    """Detailed leave information for students"""
+    student = await _profile(request, Student)
+    if student is None:
+        messages.error(request, 'Student profile not found.')
+        return redirect('home')
+    
+    leave_summary = await acached_value(
+        'leave_summary', (student.pk,), [('leaves', student.pk)], lambda: LeaveSummary.afor_student(student),
+    )
+    
+    context = {
+        'student': student,
+        **leave_summary.as_context(),
+    }
+    return await arender(request, 'attendance/leave_info.html', context)
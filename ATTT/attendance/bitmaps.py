@@ -0,0 +1,276 @@
+"""
+Per-student monthly attendance bitmaps for analytics.
+
+Bit n-1 of a month's `recorded_days` is set when the student has a record
+on day n, and the same bit of `present_days` when it was 'present'. The
+AttendanceBitmap table holds one such pair per (student, month) for the
+student's whole history, hot and archived; `apply_bitmap_changes` keeps it
+in sync from `attendance_changed` with relative bitwise UPDATEs, grouped
+by day and status like the counter updates in `attendance.stats`, and
+inserts new months with the same conflict-safe bulk insert. Present
+counts, range queries and streaks are then popcounts and bit scans over
+about ten integers per student per year.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Attendance, AttendanceArchive, AttendanceBitmap
+from .stats import bulk_create_or_update, month_start
+
+# Every day bit of a month (31 days)
+MONTH_BITS = (1 << 31) - 1
+
+PRESENT, ABSENT, CLEAR = 'present', 'absent', 'clear'
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def day_bit(day):
+    """Bitmap bit for a date within its month"""
+    return 1 << (day.day - 1)
+
+
+def month_mask(month, start_date=None, end_date=None):
+    """Bits for the days of `month` that fall inside [start_date, end_date]"""
+    days = calendar.monthrange(month.year, month.month)[1]
+    if start_date and start_date > month.replace(day=days):
+        return 0
+    if end_date and end_date < month:
+        return 0
+    first = start_date.day if start_date and month_start(start_date) == month else 1
+    last = end_date.day if end_date and month_start(end_date) == month else days
+    return ((1 << last) - 1) & ~((1 << (first - 1)) - 1)
+
+
+def iter_days(month, recorded_days, present_days):
+    """(date, status) for every recorded day in a month bitmap, in date order"""
+    bits = recorded_days
+    while bits:
+        low = bits & -bits
+        yield month.replace(day=low.bit_length()), PRESENT if present_days & low else ABSENT
+        bits ^= low
+
+
+def count_days(rows, start_date=None, end_date=None):
+    """
+    Per-student total/present/absent counts from bitmap rows.
+
+    `rows` are (student_id, month, recorded_days, present_days) tuples;
+    days outside [start_date, end_date] are masked off, so partially
+    covered months are counted exactly.
+    """
+    counts = defaultdict(lambda: {'total_days': 0, 'present': 0, 'absent': 0})
+    masks = {}
+    for student_id, month, recorded_days, present_days in rows:
+        mask = masks.get(month)
+        if mask is None:
+            mask = masks[month] = month_mask(month, start_date, end_date)
+        total = (recorded_days & mask).bit_count()
+        if not total:
+            continue
+        present = (present_days & mask).bit_count()
+        row = counts[student_id]
+        row['total_days'] += total
+        row['present'] += present
+        row['absent'] += total - present
+    return dict(counts)
+
+
+def _bit_update(op, bit):
+    clear = MONTH_BITS ^ bit
+    if op == CLEAR:
+        return {'recorded_days': F('recorded_days').bitand(clear), 'present_days': F('present_days').bitand(clear)}
+    present = F('present_days').bitor(bit) if op == PRESENT else F('present_days').bitand(clear)
+    return {'recorded_days': F('recorded_days').bitor(bit), 'present_days': present}
+
+
+def _merge_update(recorded, present):
+    """Set the `recorded` day bits, present where `present` has them, over whatever a row holds"""
+    return {
+        'recorded_days': F('recorded_days').bitor(recorded),
+        'present_days': F('present_days').bitand(MONTH_BITS ^ recorded).bitor(present),
+    }
+
+
+def _existing_rows(ops):
+    """Map the (student_id, month) keys in `ops` that already have a row to its pk"""
+    rows = AttendanceBitmap.objects.filter(
+        student_id__in={key[0] for key in ops},
+        month__in={key[1] for key in ops},
+    ).values_list('pk', 'student_id', 'month')
+    return {(student_id, month): pk for pk, student_id, month in rows}
+
+
+def apply_bitmap_changes(changes, batch_size=500):
+    """Apply attendance (old, new) pairs to the AttendanceBitmap table"""
+    ops = {}
+    for old, new in changes:
+        if old is not None:
+            ops[(old.student_id, month_start(old.date), day_bit(old.date))] = CLEAR
+        if new is not None:
+            ops[(new.student_id, month_start(new.date), day_bit(new.date))] = new.status
+    if not ops:
+        return
+
+    with transaction.atomic():
+        existing = _existing_rows(ops)
+
+        # A roll call sets the same day bit for everyone, so rows sharing
+        # an operation and a bit are updated together
+        updates = defaultdict(list)
+        to_create = defaultdict(lambda: [0, 0])
+        for (student_id, month, bit), op in ops.items():
+            pk = existing.get((student_id, month))
+            if pk is not None:
+                updates[(op, bit)].append(pk)
+            elif op != CLEAR:
+                bitmap = to_create[(student_id, month)]
+                bitmap[0] |= bit
+                if op == PRESENT:
+                    bitmap[1] |= bit
+
+        for (op, bit), pks in updates.items():
+            for offset in range(0, len(pks), batch_size):
+                AttendanceBitmap.objects.filter(pk__in=pks[offset:offset + batch_size]).update(**_bit_update(op, bit))
+        bulk_create_or_update(AttendanceBitmap, [
+            AttendanceBitmap(student_id=student_id, month=month, recorded_days=recorded, present_days=present)
+            for (student_id, month), (recorded, present) in to_create.items()
+        ], lambda row: AttendanceBitmap.objects.filter(student_id=row.student_id, month=row.month).update(
+            **_merge_update(row.recorded_days, row.present_days)
+        ), batch_size=batch_size)
+
+
+def aggregate_bitmaps():
+    """Recompute {(student_id, month): (recorded_days, present_days)} from Attendance and the archive"""
+    bitmaps = defaultdict(lambda: [0, 0])
+    records = Attendance.objects.order_by().values_list('student_id', 'date', 'status')
+    for student_id, record_date, status in records.iterator(chunk_size=5000):
+        bit = day_bit(record_date)
+        bitmap = bitmaps[(student_id, month_start(record_date))]
+        bitmap[0] |= bit
+        if status == PRESENT:
+            bitmap[1] |= bit
+    archived = AttendanceArchive.objects.order_by().values_list('student_id', 'month', 'recorded_days', 'present_days')
+    for student_id, month, recorded_days, present_days in archived.iterator(chunk_size=5000):
+        bitmap = bitmaps[(student_id, month)]
+        bitmap[0] |= recorded_days
+        bitmap[1] |= present_days
+    return {key: tuple(bitmap) for key, bitmap in bitmaps.items()}
+
+
+def rebuild_bitmaps(batch_size=1000):
+    """Replace the AttendanceBitmap table with freshly built bitmaps"""
+    expected = aggregate_bitmaps()
+    with transaction.atomic():
+        AttendanceBitmap.objects.all().delete()
+        AttendanceBitmap.objects.bulk_create([
+            AttendanceBitmap(student_id=student_id, month=month, recorded_days=recorded, present_days=present)
+            for (student_id, month), (recorded, present) in expected.items()
+        ], batch_size=batch_size)
+    return len(expected)
+
+
+def verify_bitmaps():
+    """Return the (student_id, month) keys whose stored bitmaps differ from a fresh build"""
+    expected = aggregate_bitmaps()
+    stored = {
+        (student_id, month): (recorded, present)
+        for student_id, month, recorded, present in AttendanceBitmap.objects.values_list(
+            'student_id', 'month', 'recorded_days', 'present_days',
+        )
+    }
+    return sorted(
+        (key for key in expected.keys() | stored.keys()
+         if expected.get(key, (0, 0)) != stored.get(key, (0, 0))),
+        key=str,
+    )
+
+
+def bitmap_rows(start_date=None, end_date=None, students=None):
+    """(student_id, month, recorded_days, present_days) rows overlapping a date range"""
+    rows = AttendanceBitmap.objects.order_by()
+    if start_date:
+        rows = rows.filter(month__gte=month_start(start_date))
+    if end_date:
+        rows = rows.filter(month__lte=end_date)
+    if students is not None:
+        rows = rows.filter(student__in=students.values('pk'))
+    return rows.values_list('student_id', 'month', 'recorded_days', 'present_days')
+
+
+def attendance_percentages(start_date=None, end_date=None, students=None):
+    """{student_id: percentage present} over a date range, from the bitmaps"""
+    return {
+        student_id: round(row['present'] / row['total_days'] * 100, 1)
+        for student_id, row in count_days(bitmap_rows(start_date, end_date, students), start_date, end_date).items()
+    }
+
+
+def streaks(months):
+    """
+    Longest present and absent runs and the current run for one student.
+
+    `months` are (month, recorded_days, present_days) tuples in month order.
+    Days without a record (weekends, holidays) neither extend nor break a run.
+    """
+    result = {'longest_present': 0, 'longest_absent': 0, 'current_status': None, 'current_length': 0}
+    for month, recorded_days, present_days in months:
+        for _, status in iter_days(month, recorded_days, present_days):
+            if status == result['current_status']:
+                result['current_length'] += 1
+            else:
+                result['current_status'], result['current_length'] = status, 1
+            key = 'longest_present' if status == PRESENT else 'longest_absent'
+            result[key] = max(result[key], result['current_length'])
+    return result
+
+
+def current_run(months):
+    """
+    (status, length) of the run ending at a student's latest record.
+
+    `months` are (month, recorded_days, present_days) tuples in month
+    order. Walks back from the newest month and stops at the first day
+    with the other status, so only the months the run covers are read.
+    """
+    status, length = None, 0
+    for _, recorded_days, present_days in reversed(months):
+        if not recorded_days:
+            continue
+        if status is None:
+            latest = 1 << (recorded_days.bit_length() - 1)
+            status = PRESENT if present_days & latest else ABSENT
+        # Recorded days with the other status end the run
+        breaks = recorded_days & (~present_days if status == PRESENT else present_days)
+        length += (recorded_days >> breaks.bit_length()).bit_count()
+        if breaks:
+            break
+    return status, length
+
+
+def current_absence_streaks(min_days=3, since=None, students=None):
+    """
+    {student_id: days} for students whose latest records are `min_days` or more absences in a row.
+
+    Only months from `since` on are scanned (default: the last three
+    months), which is enough for any run worth flagging.
+    """
+    if since is None:
+        today = date.today()
+        months = today.year * 12 + today.month - 1 - 2
+        since = date(months // 12, months % 12 + 1, 1)
+    histories = defaultdict(list)
+    for student_id, month, recorded_days, present_days in bitmap_rows(since, None, students).order_by('student_id', 'month'):
+        histories[student_id].append((month, recorded_days, present_days))
+    flagged = {}
+    for student_id, months in histories.items():
+        status, length = current_run(months)
+        if status == ABSENT and length >= min_days:
+            flagged[student_id] = length
+    return flagged
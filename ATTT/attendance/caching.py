@@ -0,0 +1,137 @@
+"""
+Dashboard cache helpers.
+
+Cached values are keyed by a name, the caller's key parts (student,
+teacher, filter, date bucket) and the current generation of every scope
+the value depends on. Invalidation bumps a scope's generation, so stale
+entries are never read again and simply age out through the backend's
+TTL/LRU culling. Generations are bumped from the signal receivers in
+`attendance.signals` and by the archive, which moves rows without signals. Large template fragments (roster tables) are
+versioned the same way through `fragment_cache`.
+"""
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+_counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def cache_stats():
+    """In-process hit/miss/invalidation counters and the hit ratio"""
+    with _counters_lock:
+        stats = dict(_counters)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0
+    return stats
+
+
+def reset_cache_stats():
+    with _counters_lock:
+        for name in _counters:
+            _counters[name] = 0
+
+
+def _generation_key(scope, pk=None):
+    return f'attendance:gen:{scope}' if pk is None else f'attendance:gen:{scope}:{pk}'
+
+
+def bump_generation(scope, pk=None):
+    """Invalidate every cached value that depends on (scope, pk)"""
+    key = _generation_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing key: start a fresh generation
+        cache.set(key, 1, None)
+    _count('invalidations')
+
+
+def bump_on_commit(scopes):
+    """Bump each distinct (scope, pk) generation once the current transaction commits"""
+    for scope, pk in set(scopes):
+        transaction.on_commit(partial(bump_generation, scope, pk))
+
+
+def attendance_scopes(states):
+    """The (scope, pk) pairs that cached attendance for these AttendanceStates depends on"""
+    for state in states:
+        yield 'student', state.student_id
+        yield 'teacher', state.teacher_id
+        yield 'day', state.date
+
+
+def _value_key(name, parts, scopes, generations):
+    generation_keys = [_generation_key(scope, pk) for scope, pk in scopes]
+    version = '.'.join(str(generations.get(key, 0)) for key in generation_keys)
+    return ':'.join(['attendance', name, *map(str, parts), version])
+
+
+def _timeout(timeout):
+    if timeout is None:
+        return getattr(settings, 'ATTENDANCE_CACHE_TIMEOUT', 60)
+    return timeout
+
+
+def cached_value(name, parts, scopes, compute, timeout=None):
+    """
+    Return the cached result of `compute()` for `name` and `parts`.
+
+    `scopes` lists the (scope, pk) pairs the value depends on; bumping any
+    of them with `bump_generation` makes the next call recompute.
+    """
+    generations = cache.get_many([_generation_key(scope, pk) for scope, pk in scopes])
+    key = _value_key(name, parts, scopes, generations)
+
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    value = compute()
+    cache.set(key, value, _timeout(timeout))
+    return value
+
+
+async def acached_value(name, parts, scopes, compute, timeout=None):
+    """Async cached_value; `compute` is a coroutine function"""
+    generations = await cache.aget_many([_generation_key(scope, pk) for scope, pk in scopes])
+    key = _value_key(name, parts, scopes, generations)
+
+    value = await cache.aget(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    value = await compute()
+    await cache.aset(key, value, _timeout(timeout))
+    return value
+
+
+def fragment_cache(name, parts, scopes, timeout=None):
+    """
+    Timeout and version for a `{% cache %}` template fragment.
+
+    The version holds `parts` and the current generation of every scope,
+    so pass both to the tag (`{% cache fragment.timeout name fragment.version %}`)
+    and the fragment is retired exactly like a cached_value. Compute
+    fragment data lazily in the view so a hit skips the queries as well.
+    """
+    generations = cache.get_many([_generation_key(scope, pk) for scope, pk in scopes])
+    return {'timeout': _timeout(timeout), 'version': _value_key(name, parts, scopes, generations)}
+
+
+async def afragment_cache(name, parts, scopes, timeout=None):
+    """Async fragment_cache"""
+    generations = await cache.aget_many([_generation_key(scope, pk) for scope, pk in scopes])
+    return {'timeout': _timeout(timeout), 'version': _value_key(name, parts, scopes, generations)}
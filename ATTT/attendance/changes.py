@@ -0,0 +1,184 @@
+"""
+Incremental change feed for attendance and leave records.
+
+Sync clients keep an opaque cursor and ask for everything changed after
+it. Live rows are read through the `(updated_at, id)` indexes, which every
+write path keeps current, and deletions through Tombstone rows written by
+the post_delete receivers. A page is one keyset range scan per source of
+at most `limit + 1` rows, merged in (timestamp, source, id) order, so a
+poll costs the number of changes rather than the size of the tables.
+
+Rows stamped in the last ATTENDANCE_CHANGE_FEED_LAG seconds are held back
+until a later poll: a transaction that stamped `updated_at` earlier but
+commits later would otherwise land behind a cursor that already passed
+it. Tombstones are pruned after ATTENDANCE_TOMBSTONE_RETENTION_DAYS and
+older cursors are refused, so those clients resync from scratch.
+Archiving moves history rather than deleting it and leaves no tombstones.
+"""
+import base64
+import binascii
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Attendance, Leave, Tombstone
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+ATTENDANCE_FIELDS = ('id', 'student_id', 'teacher_id', 'date', 'status', 'updated_at')
+LEAVE_FIELDS = ('id', 'student_id', 'date', 'status', 'reason', 'approval', 'approved_by_id', 'updated_at')
+TOMBSTONE_FIELDS = ('id', 'kind', 'object_id', 'student_id', 'date', 'deleted_at')
+
+
+class CursorExpired(Exception):
+    """The cursor is older than the retained tombstones"""
+
+
+def change_feed_lag():
+    return timedelta(seconds=getattr(settings, 'ATTENDANCE_CHANGE_FEED_LAG', 5))
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'ATTENDANCE_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def encode_cursor(timestamp, source, pk):
+    """Opaque cursor for the change at (timestamp, source index, pk)"""
+    raw = f'{timestamp.isoformat()}|{source}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, source index, pk) for a cursor, or None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, source, pk = raw.split('|', 2)
+        timestamp = parse_datetime(timestamp)
+        source, pk = int(source), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if timestamp is None or timestamp.tzinfo is None:
+        return None
+    return timestamp, source, pk
+
+
+def _upsert(kind, timestamp_field):
+    def serialize(row):
+        return {
+            'type': kind,
+            'op': 'upsert',
+            **row,
+            'date': row['date'].isoformat(),
+            timestamp_field: row[timestamp_field].isoformat(),
+        }
+    return serialize
+
+
+def _delete(row):
+    return {
+        'type': row['kind'],
+        'op': 'delete',
+        'id': row['object_id'],
+        'student_id': row['student_id'],
+        'date': row['date'].isoformat(),
+        'deleted_at': row['deleted_at'].isoformat(),
+    }
+
+
+# (queryset, timestamp field, serializer); the index is part of the cursor,
+# so only ever append
+SOURCES = (
+    (Attendance.objects.values(*ATTENDANCE_FIELDS), 'updated_at', _upsert('attendance', 'updated_at')),
+    (Leave.objects.values(*LEAVE_FIELDS), 'updated_at', _upsert('leave', 'updated_at')),
+    (Tombstone.objects.values(*TOMBSTONE_FIELDS), 'deleted_at', _delete),
+)
+
+
+def change_querysets(position, horizon, limit, student=None):
+    """
+    (source index, timestamp field, queryset, serializer) for one page.
+
+    Each queryset is a range over its source's `(timestamp, id)` index:
+    rows after `position` up to `horizon`, at most `limit + 1` of them.
+    """
+    querysets = []
+    for source, (queryset, field, serialize) in enumerate(SOURCES):
+        queryset = queryset.filter(**{f'{field}__lte': horizon})
+        if student is not None:
+            queryset = queryset.filter(student_id=student.pk)
+        if position is not None:
+            timestamp, after_source, pk = position
+            if source < after_source:
+                queryset = queryset.filter(**{f'{field}__gt': timestamp})
+            else:
+                queryset = queryset.filter(**{f'{field}__gte': timestamp})
+                if source == after_source:
+                    queryset = queryset.exclude(**{field: timestamp, 'id__lte': pk})
+        querysets.append((source, field, queryset.order_by(field, 'id')[:limit + 1], serialize))
+    return querysets
+
+
+def change_page(cursor=None, limit=PAGE_SIZE, student=None):
+    """
+    Changes after `cursor` as {'changes', 'next_cursor', 'has_more'}.
+
+    Without a cursor the feed starts from the oldest row, which is how a
+    client does its first full sync. `student` limits the feed to one
+    student's records. Raises ValueError for a malformed cursor and
+    CursorExpired for one older than the tombstone retention.
+    """
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise ValueError('Malformed cursor.')
+    now = timezone.now()
+    if position is not None and position[0] < now - tombstone_retention():
+        raise CursorExpired
+    horizon = now - change_feed_lag()
+
+    rows = []
+    for source, field, queryset, serialize in change_querysets(position, horizon, limit, student):
+        rows.extend(((row[field], source, row['id']), serialize(row)) for row in queryset)
+    rows.sort(key=lambda row: row[0])
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        next_cursor = encode_cursor(*rows[-1][0])
+    elif position is None or horizon > position[0]:
+        # Every change up to the horizon has been returned, so move the cursor
+        # there; quiet clients then keep a fresh cursor instead of expiring
+        next_cursor = encode_cursor(horizon, len(SOURCES), 0)
+    else:
+        next_cursor = cursor
+    return {
+        'changes': [change for _, change in rows],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    }
+
+
+def add_tombstone(kind, instance):
+    """Record the deletion of an Attendance or Leave row"""
+    Tombstone.objects.create(
+        kind=kind, object_id=instance.pk, student_id=instance.student_id, date=instance.date,
+    )
+
+
+def add_tombstones(kind, rows, batch_size=1000):
+    """Record the deletion of many rows given as (pk, student_id, date) tuples"""
+    Tombstone.objects.bulk_create([
+        Tombstone(kind=kind, object_id=pk, student_id=student_id, date=row_date)
+        for pk, student_id, row_date in rows
+    ], batch_size=batch_size)
+
+
+def prune_tombstones(before=None):
+    """Delete tombstones older than the retention period; returns the number deleted"""
+    before = before or timezone.now() - tombstone_retention()
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=before).delete()
+    return deleted
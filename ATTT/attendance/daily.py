@@ -0,0 +1,182 @@
+"""
+Daily attendance aggregates for the calendar heatmap.
+
+DailyAttendanceAggregate holds present/absent counts per (date, teacher).
+`apply_daily_changes` keeps it in sync from `attendance_changed` the same
+way `attendance.stats` maintains its counters: one read, one relative
+UPDATE per distinct delta and a conflict-safe bulk insert for new days
+(`attendance.stats.bulk_create_or_update`). A whole roll call
+is one delta per status, so marking a class costs a handful of statements.
+Archiving leaves the rows alone because the archive keeps the same
+history. The heatmap then reads a year as one range query over the
+(date, teacher) index instead of grouping the Attendance table.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .archive import default_cutoff
+from .bitmaps import iter_days
+from .models import Attendance, AttendanceArchive, DailyAttendanceAggregate
+from .stats import bulk_create_or_update
+
+COUNTER_FIELDS = ('present', 'absent')
+GROUPS = ('teacher', 'subject', 'school')
+
+
+def compute_daily_deltas(changes):
+    """Map (date, teacher_id) keys to [present, absent] deltas"""
+    deltas = defaultdict(lambda: [0, 0])
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            delta = deltas[(state.date, state.teacher_id)]
+            delta[0 if state.status == 'present' else 1] += sign
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def _counter_update(delta):
+    return {field: Greatest(F(field) + value, 0) for field, value in zip(COUNTER_FIELDS, delta) if value}
+
+
+def _existing_rows(deltas):
+    """Map the (date, teacher_id) keys in `deltas` that already have a row to its pk"""
+    rows = DailyAttendanceAggregate.objects.filter(
+        date__in={key[0] for key in deltas},
+        teacher_id__in={key[1] for key in deltas},
+    ).values_list('pk', 'date', 'teacher_id')
+    return {(day, teacher_id): pk for pk, day, teacher_id in rows}
+
+
+def apply_daily_changes(changes):
+    """Apply attendance (old, new) pairs to the DailyAttendanceAggregate table"""
+    deltas = compute_daily_deltas(changes)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        existing = _existing_rows(deltas)
+
+        updates = defaultdict(list)
+        to_create = []
+        for key, delta in deltas.items():
+            pk = existing.get(key)
+            if pk is not None:
+                updates[tuple(delta)].append(pk)
+            elif any(value > 0 for value in delta):
+                # As with the counters, negative deltas without a row only
+                # come from cascade deletes
+                day, teacher_id = key
+                present, absent = (max(value, 0) for value in delta)
+                to_create.append(DailyAttendanceAggregate(
+                    date=day, teacher_id=teacher_id, present=present, absent=absent,
+                ))
+
+        for delta, pks in updates.items():
+            DailyAttendanceAggregate.objects.filter(pk__in=pks).update(**_counter_update(delta))
+        bulk_create_or_update(DailyAttendanceAggregate, to_create, lambda row: DailyAttendanceAggregate.objects.filter(
+            date=row.date, teacher_id=row.teacher_id,
+        ).update(**_counter_update(deltas[(row.date, row.teacher_id)])))
+
+
+def aggregate_daily():
+    """Recompute {(date, teacher_id): (present, absent)} from Attendance and the archive"""
+    counts = defaultdict(lambda: [0, 0])
+    records = Attendance.objects.order_by().values_list('date', 'teacher_id', 'status')
+    for day, teacher_id, status in records.iterator(chunk_size=5000):
+        counts[(day, teacher_id)][0 if status == 'present' else 1] += 1
+    archived = AttendanceArchive.objects.order_by().values_list('teacher_id', 'month', 'recorded_days', 'present_days')
+    for teacher_id, month, recorded_days, present_days in archived.iterator(chunk_size=5000):
+        for day, status in iter_days(month, recorded_days, present_days):
+            counts[(day, teacher_id)][0 if status == 'present' else 1] += 1
+    return {key: tuple(count) for key, count in counts.items()}
+
+
+def rebuild_daily(batch_size=1000):
+    """Replace the DailyAttendanceAggregate table with fresh counts"""
+    expected = aggregate_daily()
+    with transaction.atomic():
+        DailyAttendanceAggregate.objects.all().delete()
+        DailyAttendanceAggregate.objects.bulk_create([
+            DailyAttendanceAggregate(date=day, teacher_id=teacher_id, present=present, absent=absent)
+            for (day, teacher_id), (present, absent) in expected.items()
+        ], batch_size=batch_size)
+    return len(expected)
+
+
+def verify_daily():
+    """Return the (date, teacher_id) keys whose stored counts differ from a fresh aggregation"""
+    expected = aggregate_daily()
+    stored = {
+        (day, teacher_id): (present, absent)
+        for day, teacher_id, present, absent in DailyAttendanceAggregate.objects.values_list(
+            'date', 'teacher_id', 'present', 'absent',
+        )
+    }
+    return sorted(
+        (key for key in expected.keys() | stored.keys()
+         if expected.get(key, (0, 0)) != stored.get(key, (0, 0))),
+        key=str,
+    )
+
+
+def daily_rows(start_date, end_date, teacher_id=None, subject=None):
+    """(date, teacher_id, teacher name, subject, present, absent) rows in one range query"""
+    rows = DailyAttendanceAggregate.objects.filter(date__gte=start_date, date__lte=end_date).order_by()
+    if teacher_id:
+        rows = rows.filter(teacher_id=teacher_id)
+    if subject:
+        rows = rows.filter(teacher__subject__iexact=subject)
+    return rows.values_list('date', 'teacher_id', 'teacher__name', 'teacher__subject', 'present', 'absent')
+
+
+def _rate(present, absent):
+    total = present + absent
+    return round(present / total * 100, 1) if total else 0
+
+
+def heatmap(start_date=None, end_date=None, group='teacher', teacher_id=None, subject=None):
+    """
+    Daily attendance rates for a calendar heatmap.
+
+    Rows are grouped by teacher, by subject (case-insensitive) or for the
+    whole school. Each series lists [date, present, absent, rate] per day
+    in date order. The range defaults to the current academic year.
+    """
+    if group not in GROUPS:
+        raise ValueError(f'group must be one of {", ".join(GROUPS)}')
+    end_date = end_date or date.today()
+    start_date = start_date or default_cutoff(end_date)
+
+    series = {}
+    days = defaultdict(lambda: [0, 0])
+    for day, row_teacher, name, row_subject, present, absent in daily_rows(start_date, end_date, teacher_id, subject):
+        if group == 'teacher':
+            key, label = row_teacher, f'{name} ({row_subject})'
+        elif group == 'subject':
+            key = row_subject.strip().casefold()
+            label = series.get(key, {}).get('label', row_subject.strip())
+        else:
+            key, label = 'school', 'Whole school'
+        series.setdefault(key, {'key': key, 'label': label})
+        count = days[(key, day)]
+        count[0] += present
+        count[1] += absent
+
+    for (key, day), (present, absent) in sorted(days.items(), key=lambda item: item[0][1]):
+        series[key].setdefault('days', []).append([day.isoformat(), present, absent, _rate(present, absent)])
+    for entry in series.values():
+        present = sum(day[1] for day in entry['days'])
+        absent = sum(day[2] for day in entry['days'])
+        entry['rate'] = _rate(present, absent)
+
+    return {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'group': group,
+        'series': sorted(series.values(), key=lambda entry: entry['label'].casefold()),
+    }
@@ -0,0 +1,228 @@
+"""
+Streaming attendance exports (CSV and XLSX) for views and management commands.
+
+Rows are read with values_list().iterator(), so memory stays flat no matter
+how large the date range is, and each writer yields encoded chunks as soon
+as they are ready. Archived months are expanded from the archive bitmaps
+when an ArchivedRecords is passed in.
+"""
+import csv
+import heapq
+import zipfile
+from collections import defaultdict
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from .archive import archive_queryset, iter_archived_rows
+from .bitmaps import iter_days, month_mask
+from .models import Attendance
+
+EXPORT_CHUNK_SIZE = 2000
+
+ROW_HEADER = ['Date', 'Roll No', 'Student', 'Status', 'Teacher']
+
+
+def export_queryset(start_date=None, end_date=None, teacher=None, student=None):
+    """Attendance rows matching the export filters, without default ordering"""
+    records = Attendance.objects.order_by()
+    if start_date:
+        records = records.filter(date__gte=start_date)
+    if end_date:
+        records = records.filter(date__lte=end_date)
+    if teacher is not None:
+        records = records.filter(teacher=teacher)
+    if student is not None:
+        records = records.filter(student=student)
+    return records
+
+
+class ArchivedRecords:
+    """Archived attendance matching the export filters, expanded from the day bitmaps"""
+
+    def __init__(self, start_date=None, end_date=None, teacher=None, student=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.rows = archive_queryset(start_date, end_date, teacher, student).values_list(
+            'student__roll_no', 'student__name', 'teacher__name', 'month', 'recorded_days', 'present_days',
+        )
+
+    def dates(self):
+        """Every date with at least one archived record"""
+        recorded = defaultdict(int)
+        for month, recorded_days in self.rows.values_list('month', 'recorded_days').iterator():
+            recorded[month] |= recorded_days & month_mask(month, self.start_date, self.end_date)
+        return {record_date for month, bits in recorded.items() for record_date, _ in iter_days(month, bits, 0)}
+
+    def by_date(self, chunk_size=EXPORT_CHUNK_SIZE):
+        """(date, roll_no, name, status, teacher_name) ordered by date and roll number"""
+        rows = self.rows.order_by('month', 'student__roll_no').iterator(chunk_size=chunk_size)
+        records = iter_archived_rows(rows, self.start_date, self.end_date)
+        # Rows come month by month, so only one month is sorted in memory at a time
+        for _, month_records in groupby(records, key=lambda record: record[0].replace(day=1)):
+            yield from sorted(month_records, key=lambda record: (record[0], record[1]))
+
+    def by_student(self, chunk_size=EXPORT_CHUNK_SIZE):
+        """(date, roll_no, name, status, teacher_name) grouped by roll number"""
+        rows = self.rows.order_by('student__roll_no', 'month').iterator(chunk_size=chunk_size)
+        return iter_archived_rows(rows, self.start_date, self.end_date)
+
+
+def iter_attendance_rows(records, chunk_size=EXPORT_CHUNK_SIZE, archived=None):
+    """Header plus one row per attendance record, oldest first (archived months first)"""
+    yield ROW_HEADER
+    if archived is not None:
+        for record_date, roll_no, name, status, teacher_name in archived.by_date(chunk_size):
+            yield [record_date.isoformat(), roll_no, name, status, teacher_name]
+    rows = (
+        records.order_by('date', 'student__roll_no')
+        .values_list('date', 'student__roll_no', 'student__name', 'status', 'teacher__name')
+        .iterator(chunk_size=chunk_size)
+    )
+    for record_date, roll_no, name, status, teacher_name in rows:
+        yield [record_date.isoformat(), roll_no, name, status, teacher_name]
+
+
+def iter_matrix_rows(records, chunk_size=EXPORT_CHUNK_SIZE, archived=None):
+    """Pivoted students x dates table with P/A cells, one row per student"""
+    dates = set(records.order_by('date').values_list('date', flat=True).distinct())
+    if archived is not None:
+        dates |= archived.dates()
+    dates = sorted(dates)
+    columns = {record_date: index for index, record_date in enumerate(dates)}
+    yield ['Roll No', 'Student'] + [record_date.isoformat() for record_date in dates] + ['Present', 'Absent']
+
+    rows = (
+        records.order_by('student__roll_no', 'date')
+        .values_list('student__roll_no', 'student__name', 'date', 'status')
+        .iterator(chunk_size=chunk_size)
+    )
+    if archived is not None:
+        old_rows = (
+            (roll_no, name, record_date, status)
+            for record_date, roll_no, name, status, _ in archived.by_student(chunk_size)
+        )
+        rows = heapq.merge(old_rows, rows, key=lambda row: row[0])
+    for (roll_no, name), student_rows in groupby(rows, key=lambda row: (row[0], row[1])):
+        cells = [''] * len(dates)
+        present = absent = 0
+        for _, _, record_date, status in student_rows:
+            if status == 'present':
+                cells[columns[record_date]] = 'P'
+                present += 1
+            else:
+                cells[columns[record_date]] = 'A'
+                absent += 1
+        yield [roll_no, name] + cells + [present, absent]
+
+
+class Echo:
+    """File-like object that hands back whatever is written to it"""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, rows_per_chunk=500):
+    """Encode rows as CSV text, yielding a chunk every `rows_per_chunk` rows"""
+    writer = csv.writer(Echo())
+    pending = []
+    for row in rows:
+        pending.append(writer.writerow(row))
+        if len(pending) >= rows_per_chunk:
+            yield ''.join(pending)
+            pending = []
+    if pending:
+        yield ''.join(pending)
+
+
+class _ChunkBuffer:
+    """Unseekable write target that lets zipfile output be drained while streaming"""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, int):
+        return f'<c t="n"><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def stream_xlsx(rows, rows_per_chunk=500):
+    """
+    Encode rows as a single-sheet XLSX workbook, yielding bytes while writing.
+
+    Uses inline strings and zipfile's streaming mode, so no spreadsheet
+    library is needed and the whole file is never held in memory.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            pending = []
+            for row in rows:
+                pending.append('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>')
+                if len(pending) >= rows_per_chunk:
+                    sheet.write(''.join(pending).encode())
+                    pending = []
+                    chunk = buffer.drain()
+                    if chunk:
+                        yield chunk
+            sheet.write(''.join(pending).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
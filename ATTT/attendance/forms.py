@@ -1,7 +1,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Student, Teacher, Attendance, Leave
+from .models import Student, Teacher, Section, Attendance, Leave
+from .sections import create_subject_section, enroll_by_subject
 
 
 class StudentRegistrationForm(UserCreationForm):
@@ -9,21 +10,33 @@ class StudentRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True)
     roll_no = forms.CharField(max_length=20, required=True, help_text="Enter your roll number")
     name = forms.CharField(max_length=100, required=True)
+    subject = forms.CharField(
+        max_length=100, required=True, help_text="Subject of your class; it decides which teachers see you",
+        widget=forms.TextInput(attrs={'list': 'subject-options'}),
+    )
     
     class Meta:
         model = User
-        fields = ('username', 'email', 'password1', 'password2', 'roll_no', 'name')
+        fields = ('username', 'email', 'password1', 'password2', 'roll_no', 'name', 'subject')
+    
+    def subject_options(self):
+        """Subjects of existing sections, suggested by the subject field"""
+        return Section.objects.order_by('subject').values_list('subject', flat=True).distinct()
     
     def save(self, commit=True):
         user = super().save(commit=False)
         user.email = self.cleaned_data['email']
         if commit:
             user.save()
-            Student.objects.create(
+            student = Student.objects.create(
                 user=user,
                 roll_no=self.cleaned_data['roll_no'],
-                name=self.cleaned_data['name']
+                name=self.cleaned_data['name'],
+                subject=self.cleaned_data['subject'].strip(),
             )
+            # Join the sections teaching the subject; a teacher who registers
+            # for it later picks the student up in create_subject_section
+            enroll_by_subject([student])
         return user
 
 
@@ -42,11 +55,13 @@ class TeacherRegistrationForm(UserCreationForm):
         user.email = self.cleaned_data['email']
         if commit:
             user.save()
-            Teacher.objects.create(
+            teacher = Teacher.objects.create(
                 user=user,
                 name=self.cleaned_data['name'],
                 subject=self.cleaned_data['subject']
             )
+            # Start the teacher off with the students who already list their subject
+            create_subject_section(teacher)
         return user
 
 
@@ -0,0 +1,200 @@
+"""
+Chunked CSV imports for student rosters and historical attendance.
+"""
+import csv
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .archive import archive_watermark
+from .models import Student, Teacher
+from .sections import enroll_by_subject
+from .summaries import parse_date_param
+from .writes import record_attendance, VALID_STATUSES
+
+
+def read_csv_chunks(file, chunk_size=1000):
+    """Yield lists of row dicts from a CSV file object without loading it all"""
+    reader = csv.DictReader(file)
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_roll_no(roll_no):
+    """Run the Student.roll_no field validators (length limits) on a value"""
+    field = Student._meta.get_field('roll_no')
+    field.clean(roll_no, None)
+
+
+def validate_username(username):
+    """Run the User.username field validators (allowed characters, length) on a value"""
+    field = User._meta.get_field('username')
+    field.clean(username, None)
+
+
+def hash_passwords(passwords, workers=4):
+    """Hash passwords in a thread pool; PBKDF2 releases the GIL while it runs"""
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(make_password, passwords))
+
+
+def import_student_chunk(rows, hash_workers=4):
+    """
+    Validate, deduplicate and bulk insert one chunk of roster rows.
+
+    Rows need `roll_no` and `name`, and may carry `username` (defaults to
+    the roll number), `email`, `subject` and `password`. Rows without a
+    password get an unusable one so the student can be sent an invite.
+    Students are enrolled in the sections teaching their subject, or in
+    every section when they have none (see `sections.enroll_by_subject`).
+    Returns (created_students, errors) where errors are (row, message).
+    """
+    errors = []
+    candidates = {}
+    usernames = {}
+    seen_usernames = set()
+    for row in rows:
+        roll_no = (row.get('roll_no') or '').strip()
+        name = (row.get('name') or '').strip()
+        try:
+            validate_roll_no(roll_no)
+        except ValidationError as exc:
+            errors.append((row, f'Invalid roll number {roll_no!r}: {" ".join(exc.messages)}'))
+            continue
+        if not name:
+            errors.append((row, f'Missing name for roll number {roll_no}'))
+            continue
+        username = (row.get('username') or roll_no).strip()
+        try:
+            validate_username(username)
+        except ValidationError as exc:
+            errors.append((row, f'Invalid username {username!r}: {" ".join(exc.messages)}'))
+            continue
+        if roll_no in candidates:
+            errors.append((row, f'Duplicate roll number {roll_no} in file'))
+            continue
+        if username in seen_usernames:
+            errors.append((row, f'Duplicate username {username} in file'))
+            continue
+        candidates[roll_no] = row
+        usernames[roll_no] = username
+        seen_usernames.add(username)
+
+    # One lookup per chunk for each unique key
+    existing_roll_nos = set(
+        Student.objects.filter(roll_no__in=candidates).values_list('roll_no', flat=True)
+    )
+    existing_usernames = set(
+        User.objects.filter(username__in=usernames.values()).values_list('username', flat=True)
+    )
+
+    new_rows = []
+    for roll_no, row in candidates.items():
+        if roll_no in existing_roll_nos:
+            errors.append((row, f'Roll number {roll_no} already exists'))
+        elif usernames[roll_no] in existing_usernames:
+            errors.append((row, f'Username {usernames[roll_no]} already exists'))
+        else:
+            new_rows.append((roll_no, row))
+
+    passwords = [row.get('password') or None for _, row in new_rows]
+    to_hash = [password for password in passwords if password]
+    hashed = iter(hash_passwords(to_hash, hash_workers)) if to_hash else iter(())
+
+    users = []
+    for (roll_no, row), password in zip(new_rows, passwords):
+        user = User(username=usernames[roll_no], email=(row.get('email') or '').strip())
+        if password:
+            user.password = next(hashed)
+        else:
+            user.set_unusable_password()
+        users.append(user)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        students = Student.objects.bulk_create([
+            Student(
+                user=user,
+                roll_no=roll_no,
+                name=row['name'].strip(),
+                subject=(row.get('subject') or '').strip() or None,
+            )
+            for user, (roll_no, row) in zip(users, new_rows)
+        ])
+        enroll_by_subject(students)
+    return students, errors
+
+
+def import_attendance_chunk(rows, default_teacher=None):
+    """
+    Write one chunk of historical attendance through the batched write path.
+
+    Rows need `date`, `roll_no` and `status`, plus `teacher` (a teacher
+    username) unless a default teacher is given. Returns (counts, errors).
+    """
+    errors = []
+    roll_nos = {(row.get('roll_no') or '').strip() for row in rows}
+    student_ids = dict(Student.objects.filter(roll_no__in=roll_nos).values_list('roll_no', 'pk'))
+    teacher_names = {(row.get('teacher') or '').strip() for row in rows} - {''}
+    teachers = {
+        teacher.user.username: teacher
+        for teacher in Teacher.objects.filter(user__username__in=teacher_names).select_related('user')
+    }
+
+    watermark = archive_watermark()
+    groups = defaultdict(dict)
+    for row in rows:
+        roll_no = (row.get('roll_no') or '').strip()
+        status = (row.get('status') or '').strip().lower()
+        try:
+            # Malformed and impossible dates (2024-02-30) are both row errors
+            attendance_date = parse_date_param((row.get('date') or '').strip())
+        except ValueError:
+            attendance_date = None
+        teacher_name = (row.get('teacher') or '').strip()
+        teacher = teachers.get(teacher_name) if teacher_name else default_teacher
+
+        if roll_no not in student_ids:
+            errors.append((row, f'Unknown roll number {roll_no!r}'))
+        elif status not in VALID_STATUSES:
+            errors.append((row, f'Invalid status {status!r}'))
+        elif attendance_date is None:
+            errors.append((row, f'Invalid date {row.get("date")!r}'))
+        elif watermark and attendance_date < watermark:
+            errors.append((row, f'Date {attendance_date} is in an archived month'))
+        elif teacher is None:
+            errors.append((row, f'Unknown teacher {teacher_name!r}'))
+        else:
+            groups[(teacher, attendance_date)][student_ids[roll_no]] = status
+
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+    with transaction.atomic():
+        for (teacher, attendance_date), statuses in groups.items():
+            result = record_attendance(teacher, attendance_date, statuses)
+            for key in counts:
+                counts[key] += result[key]
+    return counts, errors
+
+
+def invite_rows(users, base_url):
+    """(username, email, link) rows that let imported users choose a password"""
+    for user in users:
+        path = reverse('password_reset_confirm', kwargs={
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        })
+        yield user.username, user.email, base_url.rstrip('/') + path
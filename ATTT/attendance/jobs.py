@@ -0,0 +1,207 @@
+"""
+Database-backed background jobs.
+
+Views and commands `enqueue` a Job row and return immediately; the
+run_worker command claims due jobs (highest priority first) and runs the
+registered task for each one in a thread or process pool. Claiming is a
+conditional UPDATE (or SELECT ... FOR UPDATE SKIP LOCKED where the
+database supports it), so several workers can share one queue with only
+SQLite or PostgreSQL. Failed jobs are retried with exponential backoff.
+The worker refreshes the heartbeat of its running jobs on a timer, so jobs
+whose worker died are requeued once their heartbeat goes stale.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+# kind -> function(progress, **payload); filled by @task in attendance.tasks
+TASKS = {}
+
+PROGRESS_INTERVAL = 1.0
+
+# Database alias for progress writes on SQLite; see _progress_alias
+PROGRESS_ALIAS = 'attendance_job_progress'
+
+
+class UnknownTaskError(ValueError):
+    """A job was enqueued or claimed for a kind with no registered task"""
+
+
+def task(kind):
+    """Register a function as the task for jobs of `kind`"""
+    def register(function):
+        TASKS[kind] = function
+        return function
+    return register
+
+
+def output_dir():
+    """Directory for files produced by jobs (exports)"""
+    path = getattr(settings, 'ATTENDANCE_JOB_OUTPUT_DIR', settings.BASE_DIR / 'job_output')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(kind, payload=None, priority=0, user=None, max_attempts=3, delay=None):
+    """Queue a job of a registered `kind`; it becomes visible to workers on commit"""
+    if kind not in TASKS:
+        raise UnknownTaskError(f'No task registered for {kind!r}.')
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+        created_by=user,
+    )
+
+
+def due_jobs(now=None):
+    """Queued jobs whose run_after has passed, in claim order (job_queue_idx)"""
+    return Job.objects.filter(status=Job.QUEUED, run_after__lte=now or timezone.now()).order_by(
+        '-priority', 'run_after', 'pk',
+    )
+
+
+def claim_job(worker, now=None):
+    """Mark the next due job as running for `worker` and return it, or None"""
+    now = now or timezone.now()
+    claim = {'status': Job.RUNNING, 'worker': worker, 'started_at': now, 'heartbeat_at': now}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = due_jobs(now).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(attempts=job.attempts + 1, **claim)
+        job.refresh_from_db()
+        return job
+
+    # Without SKIP LOCKED another worker may win the race for a candidate;
+    # the status condition makes sure only one UPDATE succeeds
+    for pk, attempts in due_jobs(now).values_list('pk', 'attempts')[:10]:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(attempts=attempts + 1, **claim):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    """Backoff before retry number `attempts`: base delay doubled per attempt"""
+    base = getattr(settings, 'ATTENDANCE_JOB_RETRY_DELAY', 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+class JobProgress:
+    """
+    Progress callback passed to every task as its first argument.
+
+    `progress(done, total, message)` stores the percentage and refreshes the
+    job's heartbeat, writing at most once a second unless the percentage moved.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.last_write = 0
+
+    def __call__(self, done, total=None, message=''):
+        percent = min(100, int(done * 100 / total)) if total else self.job.progress
+        now = time.monotonic()
+        if percent == self.job.progress and now - self.last_write < PROGRESS_INTERVAL:
+            return
+        values = {'progress': percent, 'progress_message': message[:200], 'heartbeat_at': timezone.now()}
+        try:
+            _update_job(self.job.pk, values)
+        except DatabaseError:
+            # Progress is best-effort; the next call tries again
+            return
+        self.job.progress, self.job.progress_message = percent, values['progress_message']
+        self.last_write = now
+
+
+_alias_lock = threading.Lock()
+
+
+def _progress_alias():
+    # A task streaming a large read keeps a SQLite snapshot open, and SQLite
+    # cannot upgrade that snapshot to a write once another worker has
+    # committed. Progress therefore goes through a second alias for the same
+    # database (connections are per thread, like the default one); other
+    # databases write on the task's own connection.
+    if connection.vendor != 'sqlite':
+        return DEFAULT_DB_ALIAS
+    with _alias_lock:
+        if PROGRESS_ALIAS not in connections.settings:
+            connections.settings[PROGRESS_ALIAS] = {**connections[DEFAULT_DB_ALIAS].settings_dict}
+    return PROGRESS_ALIAS
+
+
+def _close_progress_connection():
+    if PROGRESS_ALIAS in connections.settings:
+        connections[PROGRESS_ALIAS].close()
+
+
+def _update_job(pk, values):
+    Job.objects.using(_progress_alias()).filter(pk=pk).update(**values)
+
+
+def run_job(job):
+    """Run a claimed job's task and record success, a scheduled retry or failure"""
+    function = TASKS.get(job.kind)
+    try:
+        if function is None:
+            raise UnknownTaskError(f'No task registered for {job.kind!r}.')
+        result = function(JobProgress(job), **job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, error=error, worker='',
+                run_after=timezone.now() + retry_delay(job.attempts),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, error=error, finished_at=timezone.now())
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.SUCCEEDED, result=result, error='', progress=100, finished_at=timezone.now(),
+    )
+    return True
+
+
+def heartbeat(pks, worker):
+    """Refresh the heartbeat of the jobs `worker` is running; returns the number updated"""
+    return Job.objects.filter(pk__in=pks, status=Job.RUNNING, worker=worker).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale(stale_after):
+    """Requeue running jobs whose worker stopped sending heartbeats; returns the count"""
+    cutoff = timezone.now() - stale_after
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff)
+    exhausted = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error='Worker stopped responding.', finished_at=timezone.now(),
+    )
+    return exhausted + stale.update(status=Job.QUEUED, worker='', run_after=timezone.now())
+
+
+def execute(pk):
+    """Run the claimed job `pk`; the entry point for worker threads and processes"""
+    try:
+        return run_job(Job.objects.get(pk=pk))
+    finally:
+        # Worker threads each hold their own connections; do not leak them
+        _close_progress_connection()
+        connection.close()
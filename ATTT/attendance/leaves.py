@@ -0,0 +1,158 @@
+"""
+Per-student leave summaries shared by the leave info page and the student
+dashboard, and bulk approval for the leave review page and the admin.
+"""
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .archive import archive_watermark
+from .caching import cached_value
+from .models import Attendance, Leave
+from .sections import teacher_students
+from .signals import invalidate_leaves
+from .writes import record_attendance
+
+
+def student_leaves(student):
+    """A student's leave requests, newest leave date first (leave_student_date_idx)"""
+    return Leave.objects.filter(student=student).order_by('-date')
+
+
+def leave_status_queryset():
+    """Leave requests per status in one grouped query (leave_status_created_id_idx)"""
+    return Leave.objects.order_by().values('status').annotate(count=Count('id'))
+
+
+def leave_status_counts():
+    """
+    {status: count} over every leave request, for the leave review page.
+
+    A grouped count of the whole table, so it is cached under the
+    school-wide ('leaves', None) scope that every leave write bumps.
+    """
+    def compute():
+        counts = {status: 0 for status, _ in Leave.STATUS_CHOICES}
+        for row in leave_status_queryset():
+            counts[row['status']] = row['count']
+        return counts
+    return cached_value('leave_status_counts', (), [('leaves', None)], compute)
+
+
+class LeaveSummary:
+    """
+    A student's leave requests fetched with one query and bucketed by status.
+
+    Plain lists of Leave rows, so the whole summary can be cached once and
+    read by both the leave info page and the student dashboard.
+    """
+
+    def __init__(self, leaves):
+        self.leaves = list(leaves)
+        self.by_status = {status: [] for status, _ in Leave.STATUS_CHOICES}
+        for leave in self.leaves:
+            self.by_status.setdefault(leave.status, []).append(leave)
+
+    @classmethod
+    def for_student(cls, student):
+        return cls(student_leaves(student))
+
+    @classmethod
+    async def afor_student(cls, student):
+        return cls([leave async for leave in student_leaves(student)])
+
+    @property
+    def total(self):
+        return len(self.leaves)
+
+    @property
+    def pending(self):
+        return self.by_status['pending']
+
+    @property
+    def approved(self):
+        return self.by_status['approved']
+
+    @property
+    def rejected(self):
+        return self.by_status['rejected']
+
+    def recent(self, limit=5):
+        """The most recently submitted requests"""
+        return sorted(self.leaves, key=lambda leave: (leave.created_at, leave.pk), reverse=True)[:limit]
+
+    def as_context(self):
+        """Template context for the leave info page"""
+        return {
+            'total_leaves': self.total,
+            'pending_count': len(self.pending),
+            'approved_count': len(self.approved),
+            'rejected_count': len(self.rejected),
+            'leaves_pending': self.pending,
+            'leaves_approved': self.approved,
+            'leaves_rejected': self.rejected,
+        }
+
+
+def bulk_set_leave_status(leave_ids, status, teacher=None, approval='', mark_absent=False):
+    """
+    Approve or reject many leave requests in one transaction.
+
+    The selected rows are changed with a single UPDATE ... WHERE id IN (...),
+    which skips model signals, so the students' leave caches are invalidated
+    here. With `mark_absent`, approved leave days that have no attendance
+    record yet are marked absent by `teacher`; days in archived months and
+    students outside the teacher's sections are skipped and counted.
+    Returns the counts processed and the time taken.
+    """
+    started = time.perf_counter()
+    result = {'processed': 0, 'students': 0, 'marked_absent': 0, 'skipped_archived': 0, 'skipped_not_enrolled': 0}
+    with transaction.atomic():
+        leaves = list(Leave.objects.filter(pk__in=leave_ids).order_by().values_list('pk', 'student_id', 'date'))
+        if leaves:
+            result['processed'] = Leave.objects.filter(pk__in=[pk for pk, _, _ in leaves]).update(
+                status=status, approved_by=teacher, approval=approval[:100], updated_at=timezone.now(),
+            )
+            student_ids = {student_id for _, student_id, _ in leaves}
+            result['students'] = len(student_ids)
+            invalidate_leaves(student_ids)
+
+            if mark_absent and status == 'approved' and teacher is not None:
+                result.update(_mark_leave_days(teacher, leaves))
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _mark_leave_days(teacher, leaves):
+    # Only the teacher's own roster; other students' days are left to their teachers
+    roster = teacher_students(teacher)
+    enrolled = set(
+        roster.filter(pk__in={student_id for _, student_id, _ in leaves}).values_list('pk', flat=True)
+    )
+    by_date = defaultdict(set)
+    not_enrolled = 0
+    for _, student_id, leave_date in leaves:
+        if student_id in enrolled:
+            by_date[leave_date].add(student_id)
+        else:
+            not_enrolled += 1
+    # A teacher's existing mark for the day wins over the leave
+    recorded = set(
+        Attendance.objects.filter(date__in=by_date, student_id__in=set().union(*by_date.values()))
+        .order_by().values_list('student_id', 'date')
+    )
+    watermark = archive_watermark()
+    marked = skipped = 0
+    for leave_date, student_ids in sorted(by_date.items()):
+        missing = {student_id for student_id in student_ids if (student_id, leave_date) not in recorded}
+        if watermark and leave_date < watermark:
+            skipped += len(missing)
+            continue
+        if missing:
+            marked += record_attendance(
+                teacher, leave_date, dict.fromkeys(missing, 'absent'), students=roster,
+            )['created']
+    return {'marked_absent': marked, 'skipped_archived': skipped, 'skipped_not_enrolled': not_enrolled}
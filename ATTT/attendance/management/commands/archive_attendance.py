@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.archive import archive_attendance, default_cutoff
+from attendance.models import Attendance, AttendanceArchive
+from attendance.summaries import parse_date_param
+
+
+class Command(BaseCommand):
+    help = 'Move attendance from whole months before a cutoff into the compact bitmap archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', help='Cutoff date (YYYY-MM-DD, rounded down to the month); '
+                             'defaults to the start of the current academic year',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            before = parse_date_param(options['before']) or default_cutoff()
+        except ValueError:
+            raise CommandError('--before must be a date in YYYY-MM-DD format.') from None
+
+        hot_before = Attendance.objects.count()
+        started = time.perf_counter()
+        result = archive_attendance(before, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'Would archive {result["moved"]} of {hot_before} attendance rows from {result["months"]} months '
+                f'before {result["cutoff"]} into {result["archive_rows"]} archive rows.'
+            )
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {result["moved"]} attendance rows from {result["months"]} months before '
+            f'{result["cutoff"]} into {result["archive_rows"]} archive rows in {elapsed:.2f}s.'
+        ))
+        self.stdout.write(
+            f'Hot table: {hot_before} -> {Attendance.objects.count()} rows; '
+            f'archive: {AttendanceArchive.objects.count()} rows.'
+        )
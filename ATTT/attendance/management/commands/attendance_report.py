@@ -0,0 +1,67 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from attendance import analytics
+from attendance.archive import default_cutoff
+from attendance.summaries import parse_date_param
+
+
+class Command(BaseCommand):
+    help = 'School-wide report: low-attendance students, weekday absence patterns and per-subject trends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date (YYYY-MM-DD); defaults to the start of the academic year')
+        parser.add_argument('--end', help='Last date (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--threshold', type=float, help='Low-attendance cutoff in percent (default 75)')
+        parser.add_argument('--backend', choices=[analytics.NUMPY, analytics.PYTHON])
+        parser.add_argument('--limit', type=int, default=20, help='Low-attendance students to list')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        start_date = self._parse_date(options['start'], '--start') or default_cutoff()
+        end_date = self._parse_date(options['end'], '--end') or date.today()
+        if options['backend'] == analytics.NUMPY and analytics.np is None:
+            raise CommandError('NumPy is not installed; pip install -r requirements-analytics.txt or use --backend python.')
+
+        report = analytics.school_report(start_date, end_date, options['threshold'], options['backend'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        overall = report['overall']
+        self.stdout.write(
+            f'{report["start_date"]} to {report["end_date"]}: {report["rows"]} records, '
+            f'{report["students"]} students, {overall["percentage"]}% present '
+            f'({report["backend"]}: load {report["timings"]["load_ms"]}ms, '
+            f'report {report["timings"]["report_ms"]}ms)'
+        )
+
+        low = report['low_attendance']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nBelow {report["threshold"]}%: {len(low)} students'
+        ))
+        for row in low[:options['limit']]:
+            self.stdout.write(
+                f'  {row["roll_no"]:<12} {row["name"]:<30} {row["percentage"]:>5}% '
+                f'({row["present"]}/{row["total_days"]})'
+            )
+        if len(low) > options['limit']:
+            self.stdout.write(f'  ... {len(low) - options["limit"]} more (use --json for all)')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nAbsences by weekday'))
+        for row in report['weekdays']:
+            self.stdout.write(f'  {row["weekday"]:<10} {row["absence_rate"]:>5}% of {row["total"]} records')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nMonthly attendance by subject'))
+        for trend in report['subjects']:
+            months = ', '.join(f'{row["month"]:%b %Y} {row["percentage"]}%' for row in trend['months'])
+            self.stdout.write(f'  {trend["subject"] or "(none)"}: {months}')
+
+    def _parse_date(self, value, flag):
+        try:
+            return parse_date_param(value)
+        except ValueError:
+            raise CommandError(f'{flag} must be a date in YYYY-MM-DD format.') from None
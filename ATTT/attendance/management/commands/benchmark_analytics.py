@@ -0,0 +1,100 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractWeekDay, TruncMonth
+
+from attendance import analytics
+from attendance.models import Attendance
+from attendance.summaries import attendance_counts
+from attendance.synthetic import school_days, seed_school
+
+
+class _Rollback(Exception):
+    pass
+
+
+def orm_report(start_date, end_date, threshold):
+    """The same three reports as SQL GROUP BY queries over the hot table"""
+    records = Attendance.objects.filter(date__gte=start_date, date__lte=end_date).order_by()
+    counts = Count('id'), Count('id', filter=Q(status='absent'))
+    low = [
+        row for row in attendance_counts(None, start_date, end_date)
+        if row['present'] / row['total_days'] * 100 < threshold
+    ]
+    weekdays = list(
+        records.annotate(weekday=ExtractWeekDay('date')).values('weekday')
+        .annotate(total=counts[0], absent=counts[1]).order_by('weekday')
+    )
+    subjects = list(
+        records.annotate(month=TruncMonth('date')).values('teacher__subject', 'month')
+        .annotate(total=counts[0], absent=counts[1]).order_by('teacher__subject', 'month')
+    )
+    return low, weekdays, subjects
+
+
+class Command(BaseCommand):
+    help = 'Time the school-wide analytics report with the NumPy and pure-Python backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=200, help='School days of attendance per student')
+        parser.add_argument('--teachers', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _time(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return result, statistics.median(timings)
+
+    def _run(self, options):
+        started = time.perf_counter()
+        seed_school(
+            'bench_an', teachers=options['teachers'], students=options['students'], days=options['days'],
+            present_rate=0.85,
+        )
+        self.stdout.write(
+            f'Seeded {options["students"]} students x {options["days"]} days '
+            f'in {time.perf_counter() - started:.1f}s; {Attendance.objects.count()} attendance rows'
+        )
+
+        start_date, end_date = school_days(options['days'])[0], school_days(1)[0]
+        threshold = analytics.low_attendance_threshold()
+        backends = [analytics.PYTHON] + ([analytics.NUMPY] if analytics.np is not None else [])
+        if analytics.np is None:
+            self.stdout.write(self.style.WARNING('NumPy is not installed; timing the pure-Python backend only'))
+
+        reports = {}
+        for backend in backends:
+            report, elapsed = self._time(
+                lambda: analytics.school_report(start_date, end_date, threshold, backend), options['repeat'],
+            )
+            reports[backend] = report
+            self.stdout.write(
+                f'{backend:>6}: {elapsed:.0f}ms (load {report["timings"]["load_ms"]:.0f}ms, '
+                f'group and report {report["timings"]["report_ms"]:.0f}ms), '
+                f'{len(report["low_attendance"])} students below {threshold}%'
+            )
+
+        (low, _, _), elapsed = self._time(lambda: orm_report(start_date, end_date, threshold), options['repeat'])
+        self.stdout.write(f'   orm: {elapsed:.0f}ms (three SQL GROUP BY queries), {len(low)} students below {threshold}%')
+
+        if len(reports) == 2:
+            strip = lambda report: {key: value for key, value in report.items() if key not in ('backend', 'timings')}
+            same = strip(reports[analytics.PYTHON]) == strip(reports[analytics.NUMPY])
+            self.stdout.write(
+                self.style.SUCCESS('Backends agree') if same else self.style.ERROR('Backends DISAGREE')
+            )
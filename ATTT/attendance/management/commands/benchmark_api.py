@@ -0,0 +1,82 @@
+import json
+import time
+from datetime import date
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from attendance.synthetic import seed_school
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes and latency of the mark attendance form flow with the JSON API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--changed', type=int, default=5, help='Students whose status changes on the correction')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['students'], options['changed'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _request(self, client, method, url, **kwargs):
+        started = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        return response, len(response.content), elapsed
+
+    def _run(self, size, changed):
+        teachers, students = seed_school('bench_api', teachers=1, students=size)
+        teacher_user = teachers[0].user
+        today = date.today().isoformat()
+        client = Client()
+        client.force_login(teacher_user)
+
+        # Form flow: load the page, post the whole roster, follow the redirect
+        form_data = {'date': today}
+        form_data.update({f'student_{student.pk}': 'present' for student in students})
+        form_bytes = len(urlencode(form_data))
+        form_ms = 0
+        for method, url, kwargs in [
+            ('get', reverse('mark_attendance'), {}),
+            ('post', reverse('mark_attendance'), {'data': form_data}),
+            ('get', reverse('teacher_dashboard'), {}),
+        ]:
+            _, response_bytes, elapsed = self._request(client, method, url, **kwargs)
+            form_bytes += response_bytes
+            form_ms += elapsed
+
+        # API flow: fetch the roster, send only the changed students, revalidate
+        api_url = reverse('attendance_api')
+        response, roster_bytes, roster_ms = self._request(client, 'get', api_url, data={'date': today})
+        etag = response['ETag']
+        payload = json.dumps({
+            'date': today,
+            'statuses': {str(student.pk): 'absent' for student in students[:changed]},
+        })
+        _, _, patch_ms = self._request(client, 'patch', api_url, data=payload, content_type='application/json')
+        response, revalidate_bytes, revalidate_ms = self._request(
+            client, 'get', api_url, data={'date': today}, HTTP_IF_NONE_MATCH=etag,
+        )
+        response, _, unchanged_ms = self._request(
+            client, 'get', api_url, data={'date': today}, HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+
+        self.stdout.write(f'students={size} changed={changed}')
+        self.stdout.write(f'form flow:   {form_bytes} bytes, {form_ms:.1f}ms (page + full roster POST + redirect)')
+        self.stdout.write(
+            f'api flow:    {roster_bytes + len(payload) + revalidate_bytes} bytes, '
+            f'{roster_ms + patch_ms + revalidate_ms:.1f}ms (roster GET + PATCH + revalidating GET)'
+        )
+        self.stdout.write(f'api 304:     {unchanged_ms:.1f}ms with status {response.status_code}')
@@ -0,0 +1,99 @@
+import statistics
+import time
+from datetime import date
+from itertools import groupby, takewhile
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from attendance.bitmaps import (
+    ABSENT, attendance_percentages, current_absence_streaks,
+)
+from attendance.models import Attendance, AttendanceBitmap, Student
+from attendance.summaries import attendance_counts
+from attendance.synthetic import school_days, seed_school
+
+
+class _Rollback(Exception):
+    pass
+
+
+def orm_percentages(start_date, end_date, students):
+    return {
+        row['student_id']: round(row['present'] / row['total_days'] * 100, 1)
+        for row in attendance_counts(None, start_date, end_date, students)
+    }
+
+
+def orm_absence_streaks(start_date, min_days, students):
+    # Every record in the range, newest first per student; count absences until the first present
+    rows = (
+        Attendance.objects.filter(date__gte=start_date, student__in=students.values('pk'))
+        .order_by('student_id', '-date')
+        .values_list('student_id', 'status').iterator(chunk_size=5000)
+    )
+    streaks = {}
+    for student_id, records in groupby(rows, key=itemgetter(0)):
+        length = sum(1 for _ in takewhile(lambda record: record[1] == ABSENT, records))
+        if length >= min_days:
+            streaks[student_id] = length
+    return streaks
+
+
+class Command(BaseCommand):
+    help = 'Compare full-year percentages and absence streaks from the bitmaps with the ORM path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--days', type=int, default=200, help='School days of attendance per student')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--min-streak', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['students'], options['days'], options['repeat'], options['min_streak'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _time(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return result, statistics.median(timings)
+
+    def _run(self, students, days, repeat, min_streak):
+        started = time.perf_counter()
+        seed_school('bench_bm', teachers=10, students=students, days=days, present_rate=0.9)
+        self.stdout.write(f'Seeded {students} students x {days} days in {time.perf_counter() - started:.1f}s')
+        seeded = Student.objects.filter(user__username__startswith='bench_bm_')
+        self.stdout.write(
+            f'Attendance rows: {Attendance.objects.filter(student__in=seeded).count()}, '
+            f'bitmap rows: {AttendanceBitmap.objects.filter(student__in=seeded).count()}'
+        )
+
+        start_date, end_date = school_days(days)[0], date.today()
+        workloads = [
+            (
+                'year percentages',
+                lambda: orm_percentages(start_date, end_date, seeded),
+                lambda: attendance_percentages(start_date, end_date, seeded),
+            ),
+            (
+                f'absence streaks >= {min_streak}',
+                lambda: orm_absence_streaks(start_date, min_streak, seeded),
+                lambda: current_absence_streaks(min_streak, since=start_date, students=seeded),
+            ),
+        ]
+        for name, orm, bitmaps in workloads:
+            orm_result, orm_ms = self._time(orm, repeat)
+            bitmap_result, bitmap_ms = self._time(bitmaps, repeat)
+            match = self.style.SUCCESS('match') if orm_result == bitmap_result else self.style.ERROR('MISMATCH')
+            self.stdout.write(
+                f'{name}: orm={orm_ms:.1f}ms bitmaps={bitmap_ms:.1f}ms '
+                f'({orm_ms / bitmap_ms:.1f}x) {len(bitmap_result)} students, {match}'
+            )
@@ -0,0 +1,108 @@
+import statistics
+import threading
+import time
+from random import Random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from attendance.synthetic import school_days, seed_school
+
+
+class Command(BaseCommand):
+    help = 'Submit mark attendance from many threads at once and report lock errors and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent teachers submitting')
+        parser.add_argument('--submissions', type=int, default=10, help='Submissions per worker')
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--dates', type=int, default=3, help='School days the submissions are spread over')
+        parser.add_argument('--prefix', default='bench_conc', help='Prefix for the temporary users')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users with prefix {prefix!r} already exist; pick another --prefix.')
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError('Worker threads need a file or server database, not in-memory SQLite.')
+
+        # Threads use their own connections, so the data has to be committed
+        # rather than rolled back like the other benchmarks
+        teachers, students = seed_school(prefix, teachers=options['workers'], students=options['students'])
+        try:
+            self._run(teachers, students, options['submissions'], options['dates'])
+        finally:
+            User.objects.filter(username__startswith=f'{prefix}_').delete()
+
+    def _run(self, teachers, students, submissions, dates):
+        url = reverse('mark_attendance')
+        days = [day.isoformat() for day in school_days(dates)]
+        clients = []
+        for teacher in teachers:
+            client = Client()
+            client.force_login(teacher.user)
+            clients.append(client)
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(clients))
+
+        def worker(index, client):
+            rng = Random(index)
+            barrier.wait()
+            try:
+                for _ in range(submissions):
+                    data = {'date': rng.choice(days)}
+                    data.update({
+                        f'student_{student.pk}': 'present' if rng.random() < 0.85 else 'absent'
+                        for student in students
+                    })
+                    started = time.perf_counter()
+                    try:
+                        response = client.post(url, data)
+                        error = None if response.status_code == 302 else f'HTTP {response.status_code}'
+                    except Exception as exc:
+                        error = f'{type(exc).__name__}: {exc}'
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        if error:
+                            errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i, client)) for i, client in enumerate(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+            backend = f'sqlite (journal_mode={journal_mode})'
+        else:
+            backend = connection.vendor
+
+        total = len(latencies)
+        locked = sum('locked' in error for error in errors)
+        ordered = sorted(latencies)
+        self.stdout.write(f'database={backend} workers={len(clients)} students={len(students)} dates={dates}')
+        self.stdout.write(
+            f'{total} submissions in {elapsed:.2f}s ({total / elapsed:.1f}/sec), '
+            f'p50={statistics.median(ordered):.1f}ms p95={ordered[int(len(ordered) * 0.95) - 1]:.1f}ms'
+        )
+        for error in sorted(set(errors)):
+            self.stderr.write(f'  {errors.count(error)}x {error}')
+
+        if errors:
+            self.stdout.write(self.style.ERROR(f'{len(errors)} failed submissions ({locked} "database is locked").'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All submissions succeeded without lock errors.'))
@@ -0,0 +1,158 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from attendance.synthetic import seed_school
+
+# name -> (command line, extra environment); {workers} and {port} are filled in
+SERVERS = {
+    'wsgi': (
+        'gunicorn attendease.wsgi:application --workers {workers} --bind 127.0.0.1:{port}',
+        {'ATTENDANCE_ASYNC_VIEWS': 'False'},
+    ),
+    'asgi': (
+        'uvicorn attendease.asgi:application --workers {workers} --port {port} --no-access-log',
+        {'ATTENDANCE_ASYNC_VIEWS': 'True'},
+    ),
+}
+
+# url name -> who requests it
+PAGES = {
+    'student_dashboard': 'student',
+    'view_attendance': 'student',
+    'leave_info': 'student',
+    'teacher_dashboard': 'teacher',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare dashboard throughput of the WSGI (gunicorn) and ASGI (uvicorn, async views) profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='wsgi,asgi')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client connections')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per server')
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--days', type=int, default=60)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--cached', action='store_true', help='Keep the dashboard cache enabled')
+        parser.add_argument('--prefix', default='bench_srv', help='Prefix for the temporary users')
+
+    def handle(self, *args, **options):
+        servers = [name for name in options['servers'].split(',') if name]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f'Unknown servers: {", ".join(sorted(unknown))}')
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users with prefix {prefix!r} already exist; pick another --prefix.')
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError('The servers need a file or server database, not in-memory SQLite.')
+
+        # The servers run in other processes, so the data has to be committed
+        teachers, students = seed_school(
+            prefix, teachers=1, students=options['students'], days=options['days'], leaves=options['students'],
+        )
+        try:
+            cookies = {
+                'student': self._session_cookie(students[0].user),
+                'teacher': self._session_cookie(teachers[0].user),
+            }
+            self.stdout.write(
+                f'students={options["students"]} days={options["days"]} workers={options["workers"]} '
+                f'concurrency={options["concurrency"]} requests={options["requests"]} cached={options["cached"]}'
+            )
+            for name in servers:
+                self._benchmark(name, cookies, options)
+        finally:
+            User.objects.filter(username__startswith=f'{prefix}_').delete()
+
+    def _session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def _benchmark(self, name, cookies, options):
+        command, extra_env = SERVERS[name]
+        port = options['port']
+        env = {**os.environ, **extra_env}
+        if not options['cached']:
+            env['ATTENDANCE_CACHE_TIMEOUT'] = '0'
+        args = [sys.executable, '-m'] + command.format(workers=options['workers'], port=port).split()
+
+        # Server logs go to a file so a chatty server cannot fill a pipe and stall
+        log = tempfile.TemporaryFile()
+        try:
+            server = subprocess.Popen(args, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log)
+        except OSError as exc:
+            raise CommandError(f'Could not start {name} server: {exc}')
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            self._wait_until_ready(server, log, base_url, name)
+            urls = [
+                (base_url + reverse(page), cookies[role])
+                for page, role in PAGES.items()
+            ]
+            # Warm up every worker before measuring
+            for url, cookie in urls * options['workers']:
+                self._fetch(url, cookie)
+
+            jobs = [urls[i % len(urls)] for i in range(options['requests'])]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(lambda job: self._fetch(*job), jobs))
+            elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+            log.close()
+
+        latencies = sorted(ms for ms, _ in results)
+        errors = [status for _, status in results if status != 200]
+        self.stdout.write(
+            f'{name}: {len(results) / elapsed:.1f} req/s, '
+            f'p50={statistics.median(latencies):.1f}ms p95={latencies[int(len(latencies) * 0.95) - 1]:.1f}ms, '
+            f'{len(errors)} errors'
+        )
+        if errors:
+            self.stderr.write(f'  statuses: {sorted(set(errors))}')
+
+    def _wait_until_ready(self, server, log, base_url, name, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError(f'{name} server exited: {log.read().decode()[-2000:]}')
+            try:
+                urlopen(base_url + reverse('login'), timeout=1).close()
+                return
+            except (URLError, ConnectionError):
+                time.sleep(0.2)
+        raise CommandError(f'{name} server did not start within {timeout}s')
+
+    def _fetch(self, url, cookie):
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers={'Cookie': cookie}), timeout=30) as response:
+                response.read()
+                # A lost session redirects to the login page
+                status = response.status if response.url == url else 'redirected'
+        except HTTPError as exc:
+            status = exc.code
+        except (URLError, ConnectionError) as exc:
+            status = str(exc)
+        return (time.perf_counter() - started) * 1000, status
@@ -0,0 +1,49 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from attendance.models import Student
+from attendance.summaries import teacher_summary
+from attendance.synthetic import seed_school
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the teacher summary query count and timing at several roster sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,500,2000', help='Comma-separated roster sizes')
+        parser.add_argument('--days', type=int, default=20, help='Days of attendance per student')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    self._run(size, options['days'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, size, days):
+        """Seed a throwaway roster and time one summary computation"""
+        prefix = f'bench{size}_'
+        teachers, _ = seed_school(prefix, teachers=1, students=size, days=days, update_stats=False)
+        end_date = date.today()
+        start_date = end_date - timedelta(days=days * 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            summary = teacher_summary(teachers[0], start_date, end_date, Student.objects.filter(roll_no__startswith=prefix))
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'students={size} records={summary["total_records"]} '
+            f'queries={len(queries)} time={elapsed * 1000:.1f}ms'
+        )
@@ -0,0 +1,95 @@
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from attendance.caching import bump_generation
+from attendance.sections import teacher_students
+from attendance.summaries import roster_statuses, teacher_summary
+from attendance.synthetic import seed_school
+
+# A private cache, so results do not depend on the configured backend
+BENCH_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-templates'}}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering the teacher dashboard and mark attendance tables with and without the cached row fragments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Students in the roster')
+        parser.add_argument('--days', type=int, default=5, help='Days of attendance per student')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(CACHES=BENCH_CACHE):
+                self._run(options['rows'], options['days'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, rows, days, repeat):
+        teachers, _ = seed_school('bench_tpl', teachers=1, students=rows, days=days, update_stats=False)
+        teacher = teachers[0]
+        today = date.today()
+        request = RequestFactory().get('/')
+        request.user = teacher.user
+
+        # Template rendering alone, from precomputed rows
+        summary = teacher_summary(teacher, None, today, teacher_students(teacher))
+        statuses = roster_statuses(today, teacher_students(teacher))
+        templates = {
+            'teacher_dashboard': ('attendance/teacher_dashboard.html', {
+                'teacher': teacher, 'filter_type': 'year', 'end_date': today, **summary,
+            }),
+            'mark_attendance': ('attendance/mark_attendance.html', {
+                'students': statuses, 'attendance_date': today,
+            }),
+        }
+        for name, (template, context) in templates.items():
+            # A new fragment version per render is a miss: full render plus the cache write
+            miss = self._time(repeat, lambda run: render_to_string(
+                template, {**context, 'rows_fragment': {'timeout': 60, 'version': f'miss-{run}'}}, request,
+            ))
+            hit_context = {**context, 'rows_fragment': {'timeout': 60, 'version': 'hit'}}
+            size = len(render_to_string(template, hit_context, request))
+            hit = self._time(repeat, lambda run: render_to_string(template, hit_context, request))
+            self.stdout.write(
+                f'{name} render: {miss:.1f}ms uncached, {hit:.1f}ms cached fragment '
+                f'({rows} rows, {size / 1024:.0f} KiB)'
+            )
+
+        # Whole requests: a roster bump before each request forces a miss
+        client = Client()
+        client.force_login(teacher.user)
+        urls = {
+            'teacher_dashboard': reverse('teacher_dashboard') + '?filter=year',
+            'mark_attendance': reverse('mark_attendance'),
+        }
+        for name, url in urls.items():
+            def cold(run):
+                bump_generation('roster', teacher.pk)
+                return client.get(url)
+            miss = self._time(repeat, cold)
+            client.get(url)
+            hit = self._time(repeat, lambda run: client.get(url))
+            self.stdout.write(f'{name} request: {miss:.1f}ms cold, {hit:.1f}ms warm')
+
+    def _time(self, repeat, render):
+        """Median milliseconds of `repeat` calls"""
+        timings = []
+        for run in range(repeat):
+            started = time.perf_counter()
+            render(run)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
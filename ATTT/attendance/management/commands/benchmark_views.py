@@ -0,0 +1,178 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import date
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import Leave
+from attendance.synthetic import seed_school
+from attendance.urls import urlpatterns
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# url name -> (who requests it, query string); every named URL in
+# attendance/urls.py must be listed here or in SKIPPED_PAGES
+PAGES = {
+    'home': ('anonymous', ''),
+    'login': ('anonymous', ''),
+    'student_register': ('anonymous', ''),
+    'teacher_register': ('anonymous', ''),
+    'dashboard': ('teacher', ''),
+    'student_dashboard': ('student', ''),
+    'teacher_dashboard': ('teacher', '?filter=year'),
+    'mark_attendance': ('teacher', ''),
+    'view_attendance': ('student', ''),
+    'export_attendance': ('teacher', ''),
+    'apply_leave': ('student', ''),
+    'leave_requests': ('teacher', ''),
+    'leave_info': ('student', ''),
+    'approve_leave': ('teacher', ''),
+    'attendance_api': ('teacher', '?date={today}'),
+    'attendance_statuses_api': ('teacher', '?date={today}'),
+    'daily_attendance_api': ('staff', ''),
+    'changes_api': ('staff', ''),
+    'cache_stats': ('staff', ''),
+    'metrics': ('staff', ''),
+}
+SKIPPED_PAGES = {'logout', 'password_reset_confirm', 'password_reset_complete'}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every attendance URL at several synthetic school sizes and write JSON results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='100x20,1000x60',
+            help='Comma-separated STUDENTSxDAYS school sizes',
+        )
+        parser.add_argument('--teachers', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=10, help='Requests per page for latency percentiles')
+        parser.add_argument('--pages', help='Comma-separated url names to benchmark (default: all)')
+        parser.add_argument('--output', '-o', help='Write JSON results to this file')
+        parser.add_argument('--cached', action='store_true', help='Keep the configured cache instead of a dummy cache')
+
+    def handle(self, *args, **options):
+        missing = sorted(
+            pattern.name for pattern in urlpatterns
+            if pattern.name not in PAGES and pattern.name not in SKIPPED_PAGES
+        )
+        if missing:
+            self.stderr.write(self.style.WARNING(f'Not benchmarked (add to PAGES): {", ".join(missing)}'))
+
+        pages = list(PAGES)
+        if options['pages']:
+            pages = [page for page in options['pages'].split(',') if page]
+            unknown = set(pages) - set(PAGES)
+            if unknown:
+                raise CommandError(f'Unknown pages: {", ".join(sorted(unknown))}')
+
+        results = {
+            'created_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'cached': options['cached'],
+            'repeat': options['repeat'],
+            'scales': [],
+        }
+        for scale in options['scales'].split(','):
+            try:
+                students, days = (int(part) for part in scale.lower().split('x'))
+            except ValueError:
+                raise CommandError(f'Invalid scale {scale!r}; use STUDENTSxDAYS, e.g. 1000x60.')
+            cache_settings = {} if options['cached'] else {'CACHES': NO_CACHE}
+            try:
+                with transaction.atomic(), override_settings(**cache_settings):
+                    results['scales'].append(
+                        self._run_scale(students, days, options['teachers'], options['repeat'], pages)
+                    )
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        payload = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(payload)
+            self.stdout.write(self.style.SUCCESS(f'Wrote results to {options["output"]}'))
+        else:
+            self.stdout.write(payload)
+
+    def _run_scale(self, students, days, teachers, repeat, pages):
+        seed_started = time.perf_counter()
+        teacher_rows, student_rows = seed_school(
+            'bench', teachers=teachers, students=students, days=days, leaves=students // 2,
+        )
+        seed_seconds = time.perf_counter() - seed_started
+
+        staff = User.objects.create(username='bench_staff', is_staff=True, is_superuser=True)
+        clients = {'anonymous': Client()}
+        for role, user in [('teacher', teacher_rows[0].user), ('student', student_rows[0].user), ('staff', staff)]:
+            clients[role] = Client()
+            clients[role].force_login(user)
+
+        leave = Leave.objects.order_by('id').first()
+        today = date.today().isoformat()
+        summary = {
+            'students': students,
+            'days': days,
+            'teachers': teachers,
+            'attendance_rows': students * days,
+            'seed_seconds': round(seed_seconds, 2),
+            'pages': {},
+        }
+        for name in pages:
+            role, query = PAGES[name]
+            kwargs = {'leave_id': leave.pk} if name == 'approve_leave' else {}
+            url = reverse(name, kwargs=kwargs) + query.format(today=today)
+            summary['pages'][name] = self._measure(clients[role], url, repeat)
+            page = summary['pages'][name]
+            self.stderr.write(
+                f'{students}x{days} {name}: p50={page["p50_ms"]}ms p95={page["p95_ms"]}ms '
+                f'queries={page["queries"]} peak={page["peak_kib"]}KiB status={page["status"]}'
+            )
+        return summary
+
+    def _measure(self, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            timings.append((time.perf_counter() - started) * 1000)
+
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            response = client.get(url)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'queries': len(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.exports import ArchivedRecords, export_queryset, iter_attendance_rows, iter_matrix_rows, stream_csv, stream_xlsx
+from attendance.models import Student, Teacher
+from attendance.summaries import parse_date_param
+
+
+class Command(BaseCommand):
+    help = 'Stream attendance for a date range to CSV or XLSX with flat memory use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last date (YYYY-MM-DD)')
+        parser.add_argument('--teacher', type=int, help='Teacher id')
+        parser.add_argument('--student', help='Student roll number')
+        parser.add_argument('--layout', choices=['rows', 'matrix'], default='rows')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--output', '-o', help='Output file (defaults to stdout for CSV)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start_date = self._parse_date(options['start'], '--start')
+        end_date = self._parse_date(options['end'], '--end')
+
+        teacher = student = None
+        try:
+            if options['teacher']:
+                teacher = Teacher.objects.get(pk=options['teacher'])
+            if options['student']:
+                student = Student.objects.get(roll_no=options['student'])
+        except (Teacher.DoesNotExist, Student.DoesNotExist) as exc:
+            raise CommandError(str(exc))
+
+        records = export_queryset(start_date, end_date, teacher, student)
+        archived = ArchivedRecords(start_date, end_date, teacher, student)
+        if options['layout'] == 'matrix':
+            rows = iter_matrix_rows(records, options['chunk_size'], archived)
+        else:
+            rows = iter_attendance_rows(records, options['chunk_size'], archived)
+
+        if options['format'] == 'xlsx':
+            if not options['output']:
+                raise CommandError('--output is required for XLSX exports.')
+            with open(options['output'], 'wb') as output:
+                for chunk in stream_xlsx(rows):
+                    output.write(chunk)
+        elif options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(stream_csv(rows))
+        else:
+            sys.stdout.writelines(stream_csv(rows))
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f'Exported attendance to {options["output"]}'))
+
+    def _parse_date(self, value, flag):
+        try:
+            return parse_date_param(value)
+        except ValueError:
+            raise CommandError(f'{flag} must be a date in YYYY-MM-DD format.') from None
@@ -0,0 +1,61 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.imports import import_attendance_chunk, read_csv_chunks
+from attendance.jobs import enqueue
+from attendance.models import Teacher
+
+
+class Command(BaseCommand):
+    help = 'Bulk import attendance from a CSV with date,roll_no,status[,teacher] columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--teacher', help='Username of the teacher for rows without a teacher column')
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the import for run_worker (which must be able to read the file) and exit')
+
+    def handle(self, *args, **options):
+        default_teacher = None
+        if options['teacher']:
+            try:
+                default_teacher = Teacher.objects.get(user__username=options['teacher'])
+            except Teacher.DoesNotExist:
+                raise CommandError(f'Teacher {options["teacher"]!r} not found.')
+
+        if options['background']:
+            path = os.path.abspath(options['csv_file'])
+            if not os.path.exists(path):
+                raise CommandError(f'{path} does not exist.')
+            job = enqueue('import_attendance', {
+                'path': path, 'teacher': options['teacher'], 'chunk_size': options['chunk_size'],
+            })
+            self.stdout.write(self.style.SUCCESS(f'Queued import of {path} as job #{job.pk}.'))
+            return
+
+        started = time.perf_counter()
+        processed = error_count = 0
+        totals = {'created': 0, 'updated': 0, 'unchanged': 0}
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8') as source:
+                for chunk in read_csv_chunks(source, options['chunk_size']):
+                    counts, errors = import_attendance_chunk(chunk, default_teacher)
+                    processed += len(chunk)
+                    error_count += len(errors)
+                    for key in totals:
+                        totals[key] += counts[key]
+                    for row, message in errors:
+                        self.stderr.write(message)
+        except FileNotFoundError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} rows: {totals["created"]} created, {totals["updated"]} updated, '
+            f'{totals["unchanged"]} unchanged, {error_count} skipped '
+            f'in {elapsed:.2f}s ({rate:.0f} rows/sec).'
+        ))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from attendance.changes import prune_tombstones, tombstone_retention
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed tombstones older than ATTENDANCE_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Keep this many days instead (cursors older than the setting are refused either way)',
+        )
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['days']) if options['days'] is not None else tombstone_retention()
+        if retention < tombstone_retention():
+            self.stderr.write(self.style.WARNING(
+                'Keeping fewer days than ATTENDANCE_TOMBSTONE_RETENTION_DAYS lets clients with older '
+                'cursors miss deletions.'
+            ))
+        deleted = prune_tombstones(timezone.now() - retention)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones older than {retention.days} days.'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.bitmaps import rebuild_bitmaps, verify_bitmaps
+from attendance.daily import rebuild_daily, verify_daily
+from attendance.jobs import enqueue
+from attendance.stats import rebuild_stats, verify_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill the AttendanceStats counters, AttendanceBitmap analytics rows and '
+        'DailyAttendanceAggregate heatmap rows, or verify them with --verify'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only compare stored rows with a fresh aggregation')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--background', action='store_true', help='Queue the rebuild for run_worker and exit')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = verify_stats()
+            for student_id, teacher_id, month in mismatches[:20]:
+                self.stdout.write(f'Mismatch: student={student_id} teacher={teacher_id} month={month}')
+            bitmap_mismatches = verify_bitmaps()
+            for student_id, month in bitmap_mismatches[:20]:
+                self.stdout.write(f'Bitmap mismatch: student={student_id} month={month}')
+            daily_mismatches = verify_daily()
+            for day, teacher_id in daily_mismatches[:20]:
+                self.stdout.write(f'Daily aggregate mismatch: date={day} teacher={teacher_id}')
+            if mismatches or bitmap_mismatches or daily_mismatches:
+                raise CommandError(
+                    f'{len(mismatches)} attendance stats rows, {len(bitmap_mismatches)} bitmap rows and '
+                    f'{len(daily_mismatches)} daily aggregate rows are out of date.'
+                )
+            self.stdout.write(self.style.SUCCESS('Attendance stats, bitmaps and daily aggregates are up to date.'))
+            return
+
+        if options['background']:
+            job = enqueue('rebuild_stats')
+            self.stdout.write(self.style.SUCCESS(f'Queued rebuild as job #{job.pk}.'))
+            return
+
+        count = rebuild_stats(batch_size=options['batch_size'])
+        bitmaps = rebuild_bitmaps(batch_size=options['batch_size'])
+        daily = rebuild_daily(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} attendance stats rows, {bitmaps} bitmap rows and {daily} daily aggregate rows.'
+        ))
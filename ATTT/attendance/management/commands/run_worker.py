@@ -0,0 +1,104 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from attendance.jobs import claim_job, execute, heartbeat, requeue_stale, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (exports, stats rebuilds, imports, reports) in a thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Jobs run at the same time')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Seconds without a heartbeat before a running job is requeued')
+        parser.add_argument('--heartbeat-interval', type=int, default=30,
+                            help='Seconds between heartbeats for running jobs; keep well below --stale-after')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        worker = worker_name()
+
+        if options['mode'] == 'process':
+            # spawn rather than fork, so children never share the parent's DB
+            # connections; each child sets Django up before unpickling a job
+            pool = ProcessPoolExecutor(
+                options['concurrency'], mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+            )
+        else:
+            pool = ThreadPoolExecutor(options['concurrency'], thread_name_prefix='job')
+        self.stdout.write(f'Worker {worker}: {options["concurrency"]} {options["mode"]} slots')
+
+        running = {}
+        stale_after = timedelta(seconds=options['stale_after'])
+        next_stale_check = 0
+        next_heartbeat = 0
+        try:
+            while not self.stopping:
+                # Tasks only touch the heartbeat when they report progress, so
+                # keep it fresh here for as long as they run
+                if running and time.monotonic() >= next_heartbeat:
+                    try:
+                        heartbeat([job.pk for job in running.values()], worker)
+                        next_heartbeat = time.monotonic() + options['heartbeat_interval']
+                    except DatabaseError as exc:
+                        self.stderr.write(f'Heartbeat failed, retrying: {exc}')
+
+                if time.monotonic() >= next_stale_check:
+                    requeued = requeue_stale(stale_after)
+                    if requeued:
+                        self.stdout.write(f'Requeued or failed {requeued} stale jobs')
+                    next_stale_check = time.monotonic() + 60
+
+                while len(running) < options['concurrency'] and not self.stopping:
+                    job = claim_job(worker)
+                    if job is None:
+                        break
+                    self.stdout.write(f'Started {job.kind} #{job.pk} (attempt {job.attempts}/{job.max_attempts})')
+                    running[pool.submit(execute, job.pk)] = job
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._report(running.pop(future), future)
+        except KeyboardInterrupt:
+            self.stopping = True
+        finally:
+            if running:
+                self.stdout.write(f'Waiting for {len(running)} running jobs')
+            for future in wait(running).done:
+                self._report(running.pop(future), future)
+            pool.shutdown()
+            connections.close_all()
+
+    def _stop(self, signum, frame):
+        self.stdout.write('Stopping after the running jobs finish')
+        self.stopping = True
+
+    def _report(self, job, future):
+        try:
+            succeeded = future.result()
+        except Exception as exc:
+            # The job could not even be loaded or recorded (e.g. a dead worker process)
+            self.stderr.write(f'{job.kind} #{job.pk} crashed: {exc!r}')
+            return
+        if succeeded:
+            self.stdout.write(self.style.SUCCESS(f'Finished {job.kind} #{job.pk}'))
+        else:
+            job.refresh_from_db()
+            self.stderr.write(f'{job.kind} #{job.pk} failed ({job.status}): {job.error.strip().splitlines()[-1]}')
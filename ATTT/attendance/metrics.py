@@ -0,0 +1,98 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Filled by `attendance.middleware.RequestMetricsMiddleware` and served by
+the protected metrics view. Each worker process keeps its own registry,
+which is what Prometheus expects when scraping workers individually.
+"""
+import threading
+from collections import defaultdict
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram like a Prometheus client histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def render(self, name, labels):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {round(self.sum, 6)}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Per-view request, database and duplicate-query metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.request_seconds = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+            self.db_seconds = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+            self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+            self.responses = defaultdict(int)
+            self.duplicate_queries = defaultdict(int)
+
+    def observe(self, view, method, status, wall_seconds, db_seconds, query_count, duplicate_count):
+        key = (view, method)
+        with self._lock:
+            self.request_seconds[key].observe(wall_seconds)
+            self.db_seconds[key].observe(db_seconds)
+            self.queries[key].observe(query_count)
+            self.responses[(view, method, status)] += 1
+            self.duplicate_queries[key] += duplicate_count
+
+    def render(self, extra_gauges=None):
+        """The registry as Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = [
+                ('attendease_request_duration_seconds', 'Wall time per request', self.request_seconds),
+                ('attendease_db_duration_seconds', 'Database time per request', self.db_seconds),
+                ('attendease_db_queries', 'SQL queries per request', self.queries),
+            ]
+            for name, help_text, series in histograms:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (view, method), histogram in sorted(series.items()):
+                    lines += histogram.render(name, f'view="{view}",method="{method}"')
+
+            lines += [
+                '# HELP attendease_responses_total Responses by view and status code',
+                '# TYPE attendease_responses_total counter',
+            ]
+            for (view, method, status), count in sorted(self.responses.items()):
+                lines.append(f'attendease_responses_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+
+            lines += [
+                '# HELP attendease_duplicate_queries_total Repeated identical SQL statements (N+1 suspects)',
+                '# TYPE attendease_duplicate_queries_total counter',
+            ]
+            for (view, method), count in sorted(self.duplicate_queries.items()):
+                lines.append(f'attendease_duplicate_queries_total{{view="{view}",method="{method}"}} {count}')
+
+        for name, (help_text, value) in (extra_gauges or {}).items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
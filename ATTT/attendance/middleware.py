@@ -0,0 +1,118 @@
+"""
+Attendance middleware.
+
+RequestMetricsMiddleware is opt-in per-request instrumentation. Enable it
+with ATTENDANCE_METRICS_ENABLED = True (or the environment variable of the
+same name). When disabled it raises MiddlewareNotUsed, so Django drops it
+from the chain and it costs nothing.
+
+RoleMiddleware resolves the user's student or teacher profile once per
+request as `request.role`.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .metrics import registry
+from .roles import resolve_role
+
+logger = logging.getLogger('attendance.metrics')
+
+
+class QueryRecorder:
+    """connection.execute_wrapper that counts and times every SQL statement"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        """Statements (SQL with placeholders) executed at least `threshold` times"""
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, DB time, query count and duplicate queries per view"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'ATTENDANCE_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.duplicate_threshold = getattr(settings, 'ATTENDANCE_METRICS_DUPLICATE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_seconds = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        duplicates = recorder.duplicates(self.duplicate_threshold)
+        duplicate_count = sum(count - 1 for count in duplicates.values())
+
+        registry.observe(
+            view, request.method, response.status_code,
+            wall_seconds, recorder.seconds, recorder.count, duplicate_count,
+        )
+        response['Server-Timing'] = (
+            f'app;dur={wall_seconds * 1000:.1f}, '
+            f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries"'
+        )
+
+        logger.info(json.dumps({
+            'event': 'request',
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'wall_ms': round(wall_seconds * 1000, 2),
+            'db_ms': round(recorder.seconds * 1000, 2),
+            'queries': recorder.count,
+            'duplicate_queries': duplicate_count,
+        }))
+        for sql, count in sorted(duplicates.items(), key=lambda item: -item[1]):
+            logger.warning(json.dumps({
+                'event': 'duplicate_query',
+                'view': view,
+                'count': count,
+                'sql': sql[:300],
+            }))
+        return response
+
+
+class RoleMiddleware:
+    """Set `request.role`, resolved on first use and then memoized for the request"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Async views must not touch the lazy user; they use aresolve_role
+        request.role = SimpleLazyObject(lambda: resolve_role(request.user))
+        return self.get_response(request)
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def backfill_attendance_stats(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceStats = apps.get_model('attendance', 'AttendanceStats')
+    counters = {
+        'total': Count('id'),
+        'present': Count('id', filter=Q(status='present')),
+        'absent': Count('id', filter=Q(status='absent')),
+    }
+    rows = [
+        AttendanceStats(student_id=row['student_id'], **{field: row[field] for field in counters})
+        for row in Attendance.objects.order_by().values('student_id').annotate(**counters)
+    ]
+    monthly = (
+        Attendance.objects.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('student_id', 'teacher_id', 'month')
+        .annotate(**counters)
+    )
+    rows += [
+        AttendanceStats(
+            student_id=row['student_id'],
+            teacher_id=row['teacher_id'],
+            month=row['month'],
+            **{field: row[field] for field in counters},
+        )
+        for row in monthly
+    ]
+    AttendanceStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_alter_student_subject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(blank=True, help_text='First day of the month, empty for the overall row', null=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_stats', to='attendance.student')),
+                ('teacher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_stats', to='attendance.teacher')),
+            ],
+            options={
+                'verbose_name_plural': 'Attendance stats',
+                'ordering': ['student__roll_no', 'month'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('month__isnull', True), ('teacher__isnull', True)), fields=('student',), name='unique_overall_attendance_stats'), models.UniqueConstraint(condition=models.Q(('month__isnull', False), ('teacher__isnull', False)), fields=('student', 'teacher', 'month'), name='unique_monthly_attendance_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_attendance_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendancestats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['teacher', 'date', 'status'], name='att_teacher_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['status', '-created_at'], name='leave_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['student', '-created_at'], name='leave_student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['student', '-date'], name='leave_student_date_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendance_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='leave',
+            name='leave_status_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['-created_at', '-id'], name='leave_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='leave_status_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_leave_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'student', 'status'], name='att_date_student_status_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_attendance_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('recorded_days', models.PositiveIntegerField(default=0)),
+                ('present_days', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_archive', to='attendance.student')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_archive', to='attendance.teacher')),
+            ],
+            options={
+                'ordering': ['month', 'student__roll_no'],
+                'indexes': [models.Index(fields=['teacher', 'month'], name='archive_teacher_month_idx'), models.Index(fields=['month', 'student'], name='archive_month_student_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'teacher', 'month'), name='unique_attendance_archive')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:33
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_attendance_bitmaps(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceArchive = apps.get_model('attendance', 'AttendanceArchive')
+    AttendanceBitmap = apps.get_model('attendance', 'AttendanceBitmap')
+    bitmaps = defaultdict(lambda: [0, 0])
+    records = Attendance.objects.order_by().values_list('student_id', 'date', 'status')
+    for student_id, record_date, status in records.iterator(chunk_size=5000):
+        bit = 1 << (record_date.day - 1)
+        bitmap = bitmaps[(student_id, record_date.replace(day=1))]
+        bitmap[0] |= bit
+        if status == 'present':
+            bitmap[1] |= bit
+    archived = AttendanceArchive.objects.order_by().values_list('student_id', 'month', 'recorded_days', 'present_days')
+    for student_id, month, recorded_days, present_days in archived.iterator(chunk_size=5000):
+        bitmap = bitmaps[(student_id, month)]
+        bitmap[0] |= recorded_days
+        bitmap[1] |= present_days
+    AttendanceBitmap.objects.bulk_create([
+        AttendanceBitmap(student_id=student_id, month=month, recorded_days=recorded, present_days=present)
+        for (student_id, month), (recorded, present) in bitmaps.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_attendancearchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('recorded_days', models.PositiveIntegerField(default=0)),
+                ('present_days', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='attendance.student')),
+            ],
+            options={
+                'ordering': ['student__roll_no', 'month'],
+                'indexes': [models.Index(fields=['month', 'student'], name='bitmap_month_student_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'month'), name='unique_attendance_bitmap')],
+            },
+        ),
+        migrations.RunPython(backfill_attendance_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:52
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_sections_from_subjects(apps, schema_editor):
+    """One section per teacher named after their subject, enrolling students with the same subject"""
+    Teacher = apps.get_model('attendance', 'Teacher')
+    Student = apps.get_model('attendance', 'Student')
+    Section = apps.get_model('attendance', 'Section')
+    Enrollment = apps.get_model('attendance', 'Enrollment')
+    sections = Section.objects.bulk_create([
+        Section(teacher_id=teacher_id, name=subject.strip(), subject=subject.strip())
+        for teacher_id, subject in Teacher.objects.order_by().values_list('pk', 'subject')
+    ])
+    by_subject = defaultdict(list)
+    for section in sections:
+        by_subject[section.subject.casefold()].append(section.pk)
+
+    students = Student.objects.order_by().exclude(subject=None).values_list('pk', 'subject')
+    enrollments = []
+    for student_id, subject in students.iterator(chunk_size=5000):
+        for section_id in by_subject.get(subject.strip().casefold(), ()):
+            enrollments.append(Enrollment(section_id=section_id, student_id=student_id))
+    Enrollment.objects.bulk_create(enrollments, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Enrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='attendance.student')),
+            ],
+            options={
+                'ordering': ['section', 'student__roll_no'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Section',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('subject', models.CharField(max_length=100)),
+                ('students', models.ManyToManyField(related_name='sections', through='attendance.Enrollment', to='attendance.student')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='attendance.teacher')),
+            ],
+            options={
+                'ordering': ['teacher__name', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='section',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='attendance.section'),
+        ),
+        migrations.AddConstraint(
+            model_name='section',
+            constraint=models.UniqueConstraint(fields=('teacher', 'name'), name='unique_teacher_section'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'section'], name='enrollment_student_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('section', 'student'), name='unique_enrollment'),
+        ),
+        migrations.RunPython(seed_sections_from_subjects, migrations.RunPython.noop),
+    ]
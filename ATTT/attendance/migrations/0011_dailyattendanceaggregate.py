@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:01
+
+import calendar
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_daily_aggregates(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceArchive = apps.get_model('attendance', 'AttendanceArchive')
+    DailyAttendanceAggregate = apps.get_model('attendance', 'DailyAttendanceAggregate')
+    counts = defaultdict(lambda: [0, 0])
+    records = Attendance.objects.order_by().values_list('date', 'teacher_id', 'status')
+    for record_date, teacher_id, status in records.iterator(chunk_size=5000):
+        counts[(record_date, teacher_id)][0 if status == 'present' else 1] += 1
+    archived = AttendanceArchive.objects.order_by().values_list('teacher_id', 'month', 'recorded_days', 'present_days')
+    for teacher_id, month, recorded_days, present_days in archived.iterator(chunk_size=5000):
+        for day in range(1, calendar.monthrange(month.year, month.month)[1] + 1):
+            bit = 1 << (day - 1)
+            if recorded_days & bit:
+                counts[(month.replace(day=day), teacher_id)][0 if present_days & bit else 1] += 1
+    DailyAttendanceAggregate.objects.bulk_create([
+        DailyAttendanceAggregate(date=record_date, teacher_id=teacher_id, present=present, absent=absent)
+        for (record_date, teacher_id), (present, absent) in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_section_enrollment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_aggregates', to='attendance.teacher')),
+            ],
+            options={
+                'ordering': ['date', 'teacher'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'teacher'), name='unique_daily_aggregate')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_aggregates, migrations.RunPython.noop),
+    ]
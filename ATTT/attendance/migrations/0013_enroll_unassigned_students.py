@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def enroll_unassigned_students(apps, schema_editor):
+    """
+    Enroll students that 0010 left without a section in every section.
+
+    Before sections, every teacher saw every student. Students without a
+    subject, or with a subject no teacher teaches, matched no section and
+    dropped off all rosters; this puts them back until an admin assigns them.
+    """
+    Student = apps.get_model('attendance', 'Student')
+    Section = apps.get_model('attendance', 'Section')
+    Enrollment = apps.get_model('attendance', 'Enrollment')
+    section_ids = list(Section.objects.order_by().values_list('pk', flat=True))
+    if not section_ids:
+        return
+    unassigned = Student.objects.order_by().filter(enrollments=None).values_list('pk', flat=True)
+    enrollments = [
+        Enrollment(section_id=section_id, student_id=student_id)
+        for student_id in unassigned.iterator(chunk_size=5000)
+        for section_id in section_ids
+    ]
+    Enrollment.objects.bulk_create(enrollments, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0012_change_feed'),
+    ]
+
+    operations = [
+        migrations.RunPython(enroll_unassigned_students, migrations.RunPython.noop),
+    ]
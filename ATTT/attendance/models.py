@@ -1,6 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinLengthValidator
+from django.utils import timezone
+from collections import namedtuple
+
+
+AttendanceState = namedtuple('AttendanceState', ['student_id', 'teacher_id', 'date', 'status'])
 
 
 class Student(models.Model):
@@ -31,6 +36,50 @@ class Teacher(models.Model):
         return f"{self.name} - {self.subject}"
 
 
+class Section(models.Model):
+    """
+    A class taught by one teacher.
+
+    A teacher's roster is the set of students enrolled in their sections,
+    so roster, marking and summary queries scale with class size rather
+    than with the whole school.
+    """
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='sections')
+    name = models.CharField(max_length=100)
+    subject = models.CharField(max_length=100)
+    students = models.ManyToManyField(Student, through='Enrollment', related_name='sections')
+
+    class Meta:
+        ordering = ['teacher__name', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['teacher', 'name'], name='unique_teacher_section'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.teacher.name})"
+
+
+class Enrollment(models.Model):
+    """A student's membership of a section"""
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='enrollments')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='enrollments')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['section', 'student__roll_no']
+        constraints = [
+            # Also serves the roster lookup: a section's students
+            models.UniqueConstraint(fields=['section', 'student'], name='unique_enrollment'),
+        ]
+        indexes = [
+            # A student's sections
+            models.Index(fields=['student', 'section'], name='enrollment_student_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} in {self.section_id}"
+
+
 class Attendance(models.Model):
     """Attendance model for recording daily attendance"""
     STATUS_CHOICES = [
@@ -48,9 +97,160 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ['student', 'date']
         ordering = ['-date', 'student__roll_no']
+        indexes = [
+            # Teacher dashboard summaries: teacher + date range, counted by status
+            models.Index(fields=['teacher', 'date', 'status'], name='att_teacher_date_status_idx'),
+            # Mark attendance prefill: every status recorded on one date
+            models.Index(fields=['date', 'student', 'status'], name='att_date_student_status_idx'),
+            # Change feed: rows updated after a cursor
+            models.Index(fields=['updated_at', 'id'], name='att_updated_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.date} - {self.status}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = instance.state()
+        return instance
+    
+    def state(self):
+        """Snapshot of the fields that derived attendance tables depend on"""
+        return AttendanceState(self.student_id, self.teacher_id, self.date, self.status)
+
+
+class AttendanceStats(models.Model):
+    """Materialized attendance counters per student, optionally per teacher and month"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_stats')
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, null=True, blank=True, related_name='attendance_stats')
+    month = models.DateField(null=True, blank=True, help_text="First day of the month, empty for the overall row")
+    total = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'Attendance stats'
+        ordering = ['student__roll_no', 'month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student'],
+                condition=models.Q(teacher__isnull=True, month__isnull=True),
+                name='unique_overall_attendance_stats',
+            ),
+            models.UniqueConstraint(
+                fields=['student', 'teacher', 'month'],
+                condition=models.Q(teacher__isnull=False, month__isnull=False),
+                name='unique_monthly_attendance_stats',
+            ),
+        ]
+    
+    def __str__(self):
+        scope = f"{self.teacher_id} / {self.month:%Y-%m}" if self.month else "overall"
+        return f"{self.student_id} ({scope}) - {self.present}/{self.total}"
+    
+    @property
+    def percentage(self):
+        return round(self.present / self.total * 100, 1) if self.total > 0 else 0
+
+
+class AttendanceArchive(models.Model):
+    """
+    Archived attendance for one student, teacher and month as packed day bitmaps.
+
+    Bit n-1 of `recorded_days` is set when the student has a record on day
+    n of the month, and the same bit of `present_days` when that record was
+    'present'. Filled by the archive_attendance command from old Attendance rows.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_archive')
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='attendance_archive')
+    month = models.DateField(help_text="First day of the month")
+    recorded_days = models.PositiveIntegerField(default=0)
+    present_days = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['month', 'student__roll_no']
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'teacher', 'month'], name='unique_attendance_archive'),
+        ]
+        indexes = [
+            # Teacher summaries over archived date ranges
+            models.Index(fields=['teacher', 'month'], name='archive_teacher_month_idx'),
+            # Archive watermark and per-month compaction
+            models.Index(fields=['month', 'student'], name='archive_month_student_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} / {self.teacher_id} / {self.month:%Y-%m}"
+    
+    @property
+    def total(self):
+        return self.recorded_days.bit_count()
+    
+    @property
+    def present(self):
+        return self.present_days.bit_count()
+    
+    @property
+    def absent(self):
+        return self.total - self.present
+
+
+class AttendanceBitmap(models.Model):
+    """
+    One student's attendance for one month as day bitmaps, for analytics.
+
+    Same bit layout as AttendanceArchive, but one row per student across
+    teachers, covering both hot and archived months. Kept in sync from
+    `attendance_changed` by `attendance.bitmaps`.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    month = models.DateField(help_text="First day of the month")
+    recorded_days = models.PositiveIntegerField(default=0)
+    present_days = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['student__roll_no', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'month'], name='unique_attendance_bitmap'),
+        ]
+        indexes = [
+            # School-wide range queries over a span of months
+            models.Index(fields=['month', 'student'], name='bitmap_month_student_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} / {self.month:%Y-%m}"
+
+
+class DailyAttendanceAggregate(models.Model):
+    """
+    Present/absent counts for one teacher on one day, for the calendar heatmap.
+
+    Covers hot and archived days like AttendanceStats, and is kept in sync
+    from `attendance_changed` by `attendance.daily`. Subjects come from the
+    teacher.
+    """
+    date = models.DateField()
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='daily_aggregates')
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'teacher']
+        constraints = [
+            # Also serves the heatmap's date range queries
+            models.UniqueConstraint(fields=['date', 'teacher'], name='unique_daily_aggregate'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} / {self.teacher_id}: {self.present}/{self.total}"
+
+    @property
+    def total(self):
+        return self.present + self.absent
 
 
 class Leave(models.Model):
@@ -72,6 +272,97 @@ class Leave(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Leave review page keyset pagination, optionally filtered by status
+            models.Index(fields=['-created_at', '-id'], name='leave_created_id_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='leave_status_created_id_idx'),
+            # Student dashboard and leave info pages
+            models.Index(fields=['student', '-created_at'], name='leave_student_created_idx'),
+            models.Index(fields=['student', '-date'], name='leave_student_date_idx'),
+            # Change feed: rows updated after a cursor
+            models.Index(fields=['updated_at', 'id'], name='leave_updated_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.date} - {self.status}"
+
+
+class Tombstone(models.Model):
+    """
+    A deleted Attendance or Leave row, kept so the change feed can report it.
+
+    `student_id` is a plain column rather than a foreign key so tombstones
+    outlive the student whose deletion cascaded to the records.
+    """
+    KIND_CHOICES = [
+        ('attendance', 'Attendance'),
+        ('leave', 'Leave'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    student_id = models.BigIntegerField()
+    date = models.DateField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-deleted_at']
+        indexes = [
+            # Change feed: deletions after a cursor, school-wide or for one student
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+            models.Index(fields=['student_id', 'deleted_at'], name='tombstone_student_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} deleted {self.deleted_at}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by the run_worker command.
+
+    `kind` names a task registered in `attendance.tasks` and `payload` holds
+    its keyword arguments. Queued jobs run highest priority first once
+    `run_after` has passed; failures are retried up to `max_attempts`.
+    """
+    QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete")
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claiming the next due job
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_queue_idx'),
+            # A user's recent jobs
+            models.Index(fields=['created_by', '-created_at'], name='job_user_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
@@ -0,0 +1,54 @@
+"""
+Keyset (cursor) pagination for newest-first listings.
+
+Pages are selected with a `(created_at, id) < cursor` predicate instead of
+OFFSET, so fetching page N costs the same as fetching page 1.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(created_at, pk):
+    """Opaque cursor for the row at (created_at, pk)"""
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, pk) for a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|', 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, page_size=25):
+    """
+    Return (items, next_cursor) for a newest-first page of `queryset`.
+
+    `next_cursor` is None on the last page.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.pk)
+    return items, next_cursor
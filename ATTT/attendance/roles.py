@@ -0,0 +1,86 @@
+"""
+Per-request role resolution.
+
+`ProfileBackend` loads the session's user with both profiles in one
+joined query, and `middleware.RoleMiddleware` exposes the result as
+`request.role`, so views never probe `student_profile`/`teacher_profile`
+themselves.
+"""
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+STUDENT, TEACHER = 'student', 'teacher'
+PROFILE_FIELDS = {STUDENT: 'student_profile', TEACHER: 'teacher_profile'}
+
+
+class Role(namedtuple('Role', ['name', 'profile'])):
+    """The user's role ('student', 'teacher' or None) and its profile"""
+    __slots__ = ()
+
+    @property
+    def student(self):
+        return self.profile if self.name == STUDENT else None
+
+    @property
+    def teacher(self):
+        return self.profile if self.name == TEACHER else None
+
+
+NO_ROLE = Role(None, None)
+
+
+def resolve_role(user):
+    """
+    The Role for a user.
+
+    Free for users loaded by ProfileBackend; otherwise each profile probe
+    costs one query the first time.
+    """
+    if not user.is_authenticated:
+        return NO_ROLE
+    # A student profile wins, as on the dashboard redirect
+    for name, field in PROFILE_FIELDS.items():
+        profile = getattr(user, field, None)
+        if profile is not None:
+            return Role(name, profile)
+    return NO_ROLE
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend whose session lookup joins in the student and teacher profiles"""
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related(*PROFILE_FIELDS.values()).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = await UserModel._default_manager.select_related(*PROFILE_FIELDS.values()).aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def _profiles_cached(user):
+    return all(getattr(type(user), field).related.is_cached(user) for field in PROFILE_FIELDS.values())
+
+
+async def aresolve_role(request):
+    """Async request.role; no query for users ProfileBackend loaded with their profiles"""
+    user = await request.auser()
+    # request.user is loaded separately; share the user so rendering in the
+    # sync thread (base.html reads it) does not load it again
+    request.user = user
+    if user.is_authenticated and not _profiles_cached(user):
+        request.role = await sync_to_async(resolve_role)(user)
+    else:
+        request.role = resolve_role(user)
+    return request.role
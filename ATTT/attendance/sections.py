@@ -0,0 +1,90 @@
+"""
+Class sections and enrollments.
+
+A teacher's roster is the students enrolled in their sections. Views,
+the API and the summaries take `teacher_students(teacher)` as their
+`students` queryset, so they only read and write a class worth of rows.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Student, Section, Enrollment
+from .signals import invalidate_rosters
+
+
+def subject_key(subject):
+    """Normalised free-text subject used to match students to sections"""
+    return (subject or '').strip().casefold()
+
+
+def teacher_students(teacher):
+    """Students enrolled in any of the teacher's sections, as a queryset"""
+    enrolled = Enrollment.objects.filter(section__teacher=teacher).values('student_id')
+    return Student.objects.filter(pk__in=enrolled)
+
+
+def enroll(section, students, batch_size=1000):
+    """Enroll students (instances or ids) in a section, ignoring existing enrollments"""
+    student_ids = {getattr(student, 'pk', student) for student in students}
+    Enrollment.objects.bulk_create(
+        [Enrollment(section=section, student_id=student_id) for student_id in student_ids],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+    # bulk_create skips model signals
+    invalidate_rosters([section.teacher_id])
+
+
+def enroll_by_subject(students, batch_size=1000):
+    """
+    Enroll students in every section whose subject matches theirs.
+
+    Used by registration and the roster import; matching is case-insensitive
+    and ignores surrounding whitespace. Students without a subject cannot be
+    matched, so they join every section and stay visible to all teachers
+    until an admin assigns them. Returns the number of enrollments attempted.
+    """
+    students = list(students)
+    if not students:
+        return 0
+    keys = {subject_key(student.subject) for student in students}
+
+    unassigned = '' in keys
+
+    sections = defaultdict(list)
+    teacher_ids = set()
+    for section_id, teacher_id, subject in Section.objects.order_by().values_list('pk', 'teacher_id', 'subject'):
+        key = subject_key(subject)
+        if key and key in keys:
+            sections[key].append(section_id)
+            teacher_ids.add(teacher_id)
+        if unassigned:
+            sections[''].append(section_id)
+            teacher_ids.add(teacher_id)
+
+    enrollments = [
+        Enrollment(section_id=section_id, student_id=student.pk)
+        for student in students
+        for section_id in sections[subject_key(student.subject)]
+    ]
+    with transaction.atomic():
+        Enrollment.objects.bulk_create(enrollments, batch_size=batch_size, ignore_conflicts=True)
+        invalidate_rosters(teacher_ids)
+    return len(enrollments)
+
+
+def create_subject_section(teacher):
+    """Give a new teacher a section for their subject, enrolling students who list it and unassigned students"""
+    name = teacher.subject.strip()
+    key = subject_key(name)
+    # Matched in Python with subject_key, as enroll_by_subject does; SQLite's
+    # iexact only folds ASCII and neither side's whitespace
+    student_ids = [
+        student_id
+        for student_id, subject in Student.objects.order_by().values_list('pk', 'subject').iterator()
+        if subject_key(subject) in (key, '')
+    ]
+    with transaction.atomic():
+        section, _ = Section.objects.get_or_create(teacher=teacher, name=name, defaults={'subject': name})
+        enroll(section, student_ids)
+    return section
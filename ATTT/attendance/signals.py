@@ -0,0 +1,161 @@
+"""
+Attendance change notifications.
+
+Every write path sends `attendance_changed` with a list of (old, new)
+AttendanceState pairs; old is None for inserts and new is None for
+deletes. Single-row saves and deletes (views, admin) are translated by
+the model signal receivers below, while bulk paths such as
+`writes.record_attendance` send the signal themselves because
+bulk_create/bulk_update/QuerySet.update bypass model signals. Deleting a
+student handles its cascaded attendance and leave rows in one batch
+before the delete, and the per-row receivers skip them.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import Signal, receiver
+
+from .bitmaps import apply_bitmap_changes
+from .caching import attendance_scopes, bump_generation, bump_on_commit
+from .changes import add_tombstone, add_tombstones
+from .daily import apply_daily_changes
+from .models import (
+    AttendanceBitmap, AttendanceState, AttendanceStats, Student, Attendance, Enrollment, Leave, Section,
+)
+from .stats import apply_attendance_changes
+
+attendance_changed = Signal()
+
+
+def send_attendance_changes(changes):
+    """Send `attendance_changed` for the given (old, new) pairs, skipping no-ops"""
+    changes = [(old, new) for old, new in changes if old != new]
+    if changes:
+        attendance_changed.send(sender=Attendance, changes=changes)
+
+
+def _handled_by_student_delete(instance, origin):
+    # Set by `student_deleting` on the object the delete started from
+    return instance.student_id in getattr(origin, '_deleted_student_ids', ())
+
+
+@receiver(pre_delete, sender=Student)
+def student_deleting(sender, instance, origin=None, **kwargs):
+    """Apply the student's cascaded attendance and leave deletes as one batch"""
+    if origin is None:
+        # The per-row receivers could not tell these rows apart; leave it to them
+        return
+    attendance = list(
+        Attendance.objects.filter(student=instance).order_by()
+        .values_list('pk', 'student_id', 'teacher_id', 'date', 'status')
+    )
+    leaves = list(Leave.objects.filter(student=instance).order_by().values_list('pk', 'student_id', 'date'))
+    # The student's counters and bitmaps go with the cascade anyway; removing
+    # them first leaves the receivers nothing to update row by row
+    AttendanceStats.objects.filter(student=instance).delete()
+    AttendanceBitmap.objects.filter(student=instance).delete()
+    send_attendance_changes([(AttendanceState(*row[1:]), None) for row in attendance])
+    add_tombstones('attendance', [(pk, student_id, row_date) for pk, student_id, _, row_date, _ in attendance])
+    add_tombstones('leave', leaves)
+    if leaves:
+        invalidate_leaves([instance.pk])
+    if not hasattr(origin, '_deleted_student_ids'):
+        origin._deleted_student_ids = set()
+    origin._deleted_student_ids.add(instance.pk)
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, '_loaded_state', None)
+    new = instance.state()
+    instance._loaded_state = new
+    send_attendance_changes([(old, new)])
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, origin=None, **kwargs):
+    if _handled_by_student_delete(instance, origin):
+        return
+    old = getattr(instance, '_loaded_state', None) or instance.state()
+    send_attendance_changes([(old, None)])
+
+
+@receiver(post_delete, sender=Attendance)
+@receiver(post_delete, sender=Leave)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    if _handled_by_student_delete(instance, origin):
+        return
+    add_tombstone(sender._meta.model_name, instance)
+
+
+@receiver(attendance_changed)
+def update_attendance_stats(sender, changes, **kwargs):
+    apply_attendance_changes(changes)
+
+
+@receiver(attendance_changed)
+def update_attendance_bitmaps(sender, changes, **kwargs):
+    apply_bitmap_changes(changes)
+
+
+@receiver(attendance_changed)
+def update_daily_aggregates(sender, changes, **kwargs):
+    apply_daily_changes(changes)
+
+
+@receiver(attendance_changed)
+def invalidate_attendance_cache(sender, changes, **kwargs):
+    states = [state for change in changes for state in change if state is not None]
+    bump_on_commit(attendance_scopes(states))
+
+
+def invalidate_leaves(student_ids):
+    """Bump the leave cache of each student on commit; bulk Leave updates call this themselves"""
+    student_ids = set(student_ids)
+    for student_id in student_ids:
+        transaction.on_commit(partial(bump_generation, 'leaves', student_id))
+    if student_ids:
+        # School-wide leave counts on the leave review page
+        transaction.on_commit(partial(bump_generation, 'leaves'))
+
+
+@receiver(post_save, sender=Leave)
+@receiver(post_delete, sender=Leave)
+def invalidate_leave_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _handled_by_student_delete(instance, origin):
+        return
+    invalidate_leaves([instance.student_id])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_roster_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(partial(bump_generation, 'roster'))
+
+
+def invalidate_rosters(teacher_ids):
+    """Bump the roster cache of each teacher on commit; bulk enrollment changes call this themselves"""
+    for teacher_id in set(teacher_ids):
+        transaction.on_commit(partial(bump_generation, 'roster', teacher_id))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_rosters(Section.objects.filter(pk=instance.section_id).values_list('teacher_id', flat=True))
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def invalidate_section_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The section may have moved between teachers
+    transaction.on_commit(partial(bump_generation, 'roster'))
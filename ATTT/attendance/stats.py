@@ -0,0 +1,232 @@
+"""
+Incrementally maintained attendance counters (AttendanceStats).
+
+Each attendance row contributes to two counter rows: the student's
+overall row (teacher and month empty) and the (student, teacher, month)
+row. `apply_attendance_changes` turns (old, new) AttendanceState pairs
+into counter deltas and writes them with one read, one relative UPDATE
+per distinct delta and a bulk insert for new rows. A row that a
+concurrent writer inserted between the read and the insert is updated
+instead (see `bulk_create_or_update`).
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest, TruncMonth
+
+from .models import Attendance, AttendanceArchive, AttendanceStats
+
+COUNTER_FIELDS = ('total', 'present', 'absent')
+
+
+def month_start(value):
+    """First day of the month containing `value`"""
+    return value.replace(day=1)
+
+
+def _stats_keys(state):
+    return (
+        (state.student_id, None, None),
+        (state.student_id, state.teacher_id, month_start(state.date)),
+    )
+
+
+def compute_deltas(changes):
+    """Map (student_id, teacher_id, month) keys to [total, present, absent] deltas"""
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            present = sign if state.status == 'present' else 0
+            absent = sign if state.status == 'absent' else 0
+            for key in _stats_keys(state):
+                delta = deltas[key]
+                delta[0] += sign
+                delta[1] += present
+                delta[2] += absent
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def bulk_create_or_update(model, objs, update, batch_size=None):
+    """
+    bulk_create `objs`, calling `update(obj)` for each one whose row a
+    concurrent writer inserted after the caller read the table.
+
+    The partial unique constraints on AttendanceStats rule out
+    bulk_create(update_conflicts=True), so on a conflict the bulk insert
+    is rolled back to its savepoint and the rows are inserted one at a
+    time, each conflicting row becoming a relative UPDATE. Must run inside
+    the caller's transaction.
+    """
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(objs, batch_size=batch_size)
+        return
+    except IntegrityError:
+        pass
+    for obj in objs:
+        obj.pk = None
+        try:
+            with transaction.atomic():
+                obj.save(force_insert=True)
+        except IntegrityError:
+            update(obj)
+
+
+def _counter_update(deltas):
+    return {field: Greatest(F(field) + value, 0) for field, value in zip(COUNTER_FIELDS, deltas) if value}
+
+
+def _existing_rows(deltas):
+    """Map the stats keys in `deltas` that already have a row to its pk"""
+    student_ids = {key[0] for key in deltas}
+    teacher_ids = {key[1] for key in deltas if key[1] is not None}
+    months = {key[2] for key in deltas if key[2] is not None}
+    rows = AttendanceStats.objects.filter(
+        Q(teacher__isnull=True, month__isnull=True)
+        | Q(teacher_id__in=teacher_ids, month__in=months),
+        student_id__in=student_ids,
+    ).values_list('pk', 'student_id', 'teacher_id', 'month')
+    return {(student_id, teacher_id, month): pk for pk, student_id, teacher_id, month in rows}
+
+
+def apply_attendance_changes(changes):
+    """Apply attendance (old, new) pairs to the AttendanceStats table"""
+    deltas = compute_deltas(changes)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        existing = _existing_rows(deltas)
+
+        # Rows sharing a delta are updated together with one relative UPDATE
+        updates = defaultdict(list)
+        to_create = []
+        for key, delta in deltas.items():
+            pk = existing.get(key)
+            if pk is not None:
+                updates[tuple(delta)].append(pk)
+            elif any(value > 0 for value in delta):
+                # Negative deltas without a row only happen while a student's
+                # rows are being cascade-deleted, so there is nothing to record.
+                student_id, teacher_id, month = key
+                total, present, absent = (max(value, 0) for value in delta)
+                to_create.append(AttendanceStats(
+                    student_id=student_id,
+                    teacher_id=teacher_id,
+                    month=month,
+                    total=total,
+                    present=present,
+                    absent=absent,
+                ))
+
+        for delta, pks in updates.items():
+            AttendanceStats.objects.filter(pk__in=pks).update(**_counter_update(delta))
+        bulk_create_or_update(AttendanceStats, to_create, lambda row: AttendanceStats.objects.filter(
+            student_id=row.student_id, teacher_id=row.teacher_id, month=row.month,
+        ).update(**_counter_update(deltas[(row.student_id, row.teacher_id, row.month)])))
+
+
+def _totals(row):
+    if row is None:
+        return {'total': 0, 'present': 0, 'absent': 0, 'percentage': 0}
+    return {
+        'total': row.total,
+        'present': row.present,
+        'absent': row.absent,
+        'percentage': row.percentage,
+    }
+
+
+def _overall_stats(student):
+    return AttendanceStats.objects.filter(student=student, teacher__isnull=True, month__isnull=True)
+
+
+def student_totals(student):
+    """Overall total/present/absent/percentage for a student from the counters table"""
+    return _totals(_overall_stats(student).first())
+
+
+async def astudent_totals(student):
+    """Async student_totals"""
+    return _totals(await _overall_stats(student).afirst())
+
+
+def _add_archive_stats(expected):
+    # Archived months still count; they are read back from the day bitmaps
+    rows = AttendanceArchive.objects.order_by().values_list(
+        'student_id', 'teacher_id', 'month', 'recorded_days', 'present_days',
+    )
+    for student_id, teacher_id, month, recorded_days, present_days in rows.iterator(chunk_size=5000):
+        total = recorded_days.bit_count()
+        present = present_days.bit_count()
+        for key in ((student_id, None, None), (student_id, teacher_id, month)):
+            current = expected.get(key, (0, 0, 0))
+            expected[key] = (current[0] + total, current[1] + present, current[2] + total - present)
+
+
+def aggregate_stats(attendance=None):
+    """
+    Recompute the expected counter rows with grouped queries.
+
+    Without an explicit `attendance` queryset the archived months are
+    included, since the counters cover a student's whole history.
+    """
+    include_archive = attendance is None
+    if attendance is None:
+        attendance = Attendance.objects.all()
+    counters = {
+        'total': Count('id'),
+        'present': Count('id', filter=Q(status='present')),
+        'absent': Count('id', filter=Q(status='absent')),
+    }
+    expected = {}
+    for row in attendance.order_by().values('student_id').annotate(**counters):
+        expected[(row['student_id'], None, None)] = tuple(row[field] for field in COUNTER_FIELDS)
+    monthly = (
+        attendance.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('student_id', 'teacher_id', 'month')
+        .annotate(**counters)
+    )
+    for row in monthly:
+        key = (row['student_id'], row['teacher_id'], row['month'])
+        expected[key] = tuple(row[field] for field in COUNTER_FIELDS)
+    if include_archive:
+        _add_archive_stats(expected)
+    return expected
+
+
+def rebuild_stats(batch_size=1000):
+    """Replace the AttendanceStats table with freshly aggregated counters"""
+    expected = aggregate_stats()
+    with transaction.atomic():
+        AttendanceStats.objects.all().delete()
+        AttendanceStats.objects.bulk_create([
+            AttendanceStats(
+                student_id=student_id,
+                teacher_id=teacher_id,
+                month=month,
+                total=total,
+                present=present,
+                absent=absent,
+            )
+            for (student_id, teacher_id, month), (total, present, absent) in expected.items()
+        ], batch_size=batch_size)
+    return len(expected)
+
+
+def verify_stats():
+    """Return the keys whose stored counters differ from a fresh aggregation"""
+    expected = aggregate_stats()
+    stored = {
+        (row.student_id, row.teacher_id, row.month): (row.total, row.present, row.absent)
+        for row in AttendanceStats.objects.all()
+    }
+    return sorted(
+        (key for key in expected.keys() | stored.keys()
+         if expected.get(key, (0, 0, 0)) != stored.get(key, (0, 0, 0))),
+        key=str,
+    )
@@ -0,0 +1,176 @@
+"""
+Attendance summary helpers shared by views and management commands.
+"""
+import asyncio
+from datetime import date, timedelta
+
+from django.db.models import Count, FilteredRelation, Q
+from django.utils.dateparse import parse_date
+
+from .archive import archive_count_rows
+from .bitmaps import count_days
+from .models import Student, Attendance
+
+EMPTY_COUNTS = {'total_days': 0, 'present': 0, 'absent': 0}
+
+
+def resolve_date_range(filter_type, today=None):
+    """Return (start_date, end_date, filter_display) for a dashboard filter"""
+    today = today or date.today()
+    start_date = None
+    end_date = today
+    filter_display = ""
+
+    if filter_type == 'day':
+        # Get today's date only
+        start_date = today
+        filter_display = f"Today ({today.strftime('%b %d, %Y')})"
+    elif filter_type == 'week':
+        # Get start of current week (Monday)
+        start_date = today - timedelta(days=today.weekday())
+        filter_display = f"This Week ({start_date.strftime('%b %d')} - {end_date.strftime('%b %d, %Y')})"
+    elif filter_type == 'month':
+        # Get start of current month
+        start_date = today.replace(day=1)
+        filter_display = f"This Month ({start_date.strftime('%B %Y')})"
+    elif filter_type == 'year':
+        # Get start of current year
+        start_date = today.replace(month=1, day=1)
+        filter_display = f"This Year ({start_date.strftime('%Y')})"
+
+    return start_date, end_date, filter_display
+
+
+def parse_date_param(value):
+    """
+    Date for an optional YYYY-MM-DD request value, or None when it is empty.
+
+    Raises ValueError for malformed values and for well-formed but
+    impossible dates such as 2024-02-30, so callers answer 400 for both.
+    """
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f'{value!r} is not a YYYY-MM-DD date.')
+    return parsed
+
+
+def attendance_counts(teacher=None, start_date=None, end_date=None, students=None):
+    """Grouped total/present/absent counts per student_id as a values queryset"""
+    records = Attendance.objects.order_by()
+    if teacher is not None:
+        records = records.filter(teacher=teacher)
+    if start_date:
+        records = records.filter(date__gte=start_date)
+    if end_date:
+        records = records.filter(date__lte=end_date)
+    if students is not None:
+        records = records.filter(student__in=students.values('pk'))
+
+    return records.values('student_id').annotate(
+        total_days=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+    )
+
+
+async def alist(queryset):
+    """Evaluate a queryset with async iteration (for asyncio.gather)"""
+    return [item async for item in queryset]
+
+
+def merge_summaries(roster_rows, count_rows, archived=None):
+    """
+    Join (id, roll_no, name) roster rows with grouped count rows into summary rows.
+
+    `archived` maps student ids to counts from archived months (see
+    `attendance.bitmaps.count_days`) and is added to the hot counts.
+    """
+    counts = {row['student_id']: row for row in count_rows}
+    archived = archived or {}
+
+    summaries = []
+    for student_id, roll_no, name in roster_rows:
+        row = counts.get(student_id, EMPTY_COUNTS)
+        old = archived.get(student_id, EMPTY_COUNTS)
+        total_days = row['total_days'] + old['total_days']
+        present = row['present'] + old['present']
+        percentage = (present / total_days * 100) if total_days > 0 else 0
+        summaries.append({
+            'student_id': student_id,
+            'roll_no': roll_no,
+            'name': name,
+            'total_days': total_days,
+            'present': present,
+            'absent': row['absent'] + old['absent'],
+            'percentage': round(percentage, 1),
+        })
+    return summaries
+
+
+def student_summaries(teacher=None, start_date=None, end_date=None, students=None):
+    """
+    Per-student total/present/absent/percentage rows.
+
+    Counts come from one grouped query over Attendance (served by the
+    teacher/date/status index) and are merged with one roster query, so
+    the cost does not depend on the number of students in the roster.
+    Archived months are counted from the archive bitmaps.
+    """
+    roster = Student.objects.all() if students is None else students
+    return merge_summaries(
+        roster.order_by('roll_no').values_list('id', 'roll_no', 'name'),
+        attendance_counts(teacher, start_date, end_date, students),
+        count_days(archive_count_rows(start_date, end_date, teacher, students), start_date, end_date),
+    )
+
+
+def summary_totals(attendance_summary):
+    """Dashboard totals for a list of summary rows"""
+    total_avg = 0
+    if attendance_summary:
+        total_avg = sum(s['percentage'] for s in attendance_summary) / len(attendance_summary)
+
+    return {
+        'attendance_summary': attendance_summary,
+        'total_avg': round(total_avg, 1),
+        'total_records': sum(s['total_days'] for s in attendance_summary),
+        'total_present': sum(s['present'] for s in attendance_summary),
+        'total_absent': sum(s['absent'] for s in attendance_summary),
+    }
+
+
+def teacher_summary(teacher=None, start_date=None, end_date=None, students=None):
+    """Summary rows plus the dashboard totals for a teacher and date range"""
+    return summary_totals(student_summaries(teacher, start_date, end_date, students))
+
+
+async def ateacher_summary(teacher=None, start_date=None, end_date=None, students=None):
+    """Async teacher_summary; the roster and the hot and archived counts are fetched concurrently"""
+    roster = Student.objects.all() if students is None else students
+    roster_rows, count_rows, archive_rows = await asyncio.gather(
+        alist(roster.order_by('roll_no').values_list('id', 'roll_no', 'name')),
+        alist(attendance_counts(teacher, start_date, end_date, students)),
+        alist(archive_count_rows(start_date, end_date, teacher, students)),
+    )
+    archived = count_days(archive_rows, start_date, end_date)
+    return summary_totals(merge_summaries(roster_rows, count_rows, archived))
+
+
+def roster_statuses(attendance_date, students=None):
+    """
+    Roster rows with each student's recorded status for one date.
+
+    A single LEFT JOIN query; students without a record have status None.
+    """
+    roster = Student.objects.all() if students is None else students
+    rows = (
+        roster.order_by('roll_no')
+        .annotate(day=FilteredRelation('attendance_records', condition=Q(attendance_records__date=attendance_date)))
+        .values_list('id', 'roll_no', 'name', 'day__status')
+    )
+    return [
+        {'id': student_id, 'roll_no': roll_no, 'name': name, 'status': status}
+        for student_id, roll_no, name, status in rows
+    ]
@@ -0,0 +1,108 @@
+"""
+Synthetic school generator used by seed_synthetic_data and the benchmark commands.
+"""
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Student, Teacher, Attendance, Enrollment, Leave, Section
+from .bitmaps import rebuild_bitmaps
+from .daily import rebuild_daily
+from .stats import rebuild_stats
+
+SUBJECTS = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'English', 'History', 'Computer Science']
+
+
+def school_days(days, end_date=None):
+    """The last `days` weekdays up to and including `end_date`, oldest first"""
+    current = end_date or date.today()
+    result = []
+    while len(result) < days:
+        if current.weekday() < 5:
+            result.append(current)
+        current -= timedelta(days=1)
+    return result[::-1]
+
+
+def seed_school(prefix='syn', teachers=1, students=100, days=0, leaves=0,
+                present_rate=0.85, seed=0, batch_size=5000, update_stats=True):
+    """
+    Bulk insert a synthetic school and return its teachers and students.
+
+    Each student is enrolled in one teacher's section (round robin) and gets an
+    attendance row for every school day. Leave requests are spread over
+    random students with a mix of statuses. Rows are generated one day at
+    a time, so memory stays bounded for large schools.
+    """
+    rng = random.Random(seed)
+
+    with transaction.atomic():
+        teacher_users = User.objects.bulk_create([
+            User(username=f'{prefix}_t{i}', password='!') for i in range(teachers)
+        ])
+        teacher_rows = Teacher.objects.bulk_create([
+            Teacher(user=user, name=f'Teacher {i}', subject=SUBJECTS[i % len(SUBJECTS)])
+            for i, user in enumerate(teacher_users)
+        ])
+
+        student_users = User.objects.bulk_create([
+            User(username=f'{prefix}_s{i}', password='!') for i in range(students)
+        ], batch_size=batch_size)
+        student_rows = Student.objects.bulk_create([
+            Student(
+                user=user,
+                roll_no=f'{prefix}{i:06d}',
+                name=f'Student {i}',
+                subject=teacher_rows[i % teachers].subject if teachers else None,
+            )
+            for i, user in enumerate(student_users)
+        ], batch_size=batch_size)
+        sections = Section.objects.bulk_create([
+            Section(teacher=teacher, name=teacher.subject, subject=teacher.subject)
+            for teacher in teacher_rows
+        ])
+        if sections:
+            Enrollment.objects.bulk_create([
+                Enrollment(section=sections[i % teachers], student=student)
+                for i, student in enumerate(student_rows)
+            ], batch_size=batch_size)
+
+    if teachers:
+        for attendance_date in school_days(days):
+            with transaction.atomic():
+                Attendance.objects.bulk_create([
+                    Attendance(
+                        student=student,
+                        teacher=teacher_rows[i % teachers],
+                        date=attendance_date,
+                        status='present' if rng.random() < present_rate else 'absent',
+                    )
+                    for i, student in enumerate(student_rows)
+                ], batch_size=batch_size)
+
+    if leaves and student_rows:
+        statuses = [choice for choice, _ in Leave.STATUS_CHOICES]
+        leave_dates = school_days(max(days, 1))
+        with transaction.atomic():
+            rows = []
+            for _ in range(leaves):
+                status = rng.choice(statuses)
+                rows.append(Leave(
+                    student=rng.choice(student_rows),
+                    date=rng.choice(leave_dates),
+                    reason='Synthetic leave request',
+                    status=status,
+                    approved_by=rng.choice(teacher_rows) if status != 'pending' and teacher_rows else None,
+                ))
+            Leave.objects.bulk_create(rows, batch_size=batch_size)
+
+    # Bulk inserts bypass the incremental counters, bitmaps and daily
+    # aggregates, so rebuild them once
+    if update_stats and days:
+        rebuild_stats()
+        rebuild_bitmaps()
+        rebuild_daily()
+
+    return teacher_rows, student_rows
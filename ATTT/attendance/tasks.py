@@ -0,0 +1,118 @@
+"""
+Background tasks for the job queue.
+
+Each task takes a progress callback and the job's JSON payload as keyword
+arguments and returns a JSON-serialisable result. Tasks wrap the same
+service functions the views and management commands use.
+"""
+import os
+from contextlib import closing
+from datetime import date
+
+from .analytics import cached_school_report, refresh_school_report
+from .archive import archive_attendance as archive_months, default_cutoff
+from .bitmaps import rebuild_bitmaps
+from .daily import rebuild_daily
+from .exports import ArchivedRecords, export_queryset, iter_attendance_rows, iter_matrix_rows, stream_csv, stream_xlsx
+from .imports import import_attendance_chunk, read_csv_chunks
+from .jobs import output_dir, task
+from .models import Student, Teacher
+from .stats import rebuild_stats
+from .summaries import parse_date_param
+
+PROGRESS_ROWS = 1000
+
+
+def _counted(rows, progress, total, message):
+    """Pass rows through, reporting progress every PROGRESS_ROWS rows"""
+    for count, row in enumerate(rows):
+        if count % PROGRESS_ROWS == 0:
+            progress(count, total, message)
+        yield row
+
+
+@task('export_attendance')
+def export_attendance(progress, start=None, end=None, teacher_id=None, student=None, layout='rows', format='csv'):
+    """Write an attendance export to the job output directory"""
+    start_date, end_date = parse_date_param(start), parse_date_param(end)
+    teacher = Teacher.objects.get(pk=teacher_id) if teacher_id else None
+    student = Student.objects.get(roll_no=student) if student else None
+
+    records = export_queryset(start_date, end_date, teacher, student)
+    archived = ArchivedRecords(start_date, end_date, teacher, student)
+    if layout == 'matrix':
+        total = records.values('student_id').distinct().count()
+        rows = iter_matrix_rows(records, archived=archived)
+    else:
+        total = records.count()
+        rows = iter_attendance_rows(records, archived=archived)
+    rows = _counted(rows, progress, total, 'Writing rows')
+
+    filename = f'attendance_{start_date}_{end_date}_{progress.job.pk}.{format}'
+    path = os.path.join(output_dir(), filename)
+    # Close the row generators (and their cursors) even when writing fails
+    with closing(rows):
+        if format == 'xlsx':
+            with open(path, 'wb') as output:
+                for chunk in stream_xlsx(rows):
+                    output.write(chunk)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as output:
+                output.writelines(stream_csv(rows))
+    return {'file': filename, 'bytes': os.path.getsize(path)}
+
+
+@task('rebuild_stats')
+def rebuild_attendance_stats(progress):
+    """Rebuild the attendance counters, day bitmaps and daily aggregates"""
+    progress(0, 3, 'Rebuilding counters')
+    stats_rows = rebuild_stats()
+    progress(1, 3, 'Rebuilding bitmaps')
+    bitmap_rows = rebuild_bitmaps()
+    progress(2, 3, 'Rebuilding daily aggregates')
+    daily_rows = rebuild_daily()
+    return {'stats_rows': stats_rows, 'bitmap_rows': bitmap_rows, 'daily_rows': daily_rows}
+
+
+@task('import_attendance')
+def import_attendance(progress, path, teacher=None, chunk_size=5000):
+    """Import an attendance CSV that was saved where the worker can read it"""
+    default_teacher = Teacher.objects.get(user__username=teacher) if teacher else None
+    size = os.path.getsize(path)
+    totals = {'processed': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+    errors = []
+    with open(path, newline='', encoding='utf-8') as source:
+        for chunk in read_csv_chunks(source, chunk_size):
+            counts, chunk_errors = import_attendance_chunk(chunk, default_teacher)
+            totals['processed'] += len(chunk)
+            totals['skipped'] += len(chunk_errors)
+            for key in ('created', 'updated', 'unchanged'):
+                totals[key] += counts[key]
+            errors.extend(message for _, message in chunk_errors)
+            # Bytes read so far (the reader buffers ahead, so this is approximate)
+            progress(source.buffer.tell(), size, f'{totals["processed"]} rows processed')
+    return {**totals, 'errors': errors[:100]}
+
+
+@task('school_report')
+def school_report(progress, start=None, end=None, threshold=None):
+    """Recompute and cache the school-wide analytics report"""
+    # Same defaults as the admin page, so the warmed entry is the one it reads
+    start_date = parse_date_param(start) or default_cutoff()
+    end_date = parse_date_param(end) or date.today()
+    refresh_school_report()
+    report = cached_school_report(start_date, end_date, threshold)
+    return {
+        'rows': report['rows'],
+        'students': report['students'],
+        'low_attendance': len(report['low_attendance']),
+        'timings': report['timings'],
+    }
+
+
+@task('archive_attendance')
+def archive_attendance(progress, before):
+    """Archive whole months of attendance before a cutoff"""
+    result = archive_months(parse_date_param(before))
+    result['cutoff'] = result['cutoff'].isoformat()
+    return result
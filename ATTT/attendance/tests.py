@@ -0,0 +1,735 @@
+"""
+Regression tests for the attendance app.
+
+The query count tests seed a synthetic school at two sizes and pin the
+exact number of queries per page, so a count that grows with the data or
+creeps over budget fails CI. The query plan tests EXPLAIN the hot queries
+on SQLite and fail when one fully scans a guarded table.
+"""
+import json
+import os
+import re
+import runpy
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+
+from attendease import settings as settings_module
+
+from . import async_views, bitmaps, daily, stats, urls as app_urls, views, writes
+from .analytics import NUMPY, PYTHON, AttendanceColumns, np, school_report
+from .archive import archive_attendance, archive_count_rows, archived_months_queryset, default_cutoff, watermark_queryset
+from .changes import change_querysets
+from .bitmaps import verify_bitmaps
+from .daily import daily_rows, verify_daily
+from .imports import import_attendance_chunk, import_student_chunk
+from .jobs import claim_job, due_jobs, enqueue, heartbeat, requeue_stale
+from .leaves import bulk_set_leave_status, leave_status_counts, leave_status_queryset, student_leaves
+from .models import (
+    Attendance, AttendanceArchive, DailyAttendanceAggregate, Job, Leave, Student, Teacher, Tombstone,
+)
+from .pagination import keyset_page
+from .sections import enroll_by_subject, teacher_students
+from .stats import verify_stats
+from .summaries import attendance_counts, teacher_summary
+from .synthetic import seed_school
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+SIGNED_COOKIES = 'django.contrib.sessions.backends.signed_cookies'
+
+# Uncached queries per page with database sessions, including the session
+# lookup and the user lookup (which joins in the role's profile). Signed-cookie
+# sessions save the session query.
+QUERY_BUDGETS = {
+    'teacher_dashboard': 5,
+    'mark_attendance': 3,
+    'leave_requests': 4,
+    'leave_requests?status=pending': 4,
+    'leave_requests?cursor': 4,
+    'student_dashboard': 5,
+    # session, user with profiles, the hot records and the archived month summaries
+    'view_attendance': 5,
+    # session, user with profiles and a single fetch of the student's leaves
+    'leave_info': 3,
+    # session, user with profiles and one range query per change feed source
+    'changes_api': 5,
+}
+
+# Tables that hot queries must reach through an index rather than a full scan
+GUARDED_TABLES = (
+    'attendance_attendance', 'attendance_attendancearchive', 'attendance_dailyattendanceaggregate',
+    'attendance_enrollment', 'attendance_job', 'attendance_leave', 'attendance_section', 'attendance_student',
+    'attendance_tombstone',
+)
+FULL_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX)')
+
+
+# The app's routes with the dashboards served by attendance.async_views, as
+# attendance.urls does with ATTENDANCE_ASYNC_VIEWS; tests opt in through
+# ROOT_URLCONF since the URLconf is only read once
+ASYNC_URLCONF = __name__
+ASYNC_VIEWS = ('student_dashboard', 'teacher_dashboard', 'view_attendance', 'leave_info')
+urlpatterns = [path('admin/', admin.site.urls)] + [
+    path(str(route.pattern), getattr(async_views, route.name) if route.name in ASYNC_VIEWS else route.callback,
+         name=route.name)
+    for route in app_urls.urlpatterns
+]
+
+
+# No change feed lag, so the seeded rows are returned
+@override_settings(CACHES=NO_CACHE, ATTENDANCE_CHANGE_FEED_LAG=0)
+class QueryCountTests(TestCase):
+    """Uncached page query counts for a small school; subclasses repeat them for bigger ones"""
+    scale = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        teachers, students = seed_school('qc', teachers=1, students=cls.scale, days=3, leaves=cls.scale)
+        cls.teacher, cls.student = teachers[0], students[0]
+
+    def pages(self):
+        teacher, student = self.teacher.user, self.student.user
+        _, second_page = keyset_page(Leave.objects.all(), page_size=1)
+        return {
+            'teacher_dashboard': (teacher, reverse('teacher_dashboard')),
+            'mark_attendance': (teacher, reverse('mark_attendance')),
+            'leave_requests': (teacher, reverse('leave_requests')),
+            'leave_requests?status=pending': (teacher, reverse('leave_requests') + '?status=pending'),
+            'leave_requests?cursor': (teacher, f'{reverse("leave_requests")}?cursor={second_page}'),
+            'student_dashboard': (student, reverse('student_dashboard')),
+            'view_attendance': (student, reverse('view_attendance')),
+            'leave_info': (student, reverse('leave_info')),
+            'changes_api': (student, reverse('changes_api')),
+        }
+
+    def assertPageQueries(self, saved_queries=0):
+        for page, (user, url) in self.pages().items():
+            with self.subTest(page=page):
+                self.client.force_login(user)
+                with self.assertNumQueries(QUERY_BUDGETS[page] - saved_queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_database_sessions(self):
+        self.assertPageQueries()
+
+    def test_signed_cookie_sessions(self):
+        with self.settings(SESSION_ENGINE=SIGNED_COOKIES):
+            self.assertPageQueries(saved_queries=1)
+
+
+class LargerSchoolQueryCountTests(QueryCountTests):
+    scale = 60
+
+
+@override_settings(CACHES=NO_CACHE)
+class AsyncViewTests(TestCase):
+    """The async dashboards serve the same context with the same queries as the sync views"""
+
+    @classmethod
+    def setUpTestData(cls):
+        (teacher,), (student, *_) = seed_school('async', teachers=1, students=5, days=3, leaves=5)
+        AttendanceArchive.objects.create(
+            student=student, teacher=teacher, month=date(2020, 1, 1), recorded_days=0b11, present_days=0b01,
+        )
+        cls.teacher, cls.student = teacher.user, student.user
+
+    def pages(self):
+        # (user, url, context keys to compare); mark_attendance stays sync under ASGI
+        return {
+            'teacher_dashboard': (self.teacher, reverse('teacher_dashboard'), (
+                'attendance_summary', 'total_avg', 'total_records', 'start_date', 'end_date',
+            )),
+            'mark_attendance': (self.teacher, reverse('mark_attendance'), ('students', 'attendance_date')),
+            'student_dashboard': (self.student, reverse('student_dashboard'), (
+                'attendance_records', 'leave_requests', 'attendance_percentage', 'total_records',
+            )),
+            'view_attendance': (self.student, reverse('view_attendance'), (
+                'attendance_records', 'archived_months', 'total_records', 'present_records', 'absent_records',
+            )),
+            'leave_info': (self.student, reverse('leave_info'), ('student',)),
+        }
+
+    def get(self, client_get, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client_get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def context(self, response, keys):
+        return {
+            key: list(value) if not isinstance(value, (str, dict)) and hasattr(value, '__iter__') else value
+            for key, value in ((key, response.context[key]) for key in keys)
+        }
+
+    def test_async_views_match_the_sync_views(self):
+        for page, (user, url, keys) in self.pages().items():
+            with self.subTest(page=page):
+                self.client.force_login(user)
+                sync_response, sync_queries = self.get(self.client.get, url)
+                with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                    async_to_sync(self.async_client.aforce_login)(user)
+                    async_response, async_queries = self.get(async_to_sync(self.async_client.get), url)
+                    # resolver_match resolves lazily, so read it under the async URLconf
+                    self.assertIs(async_response.resolver_match.func, getattr(async_views, page, getattr(views, page)))
+
+                self.assertEqual(self.context(async_response, keys), self.context(sync_response, keys))
+                self.assertEqual(async_queries, sync_queries)
+
+
+class RegistrationRosterTests(TestCase):
+    """Students who register through the form show up on their teachers' rosters"""
+
+    def register(self, kind, username, **fields):
+        response = self.client.post(reverse(f'{kind}_register'), {
+            'username': username, 'email': f'{username}@example.com',
+            'password1': 'Zx8!roster-pass', 'password2': 'Zx8!roster-pass',
+            'name': username.title(), **fields,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.client.logout()
+        return User.objects.get(username=username)
+
+    def roster_ids(self, teacher_user):
+        self.client.force_login(teacher_user)
+        response = self.client.get(reverse('attendance_api'), {'date': date.today().isoformat()})
+        self.client.logout()
+        return [row['id'] for row in response.json()['students']]
+
+    def test_student_registering_after_the_teacher(self):
+        teacher = self.register('teacher', 'tina', subject='Physics')
+        student = self.register('student', 'sam', roll_no='R1', subject=' physics ')
+        self.assertEqual(self.roster_ids(teacher), [student.student_profile.pk])
+
+    def test_teacher_registering_after_the_student(self):
+        student = self.register('student', 'sam', roll_no='R1', subject='Physics')
+        teacher = self.register('teacher', 'tina', subject='Physics')
+        self.assertEqual(self.roster_ids(teacher), [student.student_profile.pk])
+
+    def test_other_subjects_stay_off_the_roster(self):
+        teacher = self.register('teacher', 'tina', subject='Physics')
+        self.register('student', 'sam', roll_no='R1', subject='History')
+        self.assertEqual(self.roster_ids(teacher), [])
+
+    def test_students_without_a_subject_join_every_section(self):
+        physics = self.register('teacher', 'tina', subject='Physics')
+        history = self.register('teacher', 'hal', subject='History')
+        student = Student.objects.create(user=User.objects.create_user('sam'), roll_no='R1', name='Sam')
+        enroll_by_subject([student])
+        self.assertEqual(self.roster_ids(physics), [student.pk])
+        self.assertEqual(self.roster_ids(history), [student.pk])
+
+    def test_teacher_section_matches_subjects_like_enroll_by_subject(self):
+        subjects = {'R1': ' physics ', 'R2': 'PHYSICS', 'R3': '\tPhysics', 'R4': 'History', 'R5': '  ', 'R6': None}
+        students = {
+            roll_no: Student.objects.create(
+                user=User.objects.create_user(f'sub{roll_no}'), roll_no=roll_no, name=roll_no, subject=subject,
+            )
+            for roll_no, subject in subjects.items()
+        }
+        teacher = self.register('teacher', 'tina', subject='Physics ')
+        expected = sorted(students[roll_no].pk for roll_no in ('R1', 'R2', 'R3', 'R5', 'R6'))
+        self.assertEqual(sorted(self.roster_ids(teacher)), expected)
+
+
+class StudentImportTests(TestCase):
+    """Bad roster rows are reported per row instead of aborting the chunk"""
+
+    def test_duplicate_and_invalid_usernames(self):
+        User.objects.create_user('taken')
+        students, errors = import_student_chunk([
+            {'roll_no': 'R01', 'name': 'Ann', 'username': 'ann'},
+            {'roll_no': 'R02', 'name': 'Ann Again', 'username': 'ann'},
+            {'roll_no': 'R03', 'name': 'Bob', 'username': 'bad name!'},
+            {'roll_no': 'R04', 'name': 'Cy', 'username': 'taken'},
+            {'roll_no': 'R05', 'name': 'Di'},
+            {'roll_no': 'R06', 'name': 'Ed', 'username': 'R05'},
+        ], hash_workers=1)
+        self.assertEqual(sorted(student.roll_no for student in students), ['R01', 'R05'])
+        self.assertEqual([row['roll_no'] for row, _ in errors], ['R02', 'R03', 'R06', 'R04'])
+        self.assertIn('Duplicate username ann in file', errors[0][1])
+        self.assertIn('Invalid username', errors[1][1])
+
+
+class AttendanceImportTests(TestCase):
+    def test_impossible_dates_are_row_errors(self):
+        (teacher,), (student,) = seed_school('ai', teachers=1, students=1)
+        counts, errors = import_attendance_chunk([
+            {'date': '2024-02-30', 'roll_no': student.roll_no, 'status': 'present'},
+            {'date': '2024-02-29', 'roll_no': student.roll_no, 'status': 'absent'},
+        ], default_teacher=teacher)
+        self.assertEqual(counts['created'], 1)
+        self.assertEqual([(row['date'], message) for row, message in errors], [('2024-02-30', "Invalid date '2024-02-30'")])
+
+
+class AttendanceApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teachers, cls.students = seed_school('api', teachers=1, students=2)
+        cls.teacher = teachers[0]
+
+    def setUp(self):
+        self.client.force_login(self.teacher.user)
+        self.url = f'{reverse("attendance_api")}?date={date.today().isoformat()}'
+
+    def test_non_string_statuses_are_rejected(self):
+        for status in (['present'], {'status': 'present'}, 1, None):
+            with self.subTest(status=status):
+                response = self.client.patch(self.url, json.dumps({
+                    'date': date.today().isoformat(), 'statuses': {str(self.students[0].pk): status},
+                }), content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_if_none_match_compares_whole_etags(self):
+        etag = self.client.get(self.url)['ETag']
+        cases = {
+            etag: 304,
+            f'"other", {etag}': 304,
+            f'W/{etag}': 304,
+            '*': 304,
+            f'"x{etag[1:-1]}x"': 200,
+            etag[:-2] + '"': 200,
+        }
+        for header, status in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=header).status_code, status)
+
+    def test_impossible_dates_are_rejected(self):
+        for value in ('2024-02-30', '2024-13-01', 'soon'):
+            with self.subTest(date=value):
+                for name in ('attendance_api', 'attendance_statuses_api'):
+                    response = self.client.get(reverse(name), {'date': value})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('error', response.json())
+                response = self.client.patch(reverse('attendance_api'), json.dumps({
+                    'date': value, 'statuses': {str(self.students[0].pk): 'present'},
+                }), content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.client.force_login(User.objects.create_user('api_staff', is_staff=True))
+        for name in ('start', 'end'):
+            with self.subTest(param=name):
+                response = self.client.get(reverse('daily_attendance_api'), {name: '2024-02-30'})
+                self.assertEqual(response.status_code, 400)
+
+
+class ExportScopeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teachers, _ = seed_school('exp', teachers=2, students=4, days=2)
+        cls.staff = User.objects.create_user('exp_staff', is_staff=True)
+
+    def export_teachers(self, user, query):
+        self.client.force_login(user)
+        response = self.client.get(reverse('export_attendance'), query)
+        self.assertEqual(response.status_code, 200)
+        rows = b''.join(response.streaming_content).decode().splitlines()[1:]
+        return {row.rsplit(',', 1)[1] for row in rows}
+
+    def test_teachers_only_export_their_own_records(self):
+        mine, other = self.teachers
+        self.assertEqual(self.export_teachers(mine.user, {}), {mine.name})
+        self.assertEqual(self.export_teachers(mine.user, {'teacher': other.pk}), {mine.name})
+        self.assertEqual(self.export_teachers(self.staff, {}), {mine.name, other.name})
+        self.assertEqual(self.export_teachers(self.staff, {'teacher': other.pk}), {other.name})
+
+    def test_malformed_teacher_is_not_found(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('export_attendance'), {'teacher': 'abc'}).status_code, 404)
+        response = self.client.post(reverse('queue_export'), {'teacher': 'abc'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_or_reversed_dates_are_rejected(self):
+        self.client.force_login(self.staff)
+        for query in ({'start': '2024-02-30'}, {'end': 'soon'}, {'start': '2024-05-01', 'end': '2024-04-01'}):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(reverse('export_attendance'), query).status_code, 400)
+                response = self.client.post(reverse('queue_export'), query)
+                self.assertRedirects(response, reverse('job_list'), fetch_redirect_response=False)
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(CACHES=NO_CACHE)
+class ViewAttendanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.teacher,), (cls.student,) = seed_school('va', teachers=1, students=1, days=1)
+        # Days 1-3 recorded, present on 1 and 3
+        AttendanceArchive.objects.create(
+            student=cls.student, teacher=cls.teacher, month=date(2020, 1, 1), recorded_days=0b111, present_days=0b101,
+        )
+
+    def assertArchivedMonths(self, response):
+        self.assertEqual(len(response.context['attendance_records']), 1)
+        self.assertEqual(response.context['archived_months'], [{
+            'month': date(2020, 1, 1), 'teacher_name': self.teacher.name, 'total': 3, 'present': 2, 'absent': 1,
+        }])
+        self.assertContains(response, 'January 2020')
+
+    def test_archived_months_are_listed(self):
+        self.client.force_login(self.student.user)
+        self.assertArchivedMonths(self.client.get(reverse('view_attendance')))
+
+    @override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+    async def test_archived_months_are_listed_async(self):
+        await self.async_client.aforce_login(self.student.user)
+        self.assertArchivedMonths(await self.async_client.get(reverse('view_attendance')))
+
+
+class RecordAttendanceTests(TestCase):
+    def test_rows_inserted_concurrently_are_updated(self):
+        (teacher,), students = seed_school('rec', teachers=1, students=2)
+        day = date.today()
+        plan_changes = writes._plan_changes
+
+        def racing_plan(*args):
+            # Another submission marks the first student between the fetch and the insert
+            if not Attendance.objects.filter(date=day).exists():
+                Attendance.objects.create(student=students[0], teacher=teacher, date=day, status='present')
+            return plan_changes(*args)
+
+        with mock.patch.object(writes, '_plan_changes', side_effect=racing_plan):
+            result = writes.record_attendance(teacher, day, {student.pk: 'absent' for student in students})
+
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+        self.assertEqual(set(Attendance.objects.values_list('status', flat=True)), {'absent'})
+        self.assertEqual(verify_stats(), [])
+
+    def test_aggregate_rows_inserted_concurrently_are_updated(self):
+        (teacher,), (student,) = seed_school('agg', teachers=1, students=1)
+        day = date.today()
+        writes.record_attendance(teacher, day, {student.pk: 'present'})
+
+        # Each updater reads no rows, as if another writer inserted them after
+        # the read, so the flip to absent collides with them on insert
+        with mock.patch.object(stats, '_existing_rows', return_value={}), \
+                mock.patch.object(daily, '_existing_rows', return_value={}), \
+                mock.patch.object(bitmaps, '_existing_rows', return_value={}):
+            writes.record_attendance(teacher, day, {student.pk: 'absent'})
+
+        self.assertEqual((verify_stats(), verify_bitmaps(), verify_daily()), ([], [], []))
+
+
+class StudentDeleteTests(TestCase):
+    def test_cascade_is_handled_in_one_batch(self):
+        (teacher,), students = seed_school('del', teachers=1, students=2)
+        for student, days in zip(students, (3, 12)):
+            for day in range(1, days + 1):
+                writes.record_attendance(teacher, date(2024, 3, day), {student.pk: 'present' if day % 3 else 'absent'})
+            Leave.objects.create(student=student, date=date(2024, 3, 1), reason='Ill')
+
+        query_counts = []
+        for student in students:
+            with CaptureQueriesContext(connection) as queries:
+                student.delete()
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+        self.assertEqual((verify_stats(), verify_bitmaps(), verify_daily()), ([], [], []))
+        self.assertFalse(DailyAttendanceAggregate.objects.exclude(present=0, absent=0).exists())
+        self.assertEqual(Tombstone.objects.filter(kind='attendance').count(), 15)
+        self.assertEqual(Tombstone.objects.filter(kind='leave').count(), 2)
+
+
+class CacheInvalidationTests(TestCase):
+    """Writes and archiving retire the cached dashboards through the scope generations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        (cls.teacher,), (cls.student,) = seed_school('inv', teachers=1, students=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def dashboards(self):
+        self.client.force_login(self.student.user)
+        student = self.client.get(reverse('student_dashboard')).context
+        self.client.force_login(self.teacher.user)
+        teacher = self.client.get(reverse('teacher_dashboard'), {'filter': 'year'}).context
+        return [record.date for record in student['attendance_records']], teacher['total_records']
+
+    def test_attendance_writes_bump_the_generations(self):
+        today = date.today()
+        self.assertEqual(self.dashboards(), ([], 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            writes.record_attendance(self.teacher, today, {self.student.pk: 'present'})
+        self.assertEqual(self.dashboards(), ([today], 1))
+
+    def test_archiving_bumps_the_generations(self):
+        old_day = date(2020, 1, 6)
+        writes.record_attendance(self.teacher, old_day, {self.student.pk: 'absent'})
+        self.assertEqual(self.dashboards()[0], [old_day])
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_attendance(date(2020, 2, 1))
+        self.assertEqual(self.dashboards()[0], [])
+
+
+class FragmentCacheTests(TestCase):
+    """Cached roster fragments are per teacher and retired by the day's generation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teachers, students = seed_school('frag', teachers=2, students=4)
+        cls.rosters = [students[0::2], students[1::2]]
+
+    def setUp(self):
+        cache.clear()
+
+    def page(self, teacher, name):
+        self.client.force_login(teacher.user)
+        return self.client.get(reverse(name)).content.decode()
+
+    def test_fragments_vary_by_teacher(self):
+        for name in ('teacher_dashboard', 'mark_attendance'):
+            for teacher, roster, other in zip(self.teachers, self.rosters, reversed(self.rosters)):
+                with self.subTest(page=name, teacher=teacher.name):
+                    content = self.page(teacher, name)
+                    for student in roster:
+                        self.assertIn(student.roll_no, content)
+                    for student in other:
+                        self.assertNotIn(student.roll_no, content)
+
+    def test_fragments_follow_the_generation(self):
+        teacher, student = self.teachers[0], self.rosters[0][0]
+        checked = f'id="absent_{student.pk}" value="absent" checked'
+        self.assertNotIn(checked, self.page(teacher, 'mark_attendance'))
+        with self.captureOnCommitCallbacks(execute=True):
+            writes.record_attendance(teacher, date.today(), {student.pk: 'absent'})
+        self.assertIn(checked, self.page(teacher, 'mark_attendance'))
+
+
+class LeaveStatusCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_are_cached_until_a_leave_changes(self):
+        _, (student,) = seed_school('lsc', teachers=1, students=1)
+        leave = Leave.objects.create(student=student, date=date.today(), reason='Ill')
+        self.assertEqual(leave_status_counts(), {'pending': 1, 'approved': 0, 'rejected': 0})
+        with self.assertNumQueries(0):
+            leave_status_counts()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_set_leave_status([leave.pk], 'approved')
+        self.assertEqual(leave_status_counts(), {'pending': 0, 'approved': 1, 'rejected': 0})
+
+
+# Middleware is loaded by each test's client, so enabling it per class works
+@override_settings(ATTENDANCE_METRICS_ENABLED=True, METRICS_TOKEN='')
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.teacher,), _ = seed_school('met', teachers=1, students=1)
+        cls.staff = User.objects.create_user('met_staff', is_staff=True)
+
+    def test_responses_carry_timing_and_query_headers(self):
+        self.client.force_login(self.teacher.user)
+        with self.assertLogs('attendance.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('teacher_dashboard'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['view'], record['status']), ('teacher_dashboard', 200))
+        self.assertGreater(record['queries'], 0)
+
+    def test_endpoints_are_forbidden_to_non_staff(self):
+        for name in ('metrics', 'cache_stats'):
+            with self.subTest(endpoint=name), self.assertLogs('attendance.metrics', 'INFO'):
+                self.client.logout()
+                self.assertEqual(self.client.get(reverse(name)).status_code, 403)
+                self.client.force_login(self.teacher.user)
+                self.assertEqual(self.client.get(reverse(name)).status_code, 403)
+                self.client.force_login(self.staff)
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_accept_the_bearer_token(self):
+        with self.assertLogs('attendance.metrics', 'INFO'):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'attendease_cache_hits', response.content)
+
+
+class LeaveAbsenceTests(TestCase):
+    def test_only_the_teachers_roster_is_marked_absent(self):
+        (mine, _), students = seed_school('lv', teachers=2, students=4)
+        own, other = students[0], students[1]
+        day = date.today()
+        leaves = [Leave.objects.create(student=student, date=day, reason='Ill') for student in (own, other)]
+
+        result = bulk_set_leave_status([leave.pk for leave in leaves], 'approved', teacher=mine, mark_absent=True)
+        self.assertEqual((result['marked_absent'], result['skipped_not_enrolled']), (1, 1))
+        self.assertEqual(list(Attendance.objects.values_list('student_id', 'status')), [(own.pk, 'absent')])
+
+
+class DateParamTests(TestCase):
+    def test_impossible_dates_are_bad_requests(self):
+        (teacher,), _ = seed_school('dp', teachers=1, students=1)
+        self.client.force_login(teacher.user)
+        self.assertEqual(self.client.get(reverse('mark_attendance'), {'date': '2024-02-30'}).status_code, 400)
+        self.client.force_login(User.objects.create_superuser('dp_admin'))
+        for name in ('admin:attendance_analytics', 'admin:attendance_heatmap'):
+            for param in ('start', 'end'):
+                with self.subTest(page=name, param=param):
+                    self.assertEqual(self.client.get(reverse(name), {param: '2024-02-30'}).status_code, 400)
+        with self.assertRaisesMessage(CommandError, '--start must be a date'):
+            call_command('attendance_report', start='2024-02-30')
+
+
+class SettingsTests(TestCase):
+    def test_sessions_from_the_model_backend_stay_logged_in(self):
+        (teacher,), _ = seed_school('set', teachers=1, students=1)
+        self.client.force_login(teacher.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('teacher_dashboard')).status_code, 200)
+
+    def test_unknown_session_backend_is_improperly_configured(self):
+        with mock.patch.dict(os.environ, {'SESSION_BACKEND': 'cookies'}):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'SESSION_BACKEND must be one of db, cache'):
+                runpy.run_path(settings_module.__file__)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite PRAGMAs')
+class SqlitePragmaTests(TestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        # The test database is in memory, where journal_mode cannot be WAL,
+        # so open a fresh connection to a file database with the same settings
+        with tempfile.TemporaryDirectory() as tmp:
+            default = connections[DEFAULT_DB_ALIAS]
+            new = default.__class__({**default.settings_dict, 'NAME': os.path.join(tmp, 'pragmas.sqlite3')})
+            try:
+                with new.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'busy_timeout', 'synchronous'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                new.close()
+        # synchronous reads back as a number; 1 is NORMAL
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal', 'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'], 'synchronous': 1,
+        })
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed')
+class AnalyticsBackendTests(TestCase):
+    def test_numpy_and_python_backends_agree(self):
+        teachers, students = seed_school('an', teachers=2, students=6)
+        # January is archived and February stays hot; the range clips both
+        days = [date(2020, 1, 1) + timedelta(days=offset) for offset in range(0, 45, 2)]
+        for index, day in enumerate(days):
+            teacher = teachers[index % 2]
+            writes.record_attendance(teacher, day, {
+                student.pk: 'present' if (index + position) % 3 else 'absent'
+                for position, student in enumerate(students)
+            }, students=teacher_students(teacher))
+        archive_attendance(date(2020, 2, 1))
+        self.assertFalse(Attendance.objects.filter(date__lt=date(2020, 2, 1)).exists())
+
+        start, end = date(2020, 1, 10), date(2020, 2, 8)
+        columns = AttendanceColumns.load(start, end)
+        in_range = [day for day in days if start <= day <= end]
+        self.assertEqual(sorted(set(columns.day)), [day.toordinal() for day in in_range])
+        self.assertEqual(columns.group_counts(NUMPY), columns.group_counts(PYTHON))
+
+        reports = [school_report(start, end, threshold=100, backend=backend) for backend in (NUMPY, PYTHON)]
+        for report in reports:
+            del report['backend'], report['timings']
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(reports[0]['rows'], len(columns))
+
+
+class JobHeartbeatTests(TestCase):
+    def test_heartbeat_keeps_running_jobs_from_being_requeued(self):
+        # A task that never reports progress, e.g. a long archive run
+        job = enqueue('archive_attendance', {'before': date.today().isoformat()})
+        self.assertEqual(claim_job('worker-a').pk, job.pk)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(heartbeat([job.pk], 'worker-b'), 0)
+        self.assertEqual(heartbeat([job.pk], 'worker-a'), 1)
+        self.assertEqual(requeue_stale(timedelta(minutes=10)), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+
+class TeacherSummaryQueryTests(TestCase):
+    """The teacher summary costs the same three queries for any roster size"""
+    sizes = (5, 120)
+    days = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teachers = {
+            size: seed_school(f'sum{size}', teachers=1, students=size, days=cls.days)[0][0]
+            for size in cls.sizes
+        }
+
+    def test_constant_queries(self):
+        end_date = date.today()
+        start_date = end_date - timedelta(days=self.days * 2)
+        for size, teacher in self.teachers.items():
+            with self.subTest(students=size):
+                # roster, grouped hot counts and archived months
+                with self.assertNumQueries(3):
+                    summary = teacher_summary(teacher, start_date, end_date, teacher_students(teacher))
+                self.assertEqual(len(summary['attendance_summary']), size)
+                self.assertEqual(summary['total_records'], size * self.days)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plan checks read SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTests(TestCase):
+    """The dashboard, report and feed queries are served by indexes"""
+
+    def queries(self):
+        student = Student(pk=1)
+        teacher = Teacher(pk=1)
+        today = date.today()
+        week_start = today - timedelta(days=today.weekday())
+        roster = teacher_students(teacher)
+        queries = {
+            'teacher roster': roster.order_by('roll_no').values_list('id', 'roll_no', 'name'),
+            'teacher_dashboard summary': attendance_counts(teacher, week_start, today, roster),
+            'teacher_dashboard archived months': archive_count_rows(week_start, today, teacher),
+            'archive watermark': watermark_queryset()[:1],
+            'mark_attendance prefill': (
+                Attendance.objects.filter(date=today, student__in=roster.values('pk'))
+                .order_by().values_list('student_id', 'status')
+            ),
+            'view_attendance history': Attendance.objects.filter(student=student).order_by('-date'),
+            'view_attendance archived months': archived_months_queryset(student),
+            'mark_attendance existing rows': Attendance.objects.filter(date=today, student_id__in=[1, 2, 3]).order_by(),
+            'leave summary': student_leaves(student),
+            'leave_requests page': Leave.objects.order_by('-created_at', '-id')[:26],
+            'leave_requests status counts': leave_status_queryset(),
+            'leave_requests by status': Leave.objects.filter(status='pending').order_by('-created_at', '-id')[:26],
+            'run_worker claim': due_jobs()[:10],
+            'jobs page': Job.objects.filter(created_by_id=1).order_by('-created_at')[:20],
+            'heatmap year': daily_rows(default_cutoff(today), today),
+            'heatmap teacher': daily_rows(default_cutoff(today), today, teacher_id=teacher.pk),
+        }
+        now = timezone.now()
+        for position, page in ((None, 'first page'), ((now, 1, 1), 'after cursor')):
+            for scope, suffix in ((None, ''), (student, ' (student)')):
+                for _, _, queryset, _ in change_querysets(position, now, 500, scope):
+                    queries[f'change feed {queryset.model._meta.model_name} {page}{suffix}'] = queryset
+        return queries
+
+    def test_no_full_scans(self):
+        for name, queryset in self.queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                scans = [table for table in FULL_SCAN.findall(plan) if table in GUARDED_TABLES]
+                self.assertEqual(scans, [], f'{name} fully scans {", ".join(scans)}:\n{plan}')
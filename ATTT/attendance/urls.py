@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, async_views, views
+
+# Read-heavy dashboards are served by async views under the ASGI profile
+dashboards = async_views if settings.ATTENDANCE_ASYNC_VIEWS else views
 
 urlpatterns = [
     # Home and authentication
@@ -9,19 +13,39 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('register/student/', views.student_register, name='student_register'),
     path('register/teacher/', views.teacher_register, name='teacher_register'),
+    path('reset/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
+    path('reset/done/', auth_views.PasswordResetCompleteView.as_view(), name='password_reset_complete'),
     
     # Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
-    path('student/dashboard/', views.student_dashboard, name='student_dashboard'),
-    path('teacher/dashboard/', views.teacher_dashboard, name='teacher_dashboard'),
+    path('student/dashboard/', dashboards.student_dashboard, name='student_dashboard'),
+    path('teacher/dashboard/', dashboards.teacher_dashboard, name='teacher_dashboard'),
     
     # Attendance
     path('mark-attendance/', views.mark_attendance, name='mark_attendance'),
-    path('view-attendance/', views.view_attendance, name='view_attendance'),
+    path('view-attendance/', dashboards.view_attendance, name='view_attendance'),
+    path('export-attendance/', views.export_attendance, name='export_attendance'),
+    path('export-attendance/queue/', views.queue_export, name='queue_export'),
     
     # Leave management
     path('apply-leave/', views.apply_leave, name='apply_leave'),
     path('leave-requests/', views.leave_requests, name='leave_requests'),
-    path('leave-info/', views.leave_info, name='leave_info'),
+    path('leave-requests/bulk/', views.bulk_leave_action, name='bulk_leave_action'),
+    path('leave-info/', dashboards.leave_info, name='leave_info'),
     path('approve-leave/<int:leave_id>/', views.approve_leave, name='approve_leave'),
+    
+    # Background jobs
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+    
+    # JSON API
+    path('api/attendance/', api.attendance_api, name='attendance_api'),
+    path('api/attendance/statuses/', api.attendance_statuses_api, name='attendance_statuses_api'),
+    path('api/attendance/daily/', api.daily_attendance_api, name='daily_attendance_api'),
+    path('api/changes/', api.changes_api, name='changes_api'),
+    
+    # Monitoring
+    path('cache-stats/', views.cache_stats_view, name='cache_stats'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
@@ -1,12 +1,37 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
 from django.db.models import Q
-from datetime import date, datetime, timedelta
-from .models import Student, Teacher, Attendance, Leave
+from django.views.decorators.http import require_POST
+from datetime import date, datetime
+import os
+from .models import Student, Teacher, Attendance, Job, Leave
+from .archive import ArchivedDateError, archived_months
+from .caching import cache_stats, cached_value, fragment_cache
+from .exports import ArchivedRecords, export_queryset, iter_attendance_rows, iter_matrix_rows, stream_csv, stream_xlsx
+from .leaves import LeaveSummary, bulk_set_leave_status, leave_status_counts
+from .metrics import registry
+from .jobs import enqueue, output_dir
 from .forms import StudentRegistrationForm, TeacherRegistrationForm, LeaveRequestForm, LeaveApprovalForm
+from .pagination import keyset_page
+from .roles import STUDENT, TEACHER
+from .sections import teacher_students
+from .stats import student_totals
+from .summaries import parse_date_param, resolve_date_range, roster_statuses, teacher_summary
+from .writes import parse_attendance_post, record_attendance
+
+LEAVE_STATUSES = [choice for choice, _ in Leave.STATUS_CHOICES]
+LEAVE_PAGE_SIZE = 25
+JOB_PAGE_SIZE = 20
+
+# Jobs queued from a page run before maintenance jobs queued from the command line
+INTERACTIVE_JOB_PRIORITY = 10
 
 
 def home(request):
@@ -20,7 +45,8 @@ def student_register(request):
         form = StudentRegistrationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            # New accounts go straight to ProfileBackend sessions
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             messages.success(request, 'Registration successful! Welcome to AttendEase.')
             return redirect('dashboard')
     else:
@@ -34,7 +60,8 @@ def teacher_register(request):
         form = TeacherRegistrationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            # New accounts go straight to ProfileBackend sessions
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             messages.success(request, 'Registration successful! Welcome to AttendEase.')
             return redirect('dashboard')
     else:
@@ -45,13 +72,10 @@ def teacher_register(request):
 @login_required
 def dashboard(request):
     """Dashboard view - redirects based on user type"""
-    try:
-        if hasattr(request.user, 'student_profile'):
-            return redirect('student_dashboard')
-        elif hasattr(request.user, 'teacher_profile'):
-            return redirect('teacher_dashboard')
-    except:
-        pass
+    if request.role.name == STUDENT:
+        return redirect('student_dashboard')
+    elif request.role.name == TEACHER:
+        return redirect('teacher_dashboard')
     
     messages.error(request, 'User profile not found. Please contact administrator.')
     return redirect('home')
@@ -60,29 +84,32 @@ def dashboard(request):
 @login_required
 def student_dashboard(request):
     """Student dashboard view"""
-    try:
-        student = request.user.student_profile
-    except:
+    student = request.role.student
+    if student is None:
         messages.error(request, 'Student profile not found.')
         return redirect('home')
     
     # Get attendance records
-    attendance_records = Attendance.objects.filter(student=student).order_by('-date')[:10]
+    attendance_records = cached_value(
+        'recent_attendance', (student.pk,), [('student', student.pk)],
+        lambda: list(Attendance.objects.filter(student=student).select_related('teacher').order_by('-date')[:10]),
+    )
     
-    # Get leave requests
-    leave_requests = Leave.objects.filter(student=student).order_by('-created_at')[:5]
+    # Get leave requests from the summary shared with the leave info page
+    leave_summary = cached_value(
+        'leave_summary', (student.pk,), [('leaves', student.pk)], lambda: LeaveSummary.for_student(student),
+    )
     
-    # Calculate attendance percentage
-    total_records = Attendance.objects.filter(student=student).count()
-    present_records = Attendance.objects.filter(student=student, status='present').count()
-    attendance_percentage = (present_records / total_records * 100) if total_records > 0 else 0
+    # Read attendance percentage from the materialized counters
+    totals = cached_value('student_totals', (student.pk,), [('student', student.pk)], lambda: student_totals(student))
     
     context = {
         'student': student,
         'attendance_records': attendance_records,
-        'leave_requests': leave_requests,
-        'attendance_percentage': round(attendance_percentage, 1),
-        'total_records': total_records,
+        'leave_requests': leave_summary.recent(5),
+        'leave_summary': leave_summary,
+        'attendance_percentage': totals['percentage'],
+        'total_records': totals['total'],
     }
     return render(request, 'attendance/student_dashboard.html', context)
 
@@ -90,86 +117,33 @@ def student_dashboard(request):
 @login_required
 def teacher_dashboard(request):
     """Teacher dashboard view"""
-    try:
-        teacher = request.user.teacher_profile
-    except:
+    teacher = request.role.teacher
+    if teacher is None:
         messages.error(request, 'Teacher profile not found.')
         return redirect('home')
     
-    # Get all students
-    students = Student.objects.all().order_by('roll_no')
-    
     # Get filter type from request (day, week, month, year)
     filter_type = request.GET.get('filter', 'week')
+    start_date, end_date, filter_display = resolve_date_range(filter_type)
     
-    # Calculate date range based on filter
-    today = date.today()
-    start_date = None
-    end_date = today
-    filter_display = ""
-    
-    if filter_type == 'day':
-        # Get today's date only
-        start_date = today
-        end_date = today
-        filter_display = f"Today ({today.strftime('%b %d, %Y')})"
-    elif filter_type == 'week':
-        # Get start of current week (Monday)
-        days_since_monday = today.weekday()
-        start_date = today - timedelta(days=days_since_monday)
-        filter_display = f"This Week ({start_date.strftime('%b %d')} - {end_date.strftime('%b %d, %Y')})"
-    elif filter_type == 'month':
-        # Get start of current month
-        start_date = today.replace(day=1)
-        filter_display = f"This Month ({start_date.strftime('%B %Y')})"
-    elif filter_type == 'year':
-        # Get start of current year
-        start_date = today.replace(month=1, day=1)
-        filter_display = f"This Year ({start_date.strftime('%Y')})"
-    
-    # Get attendance records for the teacher within the date range
-    attendance_records = Attendance.objects.filter(teacher=teacher)
-    if start_date:
-        attendance_records = attendance_records.filter(date__gte=start_date, date__lte=end_date)
-    
-    # Calculate attendance summary for each student
-    attendance_summary = []
-    total_present = 0
-    total_absent = 0
-    total_records = attendance_records.count()
-    
-    for student in students:
-        student_records = attendance_records.filter(student=student)
-        total_days = student_records.count()
-        present = student_records.filter(status='present').count()
-        absent = student_records.filter(status='absent').count()
-        percentage = (present / total_days * 100) if total_days > 0 else 0
-        
-        total_present += present
-        total_absent += absent
-        
-        attendance_summary.append({
-            'roll_no': student.roll_no,
-            'name': student.name,
-            'total_days': total_days,
-            'present': present,
-            'absent': absent,
-            'percentage': round(percentage, 1),
-        })
-    
-    # Calculate average attendance percentage
-    total_avg = 0
-    if attendance_summary:
-        total_avg = sum(s['percentage'] for s in attendance_summary) / len(attendance_summary)
+    # Calculate attendance summary for each student in one grouped query
+    scopes = [('teacher', teacher.pk), ('roster', None), ('roster', teacher.pk)]
+    summary = cached_value(
+        'teacher_summary', (teacher.pk, start_date, end_date), scopes,
+        lambda: teacher_summary(teacher, start_date, end_date, teacher_students(teacher)),
+    )
     
     context = {
         'teacher': teacher,
-        'students': students,
+        'start_date': start_date,
+        'end_date': end_date,
         'filter_type': filter_type,
         'filter_display': filter_display,
-        'attendance_summary': attendance_summary,
-        'total_avg': round(total_avg, 1),
-        'total_records': total_records,
+        'attendance_summary': summary['attendance_summary'],
+        'total_avg': summary['total_avg'],
+        'total_records': summary['total_records'],
+        # The rendered table rows are cached under the same versions
+        'rows_fragment': fragment_cache('teacher_dashboard_rows', (teacher.pk, start_date, end_date), scopes),
     }
     return render(request, 'attendance/teacher_dashboard.html', context)
 
@@ -177,9 +151,8 @@ def teacher_dashboard(request):
 @login_required
 def mark_attendance(request):
     """Mark attendance view for teachers"""
-    try:
-        teacher = request.user.teacher_profile
-    except:
+    teacher = request.role.teacher
+    if teacher is None:
         messages.error(request, 'Teacher profile not found.')
         return redirect('home')
     
@@ -189,54 +162,68 @@ def mark_attendance(request):
             messages.error(request, 'Please select a date.')
             return redirect('mark_attendance')
         
-        attendance_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        try:
+            attendance_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            messages.error(request, 'Please select a valid date.')
+            return redirect('mark_attendance')
         
-        # Mark attendance for each student
-        for student in Student.objects.all():
-            status = request.POST.get(f'student_{student.id}')
-            if status in ['present', 'absent']:
-                attendance, created = Attendance.objects.get_or_create(
-                    student=student,
-                    date=attendance_date,
-                    defaults={'teacher': teacher, 'status': status}
-                )
-                if not created:
-                    attendance.status = status
-                    attendance.teacher = teacher
-                    attendance.save()
+        # Mark attendance for the submitted enrolled students in one transaction
+        statuses = parse_attendance_post(request.POST)
+        try:
+            result = record_attendance(teacher, attendance_date, statuses, students=teacher_students(teacher))
+        except ArchivedDateError as exc:
+            messages.error(request, str(exc))
+            return redirect('mark_attendance')
         
-        messages.success(request, f'Attendance marked successfully for {attendance_date}.')
+        messages.success(
+            request,
+            f'Attendance marked successfully for {attendance_date} '
+            f'({result["created"]} new, {result["updated"]} updated).'
+        )
         return redirect('teacher_dashboard')
     
-    students = Student.objects.all().order_by('roll_no')
-    return render(request, 'attendance/mark_attendance.html', {'students': students})
+    # Enrolled roster with the selected date's existing statuses in one joined
+    # query, only run when the cached table rows for this date are stale
+    try:
+        attendance_date = parse_date_param(request.GET.get('date')) or date.today()
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    return render(request, 'attendance/mark_attendance.html', {
+        'students': SimpleLazyObject(lambda: roster_statuses(attendance_date, teacher_students(teacher))),
+        'attendance_date': attendance_date,
+        'rows_fragment': fragment_cache(
+            'mark_attendance_rows', (teacher.pk, attendance_date),
+            [('roster', None), ('roster', teacher.pk), ('day', attendance_date)],
+        ),
+    })
 
 
 @login_required
 def view_attendance(request):
     """View attendance records for students"""
-    try:
-        student = request.user.student_profile
-    except:
+    student = request.role.student
+    if student is None:
         messages.error(request, 'Student profile not found.')
         return redirect('home')
     
     # Get all attendance records
-    attendance_records = Attendance.objects.filter(student=student).order_by('-date')
+    attendance_records = Attendance.objects.filter(student=student).select_related('teacher').order_by('-date')
+    
+    # Archived months are only kept as per-month bitmaps, so they are listed as month summaries
+    archived = archived_months(student)
     
-    # Calculate statistics
-    total_records = attendance_records.count()
-    present_records = attendance_records.filter(status='present').count()
-    absent_records = attendance_records.filter(status='absent').count()
-    attendance_percentage = (present_records / total_records * 100) if total_records > 0 else 0
+    # Read statistics from the materialized counters
+    totals = cached_value('student_totals', (student.pk,), [('student', student.pk)], lambda: student_totals(student))
     
     context = {
         'student': student,
         'attendance_records': attendance_records,
-        'total_records': total_records,
-        'present_records': present_records,
-        'absent_records': absent_records,
-        'attendance_percentage': round(attendance_percentage, 1),
+        'archived_months': archived,
+        'total_records': totals['total'],
+        'present_records': totals['present'],
+        'absent_records': totals['absent'],
+        'attendance_percentage': totals['percentage'],
     }
     return render(request, 'attendance/view_attendance.html', context)
 
@@ -244,9 +231,8 @@ def view_attendance(request):
 @login_required
 def apply_leave(request):
     """Apply for leave view for students"""
-    try:
-        student = request.user.student_profile
-    except:
+    student = request.role.student
+    if student is None:
         messages.error(request, 'Student profile not found.')
         return redirect('home')
     
@@ -267,44 +253,88 @@ def apply_leave(request):
 @login_required
 def leave_requests(request):
     """View and manage leave requests for teachers"""
-    try:
-        teacher = request.user.teacher_profile
-    except:
+    teacher = request.role.teacher
+    if teacher is None:
         messages.error(request, 'Teacher profile not found.')
         return redirect('home')
     
-    # Get all leave requests
-    leave_requests = Leave.objects.all().order_by('-created_at')
+    # Filter by status and fetch one keyset page with students and approvers joined
+    status_filter = request.GET.get('status', 'all')
+    leaves = Leave.objects.select_related('student', 'approved_by')
+    if status_filter in LEAVE_STATUSES:
+        leaves = leaves.filter(status=status_filter)
+    else:
+        status_filter = 'all'
+    leave_requests, next_cursor = keyset_page(leaves, request.GET.get('cursor'), LEAVE_PAGE_SIZE)
+    
+    # Per-status counts are cached until the next leave write
+    status_counts = leave_status_counts()
     
     return render(request, 'attendance/leave_requests.html', {
         'leave_requests': leave_requests,
-        'teacher': teacher
+        'teacher': teacher,
+        'status_filter': status_filter,
+        'status_counts': status_counts,
+        'total_count': sum(status_counts.values()),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
     })
 
 
+@login_required
+@require_POST
+def bulk_leave_action(request):
+    """Approve or reject the selected leave requests in one batch"""
+    teacher = request.role.teacher
+    if teacher is None:
+        messages.error(request, 'Teacher profile not found.')
+        return redirect('home')
+    
+    status_filter = request.POST.get('status_filter')
+    if status_filter not in LEAVE_STATUSES:
+        status_filter = 'all'
+    back = redirect(f"{reverse('leave_requests')}?status={status_filter}")
+    status = {'approve': 'approved', 'reject': 'rejected'}.get(request.POST.get('action'))
+    leave_ids = [int(pk) for pk in request.POST.getlist('leave_ids') if pk.isdigit()]
+    if status is None or not leave_ids:
+        messages.error(request, 'Select at least one leave request and an action.')
+        return back
+    
+    result = bulk_set_leave_status(
+        leave_ids, status, teacher,
+        approval=request.POST.get('approval', '').strip(),
+        mark_absent=request.POST.get('mark_absent') == 'on',
+    )
+    message = (
+        f"{status.title()} {result['processed']} leave requests for {result['students']} students "
+        f"in {result['elapsed_ms']:.0f} ms."
+    )
+    if result['marked_absent']:
+        message += f" Marked {result['marked_absent']} leave days absent."
+    if result['skipped_archived']:
+        message += f" Skipped {result['skipped_archived']} days in archived months."
+    if result['skipped_not_enrolled']:
+        message += f" Skipped {result['skipped_not_enrolled']} leave days of students outside your sections."
+    messages.success(request, message)
+    return back
+
+
 @login_required
 def leave_info(request):
     """Detailed leave information for students"""
-    try:
-        student = request.user.student_profile
-    except:
+    student = request.role.student
+    if student is None:
         messages.error(request, 'Student profile not found.')
         return redirect('home')
     
-    leaves = Leave.objects.filter(student=student).order_by('-date')
-    leaves_pending = leaves.filter(status='pending')
-    leaves_approved = leaves.filter(status='approved')
-    leaves_rejected = leaves.filter(status='rejected')
+    # All of the student's leaves in one query, bucketed by status
+    leave_summary = cached_value(
+        'leave_summary', (student.pk,), [('leaves', student.pk)], lambda: LeaveSummary.for_student(student),
+    )
     
     context = {
         'student': student,
-        'total_leaves': leaves.count(),
-        'pending_count': leaves_pending.count(),
-        'approved_count': leaves_approved.count(),
-        'rejected_count': leaves_rejected.count(),
-        'leaves_pending': leaves_pending,
-        'leaves_approved': leaves_approved,
-        'leaves_rejected': leaves_rejected,
+        **leave_summary.as_context(),
     }
     return render(request, 'attendance/leave_info.html', context)
 
@@ -312,9 +342,8 @@ def leave_info(request):
 @login_required
 def approve_leave(request, leave_id):
     """Approve or reject leave request"""
-    try:
-        teacher = request.user.teacher_profile
-    except:
+    teacher = request.role.teacher
+    if teacher is None:
         messages.error(request, 'Teacher profile not found.')
         return redirect('home')
     
@@ -338,6 +367,167 @@ def approve_leave(request, leave_id):
     })
 
 
+def _export_teacher(request, teacher_id):
+    """Whose records an export covers: any teacher (or everyone) for staff, always their own for teachers"""
+    if not request.user.is_staff:
+        return request.role.teacher
+    if not teacher_id:
+        return None
+    if not teacher_id.isdigit():
+        raise Http404('Unknown teacher.')
+    return get_object_or_404(Teacher, pk=teacher_id)
+
+
+def _export_dates(data):
+    """(start, end) of an export, defaulting to this year; raises ValueError for bad or reversed dates"""
+    start_default, end_default, _ = resolve_date_range('year')
+    try:
+        start_date = parse_date_param(data.get('start')) or start_default
+        end_date = parse_date_param(data.get('end')) or end_default
+    except ValueError:
+        raise ValueError('Start and end must be valid dates in YYYY-MM-DD format.') from None
+    if start_date > end_date:
+        raise ValueError('The start date must not be after the end date.')
+    return start_date, end_date
+
+
+@login_required
+def export_attendance(request):
+    """Stream attendance for a date range as CSV or XLSX (teachers: their own records; staff: any teacher or all)"""
+    if not (request.user.is_staff or request.role.teacher):
+        messages.error(request, 'Teacher profile not found.')
+        return redirect('home')
+    
+    try:
+        start_date, end_date = _export_dates(request.GET)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    teacher = _export_teacher(request, request.GET.get('teacher'))
+    student = None
+    if request.GET.get('student'):
+        student = get_object_or_404(Student, roll_no=request.GET['student'])
+    
+    records = export_queryset(start_date, end_date, teacher, student)
+    archived = ArchivedRecords(start_date, end_date, teacher, student)
+    layout = request.GET.get('layout', 'rows')
+    if layout == 'matrix':
+        rows = iter_matrix_rows(records, archived=archived)
+    else:
+        rows = iter_attendance_rows(records, archived=archived)
+    
+    filename = f'attendance_{start_date}_{end_date}'
+    if request.GET.get('format') == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        filename += '.xlsx'
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+        filename += '.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@require_POST
+def queue_export(request):
+    """Queue an attendance export as a background job and go to the jobs page"""
+    if not (request.user.is_staff or request.role.teacher):
+        messages.error(request, 'Teacher profile not found.')
+        return redirect('home')
+    
+    try:
+        start_date, end_date = _export_dates(request.POST)
+    except ValueError as exc:
+        messages.error(request, f'Export not queued: {exc}')
+        return redirect('job_list')
+    teacher = _export_teacher(request, request.POST.get('teacher'))
+    
+    job = enqueue('export_attendance', {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'teacher_id': teacher.pk if teacher else None,
+        'layout': 'matrix' if request.POST.get('layout') == 'matrix' else 'rows',
+        'format': 'xlsx' if request.POST.get('format') == 'xlsx' else 'csv',
+    }, priority=INTERACTIVE_JOB_PRIORITY, user=request.user)
+    messages.success(request, f'Export queued as job #{job.pk}. It will be ready to download here shortly.')
+    return redirect('job_list')
+
+
+def _user_job(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    if job.created_by_id != request.user.pk and not request.user.is_staff:
+        raise Http404
+    return job
+
+
+@login_required
+def job_list(request):
+    """The user's recent background jobs with their progress"""
+    jobs = list(Job.objects.filter(created_by=request.user).order_by('-created_at')[:JOB_PAGE_SIZE])
+    
+    context = {
+        'jobs': jobs,
+        'has_running': any(not job.is_finished for job in jobs),
+    }
+    return render(request, 'attendance/jobs.html', context)
+
+
+@login_required
+def job_status(request, job_id):
+    """Status and progress of one job as JSON, for polling"""
+    job = _user_job(request, job_id)
+    return JsonResponse({
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.progress_message,
+        'attempts': job.attempts,
+        'result': job.result,
+    })
+
+
+@login_required
+def job_download(request, job_id):
+    """Download the file produced by a finished export job"""
+    job = _user_job(request, job_id)
+    filename = (job.result or {}).get('file')
+    if job.status != Job.SUCCEEDED or not filename:
+        raise Http404
+    
+    try:
+        return FileResponse(open(os.path.join(output_dir(), os.path.basename(filename)), 'rb'),
+                            as_attachment=True, filename=filename)
+    except FileNotFoundError:
+        raise Http404
+
+
+def metrics_view(request):
+    """Prometheus metrics for this process (staff session or METRICS_TOKEN bearer token)"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        authorized = True
+    if not authorized:
+        return HttpResponseForbidden('Forbidden')
+    
+    stats = cache_stats()
+    body = registry.render({
+        'attendease_cache_hits': ('Dashboard cache hits in this process', stats['hits']),
+        'attendease_cache_misses': ('Dashboard cache misses in this process', stats['misses']),
+    })
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def cache_stats_view(request):
+    """Cache hit/miss counters for this process (staff only)"""
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('Forbidden')
+    return JsonResponse(cache_stats())
+
+
 def logout_view(request):
     """Logout view"""
     logout(request)
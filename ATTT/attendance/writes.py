@@ -0,0 +1,128 @@
+"""
+Batched attendance writes shared by the mark attendance view, imports and the API.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .archive import check_not_archived
+from .models import Student, Attendance
+from .signals import send_attendance_changes
+
+VALID_STATUSES = {choice for choice, _ in Attendance.STATUS_CHOICES}
+
+# Fetch-and-insert rounds before a conflict with concurrent submissions is raised
+CONFLICT_RETRIES = 3
+
+
+def parse_attendance_post(data, prefix='student_'):
+    """Collect {student_id: status} from `student_<id>` fields in a single pass"""
+    statuses = {}
+    for key, value in data.items():
+        if not key.startswith(prefix) or value not in VALID_STATUSES:
+            continue
+        try:
+            student_id = int(key[len(prefix):])
+        except ValueError:
+            continue
+        statuses[student_id] = value
+    return statuses
+
+
+def record_attendance(teacher, attendance_date, statuses, batch_size=500, students=None):
+    """
+    Create or update attendance for many students on one date.
+
+    `statuses` maps student ids to 'present'/'absent'. Existing rows are
+    fetched (and locked) with one query and everything is written inside a
+    single transaction using bulk_create and one UPDATE per status. Rows
+    that a concurrent submission inserted after the fetch are picked up by
+    fetching again and updating them instead. Returns a dict with the
+    created, updated and unchanged counts. Ids outside `students` (a
+    Student queryset, e.g. the teacher's enrolled roster; default every
+    student) are ignored. Raises ArchivedDateError for dates in archived
+    months.
+    """
+    statuses = {
+        student_id: status for student_id, status in statuses.items()
+        if status in VALID_STATUSES
+    }
+    result = {'created': 0, 'updated': 0, 'unchanged': 0}
+    if not statuses:
+        return result
+
+    with transaction.atomic():
+        # Checked alongside the writes it guards, in the same transaction
+        check_not_archived(attendance_date)
+
+        roster = Student.objects.all() if students is None else students
+        known_ids = set(
+            roster.filter(pk__in=statuses.keys()).values_list('pk', flat=True)
+        )
+        now = timezone.now()
+        for attempt in range(1, CONFLICT_RETRIES + 1):
+            # Locking the existing rows keeps their old states exact for the
+            # derived tables while this transaction overwrites them
+            existing = {
+                record.student_id: record
+                for record in Attendance.objects.select_for_update()
+                .filter(date=attendance_date, student_id__in=known_ids).order_by()
+            }
+            to_create, to_update, previous_states, unchanged = _plan_changes(
+                teacher, attendance_date, statuses, known_ids, existing, now,
+            )
+            try:
+                with transaction.atomic():
+                    Attendance.objects.bulk_create(to_create, batch_size=batch_size)
+            except IntegrityError:
+                # Another submission inserted some of these rows after the
+                # fetch; they are committed now, so fetch again and update them
+                if attempt == CONFLICT_RETRIES:
+                    raise
+                continue
+            break
+
+        # Every changed row gets the same teacher, so one UPDATE per status
+        # is much cheaper than bulk_update's per-row CASE expressions
+        for status in VALID_STATUSES:
+            pks = [record.pk for record in to_update if record.status == status]
+            for offset in range(0, len(pks), batch_size):
+                Attendance.objects.filter(pk__in=pks[offset:offset + batch_size]).update(
+                    status=status, teacher=teacher, updated_at=now,
+                )
+
+        # Bulk writes skip model signals, so notify derived tables explicitly
+        changes = [(old, record.state()) for old, record in zip(previous_states, to_update)]
+        changes += [(None, record.state()) for record in to_create]
+        send_attendance_changes(changes)
+
+    result['created'] = len(to_create)
+    result['updated'] = len(to_update)
+    result['unchanged'] = unchanged
+    return result
+
+
+def _plan_changes(teacher, attendance_date, statuses, known_ids, existing, now):
+    """Split the submission into rows to create, rows to update and unchanged ones"""
+    to_create = []
+    to_update = []
+    previous_states = []
+    unchanged = 0
+    for student_id in known_ids:
+        status = statuses[student_id]
+        record = existing.get(student_id)
+        if record is None:
+            to_create.append(Attendance(
+                student_id=student_id,
+                teacher=teacher,
+                date=attendance_date,
+                status=status,
+            ))
+        elif record.status != status or record.teacher_id != teacher.pk:
+            previous_states.append(record.state())
+            record.status = status
+            record.teacher = teacher
+            record.updated_at = now
+            to_update.append(record)
+        else:
+            unchanged += 1
+    return to_create, to_update, previous_states, unchanged
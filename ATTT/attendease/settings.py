@@ -5,6 +5,8 @@ Django settings for attendease project.
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,10 +41,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # ADD THIS
+    'attendance.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'attendance.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,12 +75,154 @@ WSGI_APPLICATION = 'attendease.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# SQLite by default; set DB_ENGINE=postgresql (with DB_NAME, DB_USER, DB_PASSWORD,
+# DB_HOST, DB_PORT) for production. DB_POOL_MAX_SIZE enables the psycopg 3 pool.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("DB_NAME", "attendease"),
+            'USER': os.environ.get("DB_USER", "attendease"),
+            'PASSWORD': os.environ.get("DB_PASSWORD", ""),
+            'HOST': os.environ.get("DB_HOST", "127.0.0.1"),
+            'PORT': os.environ.get("DB_PORT", "5432"),
+            # Reuse connections across requests and check them before reuse
+            'CONN_MAX_AGE': int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "0"))
+    if DB_POOL_MAX_SIZE:
+        # The pool (requires psycopg[pool]) replaces persistent connections
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("DB_NAME") or BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Take the write lock at BEGIN so concurrent writers wait on the
+                # busy timeout instead of failing when a read upgrades to a write
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.environ.get("DB_SQLITE_BUSY_TIMEOUT", "5000")) / 1000,
+            },
+        }
+    }
+
+# PRAGMAs run on every new SQLite connection (see attendance/db.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': int(os.environ.get("DB_SQLITE_BUSY_TIMEOUT", "5000")),
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.environ.get("DB_SQLITE_MMAP_SIZE", str(128 * 1024 * 1024))),
+}
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+
+# Cache
+# Local memory by default; set CACHE_BACKEND=file or CACHE_BACKEND=redis (with
+# CACHE_LOCATION) to share cached dashboards between worker processes.
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get("CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+        }
+    }
+elif CACHE_BACKEND == "file":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get("CACHE_LOCATION", str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'attendease',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
     }
+
+# Seconds before cached dashboard summaries expire
+ATTENDANCE_CACHE_TIMEOUT = int(os.environ.get("ATTENDANCE_CACHE_TIMEOUT", "60"))
+
+
+# First month of the academic year; archive_attendance archives everything
+# before the current academic year unless given --before
+
+ATTENDANCE_ACADEMIC_YEAR_START_MONTH = int(os.environ.get("ATTENDANCE_ACADEMIC_YEAR_START_MONTH", "6"))
+
+
+# School-wide analytics (admin Attendance > Analytics, manage.py attendance_report)
+# Students below this percentage are listed as low attendance. Reports are
+# expensive, so they are cached for longer than the dashboards and are not
+# invalidated by individual attendance writes.
+
+ATTENDANCE_LOW_ATTENDANCE_THRESHOLD = float(os.environ.get("ATTENDANCE_LOW_ATTENDANCE_THRESHOLD", "75"))
+ATTENDANCE_ANALYTICS_CACHE_TIMEOUT = int(os.environ.get("ATTENDANCE_ANALYTICS_CACHE_TIMEOUT", "600"))
+
+
+# Change feed (/api/changes/)
+# Changes younger than the lag (seconds) wait for a later poll so rows from
+# transactions still committing are not skipped. Deletions are kept as
+# tombstones for the retention period (manage.py prune_tombstones); clients
+# whose cursor is older must resync.
+
+ATTENDANCE_CHANGE_FEED_LAG = int(os.environ.get("ATTENDANCE_CHANGE_FEED_LAG", "5"))
+ATTENDANCE_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("ATTENDANCE_TOMBSTONE_RETENTION_DAYS", "30"))
+
+
+# Background jobs (manage.py run_worker)
+# Files produced by jobs (exports) are written here and served to the user who queued them.
+
+ATTENDANCE_JOB_OUTPUT_DIR = os.environ.get("ATTENDANCE_JOB_OUTPUT_DIR", str(BASE_DIR / "job_output"))
+
+# Seconds before the first retry of a failed job; doubled for every further attempt
+ATTENDANCE_JOB_RETRY_DELAY = int(os.environ.get("ATTENDANCE_JOB_RETRY_DELAY", "30"))
+
+
+# Async views
+# Route the read-heavy dashboards to attendance.async_views. Enable it when
+# serving attendease.asgi with uvicorn; under WSGI async views only add overhead.
+
+ATTENDANCE_ASYNC_VIEWS = os.environ.get("ATTENDANCE_ASYNC_VIEWS", "False") == "True"
+
+
+# Request metrics
+# Off by default; when enabled every response carries a Server-Timing header,
+# each request is logged as JSON and /metrics/ serves Prometheus histograms.
+
+ATTENDANCE_METRICS_ENABLED = os.environ.get("ATTENDANCE_METRICS_ENABLED", "False") == "True"
+
+# Identical SQL repeated this many times in one request is logged as an N+1 suspect
+ATTENDANCE_METRICS_DUPLICATE_THRESHOLD = int(os.environ.get("ATTENDANCE_METRICS_DUPLICATE_THRESHOLD", "5"))
+
+# Lets a scraper read /metrics/ with "Authorization: Bearer <token>" instead of a staff login
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'attendance.metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 
@@ -132,6 +278,34 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Authentication
+# ProfileBackend loads the session user together with their student/teacher
+# profile in one query. ModelBackend stays listed so sessions that were created
+# before ProfileBackend (and store its path) remain logged in; they switch over
+# at their next login.
+AUTHENTICATION_BACKENDS = [
+    'attendance.roles.ProfileBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Sessions
+# "db" (default) reads the session table on every request. "signed_cookies"
+# keeps the session in a cookie signed with SECRET_KEY (no session query; the
+# data is readable by the client, and rotating SECRET_KEY logs everyone out);
+# recommended for production. "cache" stores sessions in CACHE_BACKEND, which
+# must be shared between workers and survive restarts (redis).
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "db")
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f'SESSION_BACKEND must be one of {", ".join(SESSION_ENGINES)}, not {SESSION_BACKEND!r}.'
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
 # Login URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'